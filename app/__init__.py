@@ -3,7 +3,16 @@ from flask import Flask
 from flask_cors import CORS
 from flasgger import Swagger
 from config.config import get_config
-from app.utils.db_connection import initialize_pool, close_all
+from app.utils.db_connection import initialize_pool, close_all, retry_stats
+from app.utils.json_provider import FastJSONProvider
+from app.utils.compression import init_compression
+from app.utils.reference_data import reference_data
+from app.utils.sales_rollup import SalesRollup
+from app.services.inventory_deltas import inventory_deltas
+from app.services.audit_writer import audit_writer
+from app.services.reservation_engine import reservation_engine
+from app.utils.entity_cache import entity_cache_stats
+import atexit
 import logging
 
 def create_app(config_name='development'):
@@ -14,6 +23,9 @@ def create_app(config_name='development'):
     config = get_config(config_name)
     app.config.from_object(config)
     
+    # JSON serialization (orjson when installed, Decimal/datetime policy from config)
+    app.json = FastJSONProvider(app)
+    
     # Setup logging
     logging.basicConfig(
         level=getattr(logging, config.LOG_LEVEL),
@@ -25,6 +37,9 @@ def create_app(config_name='development'):
     # Initialize CORS
     CORS(app, origins=config.CORS_ORIGINS)
     
+    # Response compression (gzip / brotli / zstd by Accept-Encoding)
+    init_compression(app)
+    
     # Initialize Swagger
     swagger_config = {
         "headers": [],
@@ -50,7 +65,8 @@ def create_app(config_name='development'):
         },
         "host": "localhost:5000",
         "basePath": "/",
-        "schemes": ["http"]
+        "schemes": ["http"],
+        "produces": ["application/json", "application/msgpack"]
     }
     
     Swagger(app, config=swagger_config, template=swagger_template)
@@ -70,17 +86,37 @@ def create_app(config_name='development'):
     # Store database availability in app config
     app.config['DB_AVAILABLE'] = db_available
     
+    # Load reference data (warehouses, suppliers, users) and keep it fresh
+    if db_available:
+        reference_data.start(config.REFERENCE_DATA_REFRESH_SECONDS)
+    
+    # Backfill the daily sales rollups on a database that had orders before them
+    if db_available and config.SALES_ROLLUP_BACKFILL:
+        try:
+            SalesRollup.backfill_if_empty()
+        except Exception as e:
+            logger.error(f"Sales rollup backfill failed, sales reports may be incomplete: {str(e)}")
+    
+    # Apply journaled stock adjustments left over from the last run, and flush on exit
+    if db_available and config.INVENTORY_COALESCE_MS > 0:
+        inventory_deltas.start()
+        atexit.register(inventory_deltas.stop)
+    
     # Register blueprints only if database is available
     if db_available:
         from app.routes.customer_routes import customer_bp
         from app.routes.product_routes import product_bp
         from app.routes.order_routes import order_bp
         from app.routes.analytics_routes import analytics_bp
+        from app.routes.change_feed_routes import change_feed_bp
+        from app.routes.inventory_routes import inventory_bp
         
         app.register_blueprint(customer_bp, url_prefix='/api/customers')
         app.register_blueprint(product_bp, url_prefix='/api/products')
         app.register_blueprint(order_bp, url_prefix='/api/orders')
         app.register_blueprint(analytics_bp, url_prefix='/api/analytics')
+        app.register_blueprint(change_feed_bp, url_prefix='/api')
+        app.register_blueprint(inventory_bp, url_prefix='/api/inventory')
         logger.info("API routes registered successfully")
     else:
         logger.warning("API routes not registered - database unavailable")
@@ -92,7 +128,12 @@ def create_app(config_name='development'):
         return {
             'status': 'healthy',
             'database': db_status,
-            'message': 'API is running' if db_status == 'connected' else 'API running without database'
+            'message': 'API is running' if db_status == 'connected' else 'API running without database',
+            'database_retries': retry_stats(),
+            'inventory_deltas': inventory_deltas.stats(),
+            'audit_writer': audit_writer.stats(),
+            'entity_cache': entity_cache_stats(),
+            'reservations': reservation_engine.stats()
         }, 200
     
     # Cleanup on shutdown
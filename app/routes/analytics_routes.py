@@ -1,7 +1,15 @@
 """Analytics routes"""
-from flask import Blueprint, request, jsonify
-from app.utils.advanced_data_layer import AdvancedDataLayer
+from flask import Blueprint, request, current_app
+from app.utils.advanced_data_layer import AdvancedDataLayer, run_reports
+from app.utils.responses import respond
+from app.utils.export import ExportFormatError, requested_export_format, export_response
+from app.utils.http_cache import (
+    report_response, report_snapshot, snapshot_args,
+    combined_validator, is_not_modified, not_modified, apply_validator
+)
+from functools import partial
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 analytics_bp = Blueprint('analytics', __name__)
@@ -28,20 +36,35 @@ def get_customer_analytics():
         type: string
         format: date
         description: End date for analysis
+      - name: format
+        in: query
+        type: string
+        enum: [json, csv, ndjson, arrow]
+        default: json
+        description: Response format; csv, ndjson and arrow are streamed as a download
     responses:
       200:
         description: Customer analytics data
+      304:
+        description: Report unchanged since If-None-Match / If-Modified-Since
+      400:
+        description: Unsupported export format
     """
     try:
+        fmt = requested_export_format()
         customer_id = request.args.get('customer_id')
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
         
-        data = AdvancedDataLayer.get_customer_analytics(customer_id, start_date, end_date)
-        return jsonify(data), 200
+        load = partial(AdvancedDataLayer.get_customer_analytics, customer_id, start_date, end_date)
+        if fmt:
+            return export_response([load()], fmt, 'customer-analytics')
+        return report_response('customers', load)
+    except ExportFormatError as e:
+        return respond({'error': str(e)}, 400)
     except Exception as e:
         logger.error(f"Error fetching customer analytics: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+        return respond({'error': str(e)}, 500)
 
 @analytics_bp.route('/inventory-status', methods=['GET'])
 def get_inventory_status():
@@ -50,16 +73,32 @@ def get_inventory_status():
     ---
     tags:
       - Analytics
+    parameters:
+      - name: format
+        in: query
+        type: string
+        enum: [json, csv, ndjson, arrow]
+        default: json
+        description: Response format; csv, ndjson and arrow are streamed as a download
     responses:
       200:
         description: Inventory status across all warehouses
+      304:
+        description: Report unchanged since If-None-Match / If-Modified-Since
+      400:
+        description: Unsupported export format
     """
     try:
-        data = AdvancedDataLayer.get_inventory_status_report()
-        return jsonify(data), 200
+        fmt = requested_export_format()
+        if fmt:
+            return export_response(AdvancedDataLayer.stream_inventory_status_report(), fmt, 'inventory-status')
+        
+        return report_response('inventory-status', AdvancedDataLayer.get_inventory_status_report)
+    except ExportFormatError as e:
+        return respond({'error': str(e)}, 400)
     except Exception as e:
         logger.error(f"Error fetching inventory status: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+        return respond({'error': str(e)}, 500)
 
 @analytics_bp.route('/sales-performance', methods=['GET'])
 def get_sales_performance():
@@ -85,19 +124,34 @@ def get_sales_performance():
         type: string
         format: date
         description: End date for analysis
+      - name: format
+        in: query
+        type: string
+        enum: [json, csv, ndjson, arrow]
+        default: json
+        description: Response format; csv, ndjson and arrow are streamed as a download
     responses:
       200:
         description: Sales performance data
+      304:
+        description: Report unchanged since If-None-Match / If-Modified-Since
+      400:
+        description: Unsupported export format
     """
     try:
+        fmt = requested_export_format()
         period = request.args.get('period', 'month')
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
-        data = AdvancedDataLayer.get_sales_performance_by_period(period, start_date, end_date)
-        return jsonify(data), 200
+        load = partial(AdvancedDataLayer.get_sales_performance_by_period, period, start_date, end_date)
+        if fmt:
+            return export_response([load()], fmt, 'sales-performance')
+        return report_response('sales-performance', load)
+    except ExportFormatError as e:
+        return respond({'error': str(e)}, 400)
     except Exception as e:
         logger.error(f"Error fetching sales performance: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+        return respond({'error': str(e)}, 500)
 
 @analytics_bp.route('/product-performance', methods=['GET'])
 def get_product_performance():
@@ -112,17 +166,32 @@ def get_product_performance():
         type: integer
         default: 20
         description: Number of top products to return
+      - name: format
+        in: query
+        type: string
+        enum: [json, csv, ndjson, arrow]
+        default: json
+        description: Response format; csv, ndjson and arrow are streamed as a download
     responses:
       200:
         description: Product performance data
+      304:
+        description: Report unchanged since If-None-Match / If-Modified-Since
+      400:
+        description: Unsupported export format
     """
     try:
+        fmt = requested_export_format()
         top_n = int(request.args.get('top_n', 20))
-        data = AdvancedDataLayer.get_product_performance_analysis(top_n)
-        return jsonify(data), 200
+        load = partial(AdvancedDataLayer.get_product_performance_analysis, top_n)
+        if fmt:
+            return export_response([load()], fmt, 'product-performance')
+        return report_response('product-performance', load)
+    except ExportFormatError as e:
+        return respond({'error': str(e)}, 400)
     except Exception as e:
         logger.error(f"Error fetching product performance: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+        return respond({'error': str(e)}, 500)
 
 @analytics_bp.route('/order-fulfillment', methods=['GET'])
 def get_order_fulfillment():
@@ -142,18 +211,33 @@ def get_order_fulfillment():
         type: string
         format: date
         description: End date for analysis
+      - name: format
+        in: query
+        type: string
+        enum: [json, csv, ndjson, arrow]
+        default: json
+        description: Response format; csv, ndjson and arrow are streamed as a download
     responses:
       200:
         description: Order fulfillment statistics
+      304:
+        description: Report unchanged since If-None-Match / If-Modified-Since
+      400:
+        description: Unsupported export format
     """
     try:
+        fmt = requested_export_format()
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
-        data = AdvancedDataLayer.get_order_fulfillment_metrics(start_date, end_date)
-        return jsonify(data), 200
+        load = partial(AdvancedDataLayer.get_order_fulfillment_metrics, start_date, end_date)
+        if fmt:
+            return export_response([load()], fmt, 'order-fulfillment')
+        return report_response('order-fulfillment', load)
+    except ExportFormatError as e:
+        return respond({'error': str(e)}, 400)
     except Exception as e:
         logger.error(f"Error fetching order fulfillment: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+        return respond({'error': str(e)}, 500)
 
 @analytics_bp.route('/customer-segmentation', methods=['GET'])
 def get_customer_segmentation():
@@ -162,16 +246,32 @@ def get_customer_segmentation():
     ---
     tags:
       - Analytics
+    parameters:
+      - name: format
+        in: query
+        type: string
+        enum: [json, csv, ndjson, arrow]
+        default: json
+        description: Response format; csv, ndjson and arrow are streamed as a download
     responses:
       200:
         description: Customer segments by value and behavior
+      304:
+        description: Report unchanged since If-None-Match / If-Modified-Since
+      400:
+        description: Unsupported export format
     """
     try:
-        data = AdvancedDataLayer.get_customer_segmentation()
-        return jsonify(data), 200
+        fmt = requested_export_format()
+        load = AdvancedDataLayer.get_customer_segmentation
+        if fmt:
+            return export_response([load()], fmt, 'customer-segmentation')
+        return report_response('customer-segmentation', load)
+    except ExportFormatError as e:
+        return respond({'error': str(e)}, 400)
     except Exception as e:
         logger.error(f"Error fetching customer segmentation: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+        return respond({'error': str(e)}, 500)
 
 @analytics_bp.route('/payment-collection', methods=['GET'])
 def get_payment_collection():
@@ -180,16 +280,32 @@ def get_payment_collection():
     ---
     tags:
       - Analytics
+    parameters:
+      - name: format
+        in: query
+        type: string
+        enum: [json, csv, ndjson, arrow]
+        default: json
+        description: Response format; csv, ndjson and arrow are streamed as a download
     responses:
       200:
         description: Payment collection metrics
+      304:
+        description: Report unchanged since If-None-Match / If-Modified-Since
+      400:
+        description: Unsupported export format
     """
     try:
-        data = AdvancedDataLayer.get_payment_collection_report()
-        return jsonify(data), 200
+        fmt = requested_export_format()
+        if fmt:
+            return export_response(AdvancedDataLayer.stream_payment_collection_report(), fmt, 'payment-collection')
+        
+        return report_response('payment-collection', AdvancedDataLayer.get_payment_collection_report)
+    except ExportFormatError as e:
+        return respond({'error': str(e)}, 400)
     except Exception as e:
         logger.error(f"Error fetching payment collection: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+        return respond({'error': str(e)}, 500)
 
 @analytics_bp.route('/warehouse-utilization', methods=['GET'])
 def get_warehouse_utilization():
@@ -198,16 +314,32 @@ def get_warehouse_utilization():
     ---
     tags:
       - Analytics
+    parameters:
+      - name: format
+        in: query
+        type: string
+        enum: [json, csv, ndjson, arrow]
+        default: json
+        description: Response format; csv, ndjson and arrow are streamed as a download
     responses:
       200:
         description: Warehouse capacity and utilization
+      304:
+        description: Report unchanged since If-None-Match / If-Modified-Since
+      400:
+        description: Unsupported export format
     """
     try:
-        data = AdvancedDataLayer.get_warehouse_utilization()
-        return jsonify(data), 200
+        fmt = requested_export_format()
+        load = AdvancedDataLayer.get_warehouse_utilization
+        if fmt:
+            return export_response([load()], fmt, 'warehouse-utilization')
+        return report_response('warehouse-utilization', load)
+    except ExportFormatError as e:
+        return respond({'error': str(e)}, 400)
     except Exception as e:
         logger.error(f"Error fetching warehouse utilization: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+        return respond({'error': str(e)}, 500)
 
 @analytics_bp.route('/user-activity', methods=['GET'])
 def get_user_activity():
@@ -227,18 +359,33 @@ def get_user_activity():
         type: string
         format: date
         description: End date for analysis
+      - name: format
+        in: query
+        type: string
+        enum: [json, csv, ndjson, arrow]
+        default: json
+        description: Response format; csv, ndjson and arrow are streamed as a download
     responses:
       200:
         description: User activity metrics
+      304:
+        description: Report unchanged since If-None-Match / If-Modified-Since
+      400:
+        description: Unsupported export format
     """
     try:
+        fmt = requested_export_format()
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
-        data = AdvancedDataLayer.get_activity_summary_by_user(start_date, end_date)
-        return jsonify(data), 200
+        load = partial(AdvancedDataLayer.get_activity_summary_by_user, start_date, end_date)
+        if fmt:
+            return export_response([load()], fmt, 'user-activity')
+        return report_response('user-activity', load)
+    except ExportFormatError as e:
+        return respond({'error': str(e)}, 400)
     except Exception as e:
         logger.error(f"Error fetching user activity: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+        return respond({'error': str(e)}, 500)
 
 @analytics_bp.route('/supplier-performance', methods=['GET'])
 def get_supplier_performance():
@@ -247,16 +394,32 @@ def get_supplier_performance():
     ---
     tags:
       - Analytics
+    parameters:
+      - name: format
+        in: query
+        type: string
+        enum: [json, csv, ndjson, arrow]
+        default: json
+        description: Response format; csv, ndjson and arrow are streamed as a download
     responses:
       200:
         description: Supplier delivery and quality metrics
+      304:
+        description: Report unchanged since If-None-Match / If-Modified-Since
+      400:
+        description: Unsupported export format
     """
     try:
-        data = AdvancedDataLayer.get_supplier_performance()
-        return jsonify(data), 200
+        fmt = requested_export_format()
+        load = AdvancedDataLayer.get_supplier_performance
+        if fmt:
+            return export_response([load()], fmt, 'supplier-performance')
+        return report_response('supplier-performance', load)
+    except ExportFormatError as e:
+        return respond({'error': str(e)}, 400)
     except Exception as e:
         logger.error(f"Error fetching supplier performance: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+        return respond({'error': str(e)}, 500)
 
 @analytics_bp.route('/revenue-forecast', methods=['GET'])
 def get_revenue_forecast():
@@ -274,11 +437,118 @@ def get_revenue_forecast():
     responses:
       200:
         description: Revenue forecast data
+      304:
+        description: Report unchanged since If-None-Match / If-Modified-Since
     """
     try:
         months_ahead = int(request.args.get('months_ahead', 3))
-        data = AdvancedDataLayer.get_revenue_forecast(months_ahead)
-        return jsonify(data), 200
+        return report_response('revenue-forecast', partial(AdvancedDataLayer.get_revenue_forecast, months_ahead))
     except Exception as e:
         logger.error(f"Error fetching revenue forecast: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+        return respond({'error': str(e)}, 500)
+
+# Reports available to the composite dashboard, keyed by their route name.
+# Each entry receives the request's query arguments as a plain dict.
+DASHBOARD_REPORTS = {
+    'customers': lambda args: AdvancedDataLayer.get_customer_analytics(
+        args.get('customer_id'), args.get('start_date'), args.get('end_date')),
+    'inventory-status': lambda args: AdvancedDataLayer.get_inventory_status_report(),
+    'sales-performance': lambda args: AdvancedDataLayer.get_sales_performance_by_period(
+        args.get('period', 'month'), args.get('start_date'), args.get('end_date')),
+    'product-performance': lambda args: AdvancedDataLayer.get_product_performance_analysis(
+        int(args.get('top_n', 20))),
+    'order-fulfillment': lambda args: AdvancedDataLayer.get_order_fulfillment_metrics(
+        args.get('start_date'), args.get('end_date')),
+    'customer-segmentation': lambda args: AdvancedDataLayer.get_customer_segmentation(),
+    'payment-collection': lambda args: AdvancedDataLayer.get_payment_collection_report(),
+    'warehouse-utilization': lambda args: AdvancedDataLayer.get_warehouse_utilization(),
+    'user-activity': lambda args: AdvancedDataLayer.get_activity_summary_by_user(
+        args.get('start_date'), args.get('end_date')),
+    'supplier-performance': lambda args: AdvancedDataLayer.get_supplier_performance(),
+    'revenue-forecast': lambda args: AdvancedDataLayer.get_revenue_forecast(
+        int(args.get('months_ahead', 3)))
+}
+
+@analytics_bp.route('/dashboard', methods=['GET'])
+def get_dashboard():
+    """
+    Get several analytics reports in one request
+    ---
+    tags:
+      - Analytics
+    parameters:
+      - name: reports
+        in: query
+        type: string
+        description: Comma-separated report names (default all), e.g. customers,sales-performance,revenue-forecast
+      - name: start_date
+        in: query
+        type: string
+        format: date
+        description: Start date passed to reports that accept it
+      - name: end_date
+        in: query
+        type: string
+        format: date
+        description: End date passed to reports that accept it
+      - name: period
+        in: query
+        type: string
+        description: Period for sales-performance
+      - name: top_n
+        in: query
+        type: integer
+        description: Top N for product-performance
+      - name: months_ahead
+        in: query
+        type: integer
+        description: Months to forecast for revenue-forecast
+    responses:
+      200:
+        description: Report results with per-report status and timings
+      304:
+        description: Every report unchanged since If-None-Match / If-Modified-Since
+      400:
+        description: Unknown report name
+      500:
+        description: Every requested report failed
+    """
+    try:
+        requested = request.args.get('reports')
+        names = [name.strip() for name in requested.split(',') if name.strip()] if requested else list(DASHBOARD_REPORTS)
+        unknown = [name for name in names if name not in DASHBOARD_REPORTS]
+        if unknown:
+            return respond({'error': f"Unknown reports: {', '.join(unknown)}",
+                            'available': list(DASHBOARD_REPORTS)}, 400)
+        
+        args = snapshot_args(exclude=('format', 'reports'))
+        jobs = {
+            name: partial(report_snapshot, name, args, partial(DASHBOARD_REPORTS[name], args))
+            for name in dict.fromkeys(names)
+        }
+        
+        start = time.perf_counter()
+        results = run_reports(jobs, timeout=current_app.config.get('DASHBOARD_TIMEOUT'))
+        failed = [name for name, result in results.items() if result['status'] != 'ok']
+        
+        snapshots = []
+        for result in results.values():
+            if result['status'] == 'ok':
+                snapshots.append(result['data'])
+                result['data'] = result['data']['data']
+        
+        # Only a fully successful dashboard is cacheable by the client
+        validator = combined_validator(snapshots) if not failed else None
+        if is_not_modified(validator):
+            return not_modified(validator), 304
+        
+        body = {
+            'reports': results,
+            'failed': failed,
+            'elapsed_ms': round((time.perf_counter() - start) * 1000, 2)
+        }
+        response, status = respond(body, 500 if failed and len(failed) == len(results) else 200)
+        return apply_validator(response, validator), status
+    except Exception as e:
+        logger.error(f"Error fetching dashboard: {str(e)}")
+        return respond({'error': str(e)}, 500)
@@ -0,0 +1,69 @@
+"""Change feed routes"""
+from flask import Blueprint, request
+from app.services.change_feed_service import ChangeFeedService, FEEDS, InvalidChangeToken
+from app.utils.responses import respond
+import logging
+
+logger = logging.getLogger(__name__)
+change_feed_bp = Blueprint('changes', __name__)
+
+@change_feed_bp.route('/<entity>/changes', methods=['GET'])
+def get_changes(entity):
+    """
+    Get rows changed since a token (incremental sync)
+    ---
+    tags:
+      - Changes
+    parameters:
+      - name: entity
+        in: path
+        type: string
+        required: true
+        enum: [customers, products, orders, inventory]
+        description: Entity to sync
+      - name: since
+        in: query
+        type: string
+        description: Token from the previous response's `next` (omit for a full sync)
+      - name: limit
+        in: query
+        type: integer
+        default: 500
+        description: Rows per page
+    produces:
+      - application/json
+      - application/msgpack
+    responses:
+      200:
+        description: Changed rows in (updated_at, id) order; keep requesting with `next` while has_more is true, then poll with it
+        schema:
+          type: object
+          properties:
+            data:
+              type: array
+              items:
+                type: object
+            deleted:
+              type: array
+              description: Ids soft-deleted since the token (inactive customers, deactivated products, cancelled orders)
+              items:
+                type: integer
+            next:
+              type: string
+            has_more:
+              type: boolean
+      400:
+        description: Malformed token or limit
+      404:
+        description: Entity has no change feed
+    """
+    if entity not in FEEDS:
+        return respond({'error': f'No change feed for {entity}'}, 404)
+    try:
+        limit = request.args.get('limit', type=int)
+        return respond(ChangeFeedService.get_changes(entity, request.args.get('since'), limit), 200)
+    except InvalidChangeToken as e:
+        return respond({'error': str(e)}, 400)
+    except Exception as e:
+        logger.error(f"Error fetching {entity} changes: {str(e)}")
+        return respond({'error': str(e)}, 500)
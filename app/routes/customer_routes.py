@@ -1,7 +1,12 @@
 """Customer routes"""
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request
 from flasgger import swag_from
 from app.services.customer_service import CustomerService
+from app.utils.http_cache import entity_response
+from app.utils.responses import respond
+from app.utils.idempotency import idempotent
+from app.utils.export import wants_ndjson, export_response
+from functools import partial
 import logging
 
 logger = logging.getLogger(__name__)
@@ -29,9 +34,13 @@ def get_customers():
         in: query
         type: string
         description: Filter by status (active, inactive)
+    produces:
+      - application/json
+      - application/msgpack
+      - application/x-ndjson
     responses:
       200:
-        description: List of customers
+        description: List of customers (streamed one JSON object per line with Accept: application/x-ndjson)
         schema:
           type: object
           properties:
@@ -49,11 +58,14 @@ def get_customers():
         limit = int(request.args.get('limit', 50))
         status = request.args.get('status')
         
+        if wants_ndjson():
+            return export_response(CustomerService.iter_all(page, limit, status), 'ndjson')
+        
         customers = CustomerService.get_all(page, limit, status)
-        return jsonify({'data': customers, 'page': page, 'limit': limit}), 200
+        return respond({'data': customers, 'page': page, 'limit': limit}, 200)
     except Exception as e:
         logger.error(f"Error fetching customers: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+        return respond({'error': str(e)}, 500)
 
 @customer_bp.route('/<int:customer_id>', methods=['GET'])
 def get_customer(customer_id):
@@ -71,19 +83,19 @@ def get_customer(customer_id):
     responses:
       200:
         description: Customer details
+      304:
+        description: Unchanged since If-None-Match / If-Modified-Since
       404:
         description: Customer not found
     """
     try:
-        customer = CustomerService.get_by_id(customer_id)
-        if not customer:
-            return jsonify({'error': 'Customer not found'}), 404
-        return jsonify(customer), 200
+        return entity_response('customer', customer_id, partial(CustomerService.get_by_id, customer_id), 'Customer not found')
     except Exception as e:
         logger.error(f"Error fetching customer: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+        return respond({'error': str(e)}, 500)
 
 @customer_bp.route('', methods=['POST'])
+@idempotent
 def create_customer():
     """
     Create new customer
@@ -91,6 +103,11 @@ def create_customer():
     tags:
       - Customers
     parameters:
+      - name: Idempotency-Key
+        in: header
+        type: string
+        required: false
+        description: Retries with the same key return the first response instead of creating again
       - name: body
         in: body
         required: true
@@ -130,14 +147,16 @@ def create_customer():
         description: Customer created successfully
       400:
         description: Invalid input
+      422:
+        description: Idempotency-Key reused with a different request body
     """
     try:
         data = request.get_json()
         customer = CustomerService.create(data)
-        return jsonify(customer), 201
+        return respond(customer, 201)
     except Exception as e:
         logger.error(f"Error creating customer: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+        return respond({'error': str(e)}, 500)
 
 @customer_bp.route('/<int:customer_id>', methods=['PUT'])
 def update_customer(customer_id):
@@ -180,11 +199,11 @@ def update_customer(customer_id):
         data = request.get_json()
         customer = CustomerService.update(customer_id, data)
         if not customer:
-            return jsonify({'error': 'Customer not found'}), 404
-        return jsonify(customer), 200
+            return respond({'error': 'Customer not found'}, 404)
+        return respond(customer, 200)
     except Exception as e:
         logger.error(f"Error updating customer: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+        return respond({'error': str(e)}, 500)
 
 @customer_bp.route('/<int:customer_id>', methods=['DELETE'])
 def delete_customer(customer_id):
@@ -207,7 +226,7 @@ def delete_customer(customer_id):
     """
     try:
         CustomerService.delete(customer_id)
-        return jsonify({'message': 'Customer deleted'}), 200
+        return respond({'message': 'Customer deleted'}, 200)
     except Exception as e:
         logger.error(f"Error deleting customer: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+        return respond({'error': str(e)}, 500)
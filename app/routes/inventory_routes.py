@@ -0,0 +1,63 @@
+"""Inventory routes"""
+from flask import Blueprint, request
+from app.services.inventory_service import InventoryService
+from app.services.inventory_deltas import inventory_deltas
+from app.utils.responses import respond
+from config.config import get_config
+import logging
+
+logger = logging.getLogger(__name__)
+inventory_bp = Blueprint('inventory', __name__)
+
+@inventory_bp.route('/adjustments', methods=['POST'])
+def adjust_inventory():
+    """
+    Adjust stock on hand by a delta (scanner counts, receipts, picks)
+    ---
+    tags:
+      - Inventory
+    parameters:
+      - name: body
+        in: body
+        required: true
+        schema:
+          type: object
+          required:
+            - product_id
+            - delta
+          properties:
+            product_id:
+              type: integer
+              example: 1
+            warehouse_id:
+              type: integer
+              example: 1
+              description: Defaults to DEFAULT_WAREHOUSE_ID
+            delta:
+              type: integer
+              example: -2
+              description: Units to add to quantity_on_hand (negative to remove)
+    responses:
+      200:
+        description: Adjustment written
+      202:
+        description: Adjustment journaled; the next flush (within INVENTORY_COALESCE_MS) writes it
+      400:
+        description: Invalid input
+    """
+    try:
+        data = request.get_json() or {}
+        try:
+            product_id = int(data['product_id'])
+            warehouse_id = int(data.get('warehouse_id') or get_config().DEFAULT_WAREHOUSE_ID)
+            delta = int(data['delta'])
+        except (KeyError, TypeError, ValueError):
+            return respond({'error': 'product_id and delta must be integers'}, 400)
+        if not delta:
+            return respond({'error': 'delta must not be 0'}, 400)
+        InventoryService.adjust(product_id, warehouse_id, delta)
+        body = {'product_id': product_id, 'warehouse_id': warehouse_id, 'delta': delta}
+        return respond(body, 202 if inventory_deltas.window > 0 else 200)
+    except Exception as e:
+        logger.error(f"Error adjusting inventory: {str(e)}")
+        return respond({'error': str(e)}, 500)
@@ -1,6 +1,12 @@
 """Order routes"""
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request
 from app.services.order_service import OrderService
+from app.services.inventory_service import InsufficientStockError
+from app.utils.http_cache import entity_response
+from app.utils.responses import respond
+from app.utils.idempotency import idempotent
+from app.utils.export import wants_ndjson, export_response
+from functools import partial
 import logging
 
 logger = logging.getLogger(__name__)
@@ -32,9 +38,13 @@ def get_orders():
         in: query
         type: string
         description: Filter by status (pending, confirmed, shipped, delivered, cancelled)
+    produces:
+      - application/json
+      - application/msgpack
+      - application/x-ndjson
     responses:
       200:
-        description: List of orders
+        description: List of orders (streamed one JSON object per line with Accept: application/x-ndjson)
         schema:
           type: object
           properties:
@@ -53,11 +63,14 @@ def get_orders():
         customer_id = request.args.get('customer_id')
         status = request.args.get('status')
         
+        if wants_ndjson():
+            return export_response(OrderService.iter_all(page, limit, customer_id, status), 'ndjson')
+        
         orders = OrderService.get_all(page, limit, customer_id, status)
-        return jsonify({'data': orders, 'page': page, 'limit': limit}), 200
+        return respond({'data': orders, 'page': page, 'limit': limit}, 200)
     except Exception as e:
         logger.error(f"Error fetching orders: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+        return respond({'error': str(e)}, 500)
 
 @order_bp.route('/<int:order_id>', methods=['GET'])
 def get_order(order_id):
@@ -75,26 +88,35 @@ def get_order(order_id):
     responses:
       200:
         description: Order details
+      304:
+        description: Unchanged since If-None-Match / If-Modified-Since
       404:
         description: Order not found
     """
     try:
-        order = OrderService.get_by_id(order_id)
-        if not order:
-            return jsonify({'error': 'Order not found'}), 404
-        return jsonify(order), 200
+        return entity_response('order', order_id, partial(OrderService.get_by_id, order_id), 'Order not found')
     except Exception as e:
         logger.error(f"Error fetching order: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+        return respond({'error': str(e)}, 500)
 
 @order_bp.route('', methods=['POST'])
+@idempotent
 def create_order():
     """
     Create new order
+    
+    With `items`, the order is placed atomically: prices come from the
+    catalog, totals are computed, and the order, its line items and the
+    stock reservation are written in one transaction.
     ---
     tags:
       - Orders
     parameters:
+      - name: Idempotency-Key
+        in: header
+        type: string
+        required: false
+        description: Retries with the same key return the first response instead of creating again
       - name: body
         in: body
         required: true
@@ -102,8 +124,6 @@ def create_order():
           type: object
           required:
             - customer_id
-            - order_date
-            - total_amount
           properties:
             customer_id:
               type: integer
@@ -115,6 +135,34 @@ def create_order():
             total_amount:
               type: number
               example: 1500.00
+              description: Required without items; computed when items are given
+            items:
+              type: array
+              items:
+                type: object
+                required:
+                  - product_id
+                  - quantity
+                properties:
+                  product_id:
+                    type: integer
+                    example: 1
+                  quantity:
+                    type: integer
+                    example: 2
+                  discount_percent:
+                    type: number
+                    example: 5
+            warehouse_id:
+              type: integer
+              example: 1
+              description: Warehouse to reserve stock from (default DEFAULT_WAREHOUSE_ID)
+            shipping_amount:
+              type: number
+              example: 15.00
+            discount_amount:
+              type: number
+              example: 0
             status:
               type: string
               example: pending
@@ -126,17 +174,28 @@ def create_order():
               example: credit_card
     responses:
       201:
-        description: Order created successfully
+        description: Order created successfully (with its items when placed with items)
       400:
         description: Invalid input
+      409:
+        description: Insufficient stock for one or more items (nothing is written)
+      422:
+        description: Idempotency-Key reused with a different request body
     """
     try:
         data = request.get_json()
-        order = OrderService.create(data)
-        return jsonify(order), 201
+        if data and 'items' in data:
+            order = OrderService.place(data)
+        else:
+            order = OrderService.create(data)
+        return respond(order, 201)
+    except InsufficientStockError as e:
+        return respond({'error': str(e), 'shortages': e.shortages}, 409)
+    except ValueError as e:
+        return respond({'error': str(e)}, 400)
     except Exception as e:
         logger.error(f"Error creating order: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+        return respond({'error': str(e)}, 500)
 
 @order_bp.route('/<int:order_id>', methods=['PUT'])
 def update_order(order_id):
@@ -176,11 +235,11 @@ def update_order(order_id):
         data = request.get_json()
         order = OrderService.update(order_id, data)
         if not order:
-            return jsonify({'error': 'Order not found'}), 404
-        return jsonify(order), 200
+            return respond({'error': 'Order not found'}, 404)
+        return respond(order, 200)
     except Exception as e:
         logger.error(f"Error updating order: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+        return respond({'error': str(e)}, 500)
 
 @order_bp.route('/<int:order_id>', methods=['DELETE'])
 def delete_order(order_id):
@@ -203,7 +262,7 @@ def delete_order(order_id):
     """
     try:
         OrderService.delete(order_id)
-        return jsonify({'message': 'Order cancelled'}), 200
+        return respond({'message': 'Order cancelled'}, 200)
     except Exception as e:
         logger.error(f"Error deleting order: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+        return respond({'error': str(e)}, 500)
@@ -1,6 +1,11 @@
 """Product routes"""
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request
 from app.services.product_service import ProductService
+from app.utils.http_cache import entity_response
+from app.utils.responses import respond
+from app.utils.idempotency import idempotent
+from app.utils.export import wants_ndjson, export_response
+from functools import partial
 import logging
 
 logger = logging.getLogger(__name__)
@@ -32,9 +37,13 @@ def get_products():
         in: query
         type: string
         description: Filter by status (active, discontinued)
+    produces:
+      - application/json
+      - application/msgpack
+      - application/x-ndjson
     responses:
       200:
-        description: List of products
+        description: List of products (streamed one JSON object per line with Accept: application/x-ndjson)
         schema:
           type: object
           properties:
@@ -53,11 +62,14 @@ def get_products():
         category = request.args.get('category')
         status = request.args.get('status')
         
+        if wants_ndjson():
+            return export_response(ProductService.iter_all(page, limit, category, status), 'ndjson')
+        
         products = ProductService.get_all(page, limit, category, status)
-        return jsonify({'data': products, 'page': page, 'limit': limit}), 200
+        return respond({'data': products, 'page': page, 'limit': limit}, 200)
     except Exception as e:
         logger.error(f"Error fetching products: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+        return respond({'error': str(e)}, 500)
 
 @product_bp.route('/<int:product_id>', methods=['GET'])
 def get_product(product_id):
@@ -75,19 +87,19 @@ def get_product(product_id):
     responses:
       200:
         description: Product details
+      304:
+        description: Unchanged since If-None-Match / If-Modified-Since
       404:
         description: Product not found
     """
     try:
-        product = ProductService.get_by_id(product_id)
-        if not product:
-            return jsonify({'error': 'Product not found'}), 404
-        return jsonify(product), 200
+        return entity_response('product', product_id, partial(ProductService.get_by_id, product_id), 'Product not found')
     except Exception as e:
         logger.error(f"Error fetching product: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+        return respond({'error': str(e)}, 500)
 
 @product_bp.route('', methods=['POST'])
+@idempotent
 def create_product():
     """
     Create new product
@@ -95,6 +107,11 @@ def create_product():
     tags:
       - Products
     parameters:
+      - name: Idempotency-Key
+        in: header
+        type: string
+        required: false
+        description: Retries with the same key return the first response instead of creating again
       - name: body
         in: body
         required: true
@@ -132,14 +149,16 @@ def create_product():
         description: Product created successfully
       400:
         description: Invalid input
+      422:
+        description: Idempotency-Key reused with a different request body
     """
     try:
         data = request.get_json()
         product = ProductService.create(data)
-        return jsonify(product), 201
+        return respond(product, 201)
     except Exception as e:
         logger.error(f"Error creating product: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+        return respond({'error': str(e)}, 500)
 
 @product_bp.route('/<int:product_id>', methods=['PUT'])
 def update_product(product_id):
@@ -182,11 +201,11 @@ def update_product(product_id):
         data = request.get_json()
         product = ProductService.update(product_id, data)
         if not product:
-            return jsonify({'error': 'Product not found'}), 404
-        return jsonify(product), 200
+            return respond({'error': 'Product not found'}, 404)
+        return respond(product, 200)
     except Exception as e:
         logger.error(f"Error updating product: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+        return respond({'error': str(e)}, 500)
 
 @product_bp.route('/<int:product_id>', methods=['DELETE'])
 def delete_product(product_id):
@@ -209,7 +228,7 @@ def delete_product(product_id):
     """
     try:
         ProductService.delete(product_id)
-        return jsonify({'message': 'Product deleted'}), 200
+        return respond({'message': 'Product deleted'}, 200)
     except Exception as e:
         logger.error(f"Error deleting product: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+        return respond({'error': str(e)}, 500)
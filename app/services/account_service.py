@@ -1,7 +1,11 @@
 """Account service layer"""
-from app.utils.db_connection import execute_query, execute_transaction
+from app.utils.db_connection import execute_query, execute_transaction, update_changed
 from app.utils.query_helpers import QueryBuilder
 
+# Columns update() may change
+UPDATABLE_COLUMNS = ('account_name', 'account_type', 'status', 'billing_address',
+                     'shipping_address', 'phone', 'email')
+
 class AccountService:
     @staticmethod
     def get_all(page=1, limit=50, customer_id=None, status=None):
@@ -32,16 +36,9 @@ class AccountService:
     
     @staticmethod
     def update(account_id, data):
-        query = """
-        UPDATE accounts 
-        SET account_name = ?, account_type = ?, status = ?, billing_address = ?,
-            shipping_address = ?, phone = ?, email = ?, updated_at = GETDATE()
-        WHERE account_id = ?
-        """
-        params = [data.get('account_name'), data.get('account_type'), data.get('status'),
-                  data.get('billing_address'), data.get('shipping_address'), 
-                  data.get('phone'), data.get('email'), account_id]
-        return execute_transaction(query, params)
+        """Write only the columns that changed; True on success (also when none did), None if no such row"""
+        changes = update_changed('accounts', 'account_id', account_id, data, UPDATABLE_COLUMNS)
+        return None if changes is None else True
     
     @staticmethod
     def delete(account_id):
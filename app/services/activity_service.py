@@ -1,14 +1,18 @@
 """Activity service layer"""
-from app.utils.db_connection import execute_query, execute_transaction
+from app.utils.db_connection import execute_query, execute_transaction, update_changed
 from app.utils.query_helpers import QueryBuilder
+from app.utils.reference_data import enrich
+
+# Columns update() may change
+UPDATABLE_COLUMNS = ('subject', 'description', 'activity_date', 'due_date', 'completed_date',
+                     'status', 'priority', 'assigned_user_id')
 
 class ActivityService:
     @staticmethod
     def get_all(page=1, limit=50, customer_id=None, assigned_user_id=None, status=None, activity_type=None):
         query = QueryBuilder('activities a').select("""
-            a.*, c.company_name, u.username as assigned_to
+            a.*, c.company_name
         """).join('LEFT JOIN customers c ON a.customer_id = c.customer_id')
-        query.join('LEFT JOIN users u ON a.assigned_user_id = u.user_id')
         
         if customer_id:
             query.where('a.customer_id = ?', customer_id)
@@ -20,19 +24,19 @@ class ActivityService:
             query.where('a.activity_type = ?', activity_type)
         
         query.order('a.activity_date DESC').paginate(page, limit)
-        return execute_query(query.sql, query.params)
+        return enrich(execute_query(query.sql, query.params),
+                      'users', 'assigned_user_id', {'assigned_to': 'username'})
     
     @staticmethod
     def get_by_id(activity_id):
         query = """
-        SELECT a.*, c.company_name, u.username as assigned_to
+        SELECT a.*, c.company_name
         FROM activities a
         LEFT JOIN customers c ON a.customer_id = c.customer_id
-        LEFT JOIN users u ON a.assigned_user_id = u.user_id
         WHERE a.activity_id = ?
         """
         result = execute_query(query, [activity_id])
-        return result[0] if result else None
+        return enrich(result[0], 'users', 'assigned_user_id', {'assigned_to': 'username'}) if result else None
     
     @staticmethod
     def create(data):
@@ -51,16 +55,9 @@ class ActivityService:
     
     @staticmethod
     def update(activity_id, data):
-        query = """
-        UPDATE activities 
-        SET subject = ?, description = ?, activity_date = ?, due_date = ?, completed_date = ?,
-            status = ?, priority = ?, assigned_user_id = ?, updated_at = GETDATE()
-        WHERE activity_id = ?
-        """
-        params = [data.get('subject'), data.get('description'), data.get('activity_date'),
-                  data.get('due_date'), data.get('completed_date'), data.get('status'),
-                  data.get('priority'), data.get('assigned_user_id'), activity_id]
-        return execute_transaction(query, params)
+        """Write only the columns that changed; True on success (also when none did), None if no such row"""
+        changes = update_changed('activities', 'activity_id', activity_id, data, UPDATABLE_COLUMNS)
+        return None if changes is None else True
     
     @staticmethod
     def delete(activity_id):
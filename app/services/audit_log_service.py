@@ -1,13 +1,18 @@
 """Audit Log service layer"""
-from app.utils.db_connection import execute_query, execute_transaction
+from app.utils.db_connection import execute_query, execute_transaction, after_commit
 from app.utils.query_helpers import QueryBuilder
+from app.utils.reference_data import enrich
+from app.services.audit_writer import audit_writer, audit_insert_statements, AUDIT_COLUMNS
+from config.config import get_config
+from datetime import datetime
+
+# Username of the user who made the change, from the reference data registry
+CHANGED_BY_FIELDS = {'changed_by_username': 'username'}
 
 class AuditLogService:
     @staticmethod
     def get_all(page=1, limit=50, table_name=None, record_id=None, action=None, changed_by=None):
-        query = QueryBuilder('audit_logs a').select("""
-            a.*, u.username as changed_by_username
-        """).join('LEFT JOIN users u ON a.changed_by = u.user_id')
+        query = QueryBuilder('audit_logs a').select('a.*')
         
         if table_name:
             query.where('a.table_name = ?', table_name)
@@ -19,39 +24,44 @@ class AuditLogService:
             query.where('a.changed_by = ?', changed_by)
         
         query.order('a.changed_at DESC').paginate(page, limit)
-        return execute_query(query.sql, query.params)
+        return enrich(execute_query(query.sql, query.params), 'users', 'changed_by', CHANGED_BY_FIELDS)
     
     @staticmethod
     def get_by_id(audit_id):
         query = """
-        SELECT a.*, u.username as changed_by_username
+        SELECT a.*
         FROM audit_logs a
-        LEFT JOIN users u ON a.changed_by = u.user_id
         WHERE a.audit_id = ?
         """
         result = execute_query(query, [audit_id])
-        return result[0] if result else None
+        return enrich(result[0], 'users', 'changed_by', CHANGED_BY_FIELDS) if result else None
     
     @staticmethod
     def create(data):
-        query = """
-        INSERT INTO audit_logs (table_name, record_id, action, old_values, new_values,
-                                changed_by, ip_address, user_agent)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
         """
-        params = [data.get('table_name'), data.get('record_id'), data.get('action'),
-                  data.get('old_values'), data.get('new_values'), data.get('changed_by'),
-                  data.get('ip_address'), data.get('user_agent')]
-        return execute_transaction(query, params)
+        Record an audit event
+        
+        With AUDIT_ASYNC (default) the event is queued for the background
+        audit writer and this returns immediately; False means the queue was
+        full and the event was dropped. Inside unit_of_work() it is queued
+        only once the unit commits (and never if it rolls back), so this
+        returns True.
+        """
+        event = {column: data.get(column) for column in AUDIT_COLUMNS}
+        event['changed_at'] = event['changed_at'] or datetime.now()
+        if get_config().AUDIT_ASYNC:
+            submitted = []
+            after_commit(lambda: submitted.append(audit_writer.submit(event)))
+            return submitted[0] if submitted else True
+        return execute_transaction(audit_insert_statements([event]))
     
     @staticmethod
     def get_record_history(table_name, record_id):
         """Get complete audit history for a specific record"""
         query = """
-        SELECT a.*, u.username as changed_by_username
+        SELECT a.*
         FROM audit_logs a
-        LEFT JOIN users u ON a.changed_by = u.user_id
         WHERE a.table_name = ? AND a.record_id = ?
         ORDER BY a.changed_at DESC
         """
-        return execute_query(query, [table_name, record_id])
+        return enrich(execute_query(query, [table_name, record_id]), 'users', 'changed_by', CHANGED_BY_FIELDS)
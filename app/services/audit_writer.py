@@ -0,0 +1,197 @@
+"""
+Audit writer
+Takes audit events off the request path: AuditLogService.create() puts them
+on a bounded in-process queue and a background thread writes them with
+multi-row INSERTs, flushing every AUDIT_BATCH_SIZE events or
+AUDIT_FLUSH_MS milliseconds, whichever comes first. When the queue is full
+callers wait up to AUDIT_ENQUEUE_TIMEOUT_MS (backpressure) and the event is
+dropped after that. Pending events are flushed at interpreter exit;
+stats() (reported by GET /health) counts waits, drops and lost rows. Each
+event's changed_at is taken when it is submitted, not when it is written;
+if a batch insert fails, its rows are retried one by one so a single bad
+row does not take the others with it.
+"""
+import atexit
+import logging
+import time
+from datetime import datetime
+from queue import Queue, Empty, Full
+from threading import Event, Lock, Thread
+from app.utils.db_connection import execute_transaction
+from config.config import get_config
+
+logger = logging.getLogger(__name__)
+
+AUDIT_COLUMNS = ('table_name', 'record_id', 'action', 'old_values', 'new_values',
+                 'changed_by', 'changed_at', 'ip_address', 'user_agent')
+
+# Rows per INSERT statement, within SQL Server's 2100 parameters
+INSERT_BATCH = 2000 // len(AUDIT_COLUMNS)
+
+
+def audit_insert_statements(events):
+    """(query, params) multi-row INSERTs for a list of audit event dicts"""
+    statements = []
+    placeholders = '(' + ', '.join('?' for _ in AUDIT_COLUMNS) + ')'
+    for start in range(0, len(events), INSERT_BATCH):
+        batch = events[start:start + INSERT_BATCH]
+        statements.append((
+            f"INSERT INTO audit_logs ({', '.join(AUDIT_COLUMNS)}) VALUES "
+            + ', '.join(placeholders for _ in batch),
+            [event.get(column) for event in batch for column in AUDIT_COLUMNS]
+        ))
+    return statements
+
+
+class AuditWriter:
+    """Bounded queue of audit events with a batching background writer"""
+
+    def __init__(self, queue_size=10000, batch_size=200, flush_ms=250, enqueue_timeout_ms=5):
+        self.batch_size = batch_size
+        self.flush_interval = flush_ms / 1000
+        self.enqueue_timeout = enqueue_timeout_ms / 1000
+        self._queue = Queue(maxsize=queue_size)
+        self._stop = Event()
+        self._start_lock = Lock()
+        self._stats_lock = Lock()
+        self._thread = None
+        self.enqueued = 0
+        self.written = 0
+        self.batches = 0
+        self.backpressured = 0
+        self.dropped = 0
+        self.failed = 0
+        atexit.register(self.stop)
+
+    def submit(self, event):
+        """
+        Queue an audit event (dict with AUDIT_COLUMNS keys)
+
+        changed_at defaults to now, so the row records when the change
+        happened rather than when its batch was flushed.
+
+        Returns:
+            True if queued, False if the queue stayed full and it was dropped
+        """
+        if event.get('changed_at') is None:
+            event = dict(event, changed_at=datetime.now())
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(event)
+        except Full:
+            self._count('backpressured')
+            try:
+                self._queue.put(event, timeout=self.enqueue_timeout)
+            except Full:
+                dropped = self._count('dropped')
+                if dropped == 1 or dropped % 1000 == 0:
+                    logger.warning(f"Audit queue full, {dropped} event(s) dropped so far")
+                return False
+        self._count('enqueued')
+        return True
+
+    def _count(self, name, amount=1):
+        """Add to a counter (submitters, the writer thread and flush() all count); returns the new value"""
+        with self._stats_lock:
+            value = getattr(self, name) + amount
+            setattr(self, name, value)
+            return value
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = Thread(target=self._run, name='audit-writer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._collect()
+            if batch:
+                self._write(batch)
+
+    def _collect(self):
+        """Block for the first event, then take more until the batch is full or the interval ends"""
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        try:
+            execute_transaction(audit_insert_statements(batch))
+            self._count('written', len(batch))
+            self._count('batches')
+        except Exception as e:
+            logger.error(f"Error writing {len(batch)} audit events, retrying them one by one: {str(e)}")
+            self._write_each(batch)
+
+    def _write_each(self, batch):
+        """Insert rows individually after a failed batch; logs the ones that still fail"""
+        lost = []
+        for event in batch:
+            try:
+                execute_transaction(audit_insert_statements([event]))
+                self._count('written')
+            except Exception as e:
+                lost.append((event, e))
+        if lost:
+            self._count('failed', len(lost))
+            logger.error(f"Lost {len(lost)} of {len(batch)} audit events: " + '; '.join(
+                f"{event.get('action')} {event.get('table_name')} {event.get('record_id')} "
+                f"at {event.get('changed_at')} ({str(e)})"
+                for event, e in lost
+            ))
+
+    def flush(self):
+        """Write everything queued so far from the calling thread"""
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except Empty:
+                break
+        if batch:
+            self._write(batch)
+        return len(batch)
+
+    def stop(self):
+        """Stop the writer thread and flush pending events"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval * 2 + 5)
+        self.flush()
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'queued': self._queue.qsize(),
+                'capacity': self._queue.maxsize,
+                'enqueued': self.enqueued,
+                'written': self.written,
+                'batches': self.batches,
+                'backpressured': self.backpressured,
+                'dropped': self.dropped,
+                'failed': self.failed
+            }
+
+
+_config = get_config()
+audit_writer = AuditWriter(
+    queue_size=_config.AUDIT_QUEUE_SIZE,
+    batch_size=_config.AUDIT_BATCH_SIZE,
+    flush_ms=_config.AUDIT_FLUSH_MS,
+    enqueue_timeout_ms=_config.AUDIT_ENQUEUE_TIMEOUT_MS
+)
@@ -0,0 +1,117 @@
+"""
+Change feed service layer
+Incremental sync for clients that keep a local copy of a table: rows are
+read in (updated_at, id) order after the position named by an opaque
+token, so each page is one index seek however large the table is. Soft
+deletes (customer status 'inactive', product is_active 0, order_status
+'cancelled') come back as ids in `deleted`; writes stamp updated_at, which
+is what the feed follows.
+"""
+import base64
+import binascii
+from app.utils.db_connection import execute_query
+from app.utils.query_helpers import QueryBuilder
+from config.config import get_config
+
+# Entity -> table, key and soft-delete marker. Inventory rows are deleted
+# outright, so its feed only reports inserts and updates.
+FEEDS = {
+    'customers': {'table': 'customers', 'key': 'customer_id', 'columns': '*',
+                  'deleted': ('status', 'inactive')},
+    'products': {'table': 'products', 'key': 'product_id', 'columns': '*',
+                 'deleted': ('is_active', 0)},
+    'orders': {'table': 'orders', 'key': 'order_id', 'columns': '*',
+               'deleted': ('order_status', 'cancelled')},
+    'inventory': {'table': 'inventory', 'key': 'inventory_id',
+                  'columns': 'inventory_id, product_id, warehouse_id, quantity_on_hand, quantity_reserved, '
+                             'quantity_available, bin_location, last_stock_check, last_restock_date, '
+                             'created_at, updated_at',
+                  'deleted': None}
+}
+
+# updated_at at full DATETIME2 precision, so the token round-trips exactly
+_STAMP = 'CONVERT(VARCHAR(27), updated_at, 121)'
+
+# Position before every row
+_ORIGIN = ('0001-01-01 00:00:00.0000000', 0)
+
+
+class InvalidChangeToken(ValueError):
+    """Raised when a `since` token is malformed or belongs to another entity"""
+
+
+def encode_token(entity, stamp, key):
+    """Opaque token for the position after the row (stamp, key) of an entity"""
+    raw = f"{entity}|{stamp}|{key}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_token(entity, token):
+    """(stamp, key) position named by a token; the origin when token is empty"""
+    if not token:
+        return _ORIGIN
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+        token_entity, stamp, key = raw.split('|')
+        key = int(key)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidChangeToken('Malformed change token')
+    if token_entity != entity:
+        raise InvalidChangeToken(f'Change token is not for {entity}')
+    return stamp, key
+
+
+class ChangeFeedService:
+    @staticmethod
+    def get_changes(entity, since=None, limit=None):
+        """
+        Rows of `entity` changed after the `since` token
+
+        Only rows last written more than CHANGE_FEED_LAG_MS ago are read:
+        updated_at is stamped when a statement runs, not when it commits, so
+        a younger row could still be joined by an older, uncommitted one.
+
+        Args:
+            entity: Key of FEEDS
+            since: Token from a previous response (None for a full sync)
+            limit: Rows per page, capped at CHANGE_FEED_MAX_LIMIT
+
+        Returns:
+            Dict with changed rows in `data`, soft-deleted ids in `deleted`,
+            the token to resume from in `next` (never behind `since`) and
+            `has_more` when another page is ready now
+
+        Raises:
+            KeyError: Unknown entity
+            InvalidChangeToken: Malformed token
+        """
+        feed = FEEDS[entity]
+        config = get_config()
+        limit = min(max(int(limit or config.CHANGE_FEED_PAGE_SIZE), 1), config.CHANGE_FEED_MAX_LIMIT)
+        stamp, last_key = decode_token(entity, since)
+        key = feed['key']
+
+        query = QueryBuilder(feed['table']).select(f"{feed['columns']}, {_STAMP} AS change_stamp")
+        query.where(f'(updated_at > CAST(? AS DATETIME2) OR (updated_at = CAST(? AS DATETIME2) AND {key} > ?))',
+                    [stamp, stamp, last_key])
+        query.where('updated_at <= DATEADD(millisecond, ?, SYSDATETIME())', [-config.CHANGE_FEED_LAG_MS])
+        query.order('updated_at').order(key).limit(limit + 1)
+        rows = execute_query(query.sql, query.params)
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        data, deleted = [], []
+        for row in rows:
+            stamp, last_key = row.pop('change_stamp'), row[key]
+            marker = feed['deleted']
+            if marker and row.get(marker[0]) == marker[1]:
+                deleted.append(row[key])
+            else:
+                data.append(row)
+
+        return {
+            'data': data,
+            'deleted': deleted,
+            'next': encode_token(entity, stamp, last_key),
+            'has_more': has_more
+        }
@@ -1,7 +1,11 @@
 """Contact service layer"""
-from app.utils.db_connection import execute_query, execute_transaction
+from app.utils.db_connection import execute_query, execute_transaction, update_changed
 from app.utils.query_helpers import QueryBuilder
 
+# Columns update() may change
+UPDATABLE_COLUMNS = ('first_name', 'last_name', 'title', 'department', 'email', 'phone', 'mobile',
+                     'is_primary', 'status', 'notes')
+
 class ContactService:
     @staticmethod
     def get_all(page=1, limit=50, customer_id=None, account_id=None):
@@ -33,17 +37,9 @@ class ContactService:
     
     @staticmethod
     def update(contact_id, data):
-        query = """
-        UPDATE contacts 
-        SET first_name = ?, last_name = ?, title = ?, department = ?, email = ?,
-            phone = ?, mobile = ?, is_primary = ?, status = ?, notes = ?, updated_at = GETDATE()
-        WHERE contact_id = ?
-        """
-        params = [data.get('first_name'), data.get('last_name'), data.get('title'),
-                  data.get('department'), data.get('email'), data.get('phone'),
-                  data.get('mobile'), data.get('is_primary'), data.get('status'),
-                  data.get('notes'), contact_id]
-        return execute_transaction(query, params)
+        """Write only the columns that changed; True on success (also when none did), None if no such row"""
+        changes = update_changed('contacts', 'contact_id', contact_id, data, UPDATABLE_COLUMNS)
+        return None if changes is None else True
     
     @staticmethod
     def delete(contact_id):
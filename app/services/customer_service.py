@@ -1,20 +1,29 @@
 """Customer service layer"""
-from app.utils.db_connection import get_connection
-from app.utils.query_helpers import QueryBuilder, rows_to_dict_list
+from app.utils.db_connection import get_connection, stream_query
+from app.utils.query_helpers import QueryBuilder, build_insert_query, build_update_query, changed_columns, rows_to_dict_list, row_to_dict
+from app.utils.http_cache import invalidate_reports
+from app.utils.entity_cache import get_entity, put_entity
+from config.config import get_config
 from app.models.customer import Customer
 import logging
 
 logger = logging.getLogger(__name__)
 
 class CustomerService:
+    @staticmethod
+    def _list_query(page, limit, status=None):
+        """Paginated list query shared by get_all and iter_all"""
+        query = QueryBuilder('customers').select('*')
+        if status:
+            query.where('status = ?', status)
+        query.order('created_at', 'DESC').paginate(page, limit)
+        return query
+    
     @staticmethod
     def get_all(page=1, limit=50, status=None):
         """Get all customers with pagination"""
         with get_connection() as conn:
-            query = QueryBuilder('customers').select('*')
-            if status:
-                query.where('status = ?', status)
-            query.order('created_at', 'DESC').paginate(page, limit)
+            query = CustomerService._list_query(page, limit, status)
             
             cursor = conn.cursor()
             cursor.execute(query.sql, query.params)
@@ -22,9 +31,20 @@ class CustomerService:
             columns = [column[0] for column in cursor.description]
             return [dict(zip(columns, row)) for row in rows]
     
+    @staticmethod
+    def iter_all(page=1, limit=50, status=None, chunk_size=None):
+        """Same page as get_all, streamed from the cursor in chunks of rows"""
+        query = CustomerService._list_query(page, limit, status)
+        return stream_query(query.sql, query.params, chunk_size or get_config().EXPORT_CHUNK_SIZE)
+    
     @staticmethod
     def get_by_id(customer_id):
-        """Get customer by ID"""
+        """Get customer by ID (read through the entity cache)"""
+        return get_entity('customer', customer_id, lambda: CustomerService._fetch_by_id(customer_id))
+    
+    @staticmethod
+    def _fetch_by_id(customer_id):
+        """Read a customer row from the database"""
         with get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute('SELECT * FROM customers WHERE customer_id = ?', (customer_id,))
@@ -35,23 +55,41 @@ class CustomerService:
     def create(data):
         """Create new customer"""
         with get_connection() as conn:
-            query = QueryBuilder('customers').build_insert_query(data)
+            query, params = build_insert_query('customers', data, returning=True)
             cursor = conn.cursor()
-            cursor.execute(query.sql, query.params)
-            cursor.execute('SELECT @@IDENTITY')
-            customer_id = cursor.fetchone()[0]
+            cursor.execute(query, params)
+            created = row_to_dict(cursor, cursor.fetchone())
             conn.commit()
-            return CustomerService.get_by_id(customer_id)
+            invalidate_reports()
+            return put_entity('customer', created['customer_id'], created)
     
     @staticmethod
     def update(customer_id, data):
-        """Update customer"""
+        """
+        Update the customer's changed columns
+        
+        `data` is diffed against the row read with an update lock in the
+        same transaction (never the cached copy, which another worker may
+        have left stale); only columns whose values differ are written, and
+        nothing is written when none do.
+        """
         with get_connection() as conn:
-            query = QueryBuilder('customers').build_update_query(data, f'customer_id = {customer_id}')
             cursor = conn.cursor()
-            cursor.execute(query.sql, query.params)
+            cursor.execute('SELECT * FROM customers WITH (UPDLOCK, ROWLOCK) WHERE customer_id = ?', (customer_id,))
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            current = row_to_dict(cursor, row)
+            changes = changed_columns(current, data, [column for column in current if column != 'customer_id'])
+            if not changes:
+                return put_entity('customer', customer_id, current)
+            query, params = build_update_query('customers', changes, 'customer_id = ?', (customer_id,),
+                                               touch_column='updated_at', returning=True)
+            cursor.execute(query, params)
+            updated = row_to_dict(cursor, cursor.fetchone())
             conn.commit()
-            return CustomerService.get_by_id(customer_id)
+            invalidate_reports()
+            return put_entity('customer', customer_id, updated)
     
     @staticmethod
     def delete(customer_id):
@@ -0,0 +1,314 @@
+"""
+Inventory delta queue
+Coalesces stock adjustments (scanner counts, receipts, picks) per
+(product_id, warehouse_id) for a few milliseconds and applies each flush as
+one set-based UPDATE. Every delta is appended to a local journal before it
+is acknowledged, and a checkpoint is appended after each committed flush.
+Each process writes its own journal (INVENTORY_JOURNAL_PATH plus a
+pid-based suffix) and holds an flock on it while alive; on startup a
+process adopts the journals whose owners have died, replaying deltas after
+their last checkpoint. A crash between a commit and its checkpoint replays
+that flush, so delivery is at-least-once. Deltas for (product, warehouse)
+pairs without an inventory row are counted as `missing` and logged. A
+process forked after start() (gunicorn --preload workers) starts its own
+journal and flush thread.
+"""
+import fcntl
+import glob
+import json
+import logging
+import os
+import uuid
+from threading import Event, Lock, Thread
+from app.utils.db_connection import get_db_connection, with_retry
+from config.config import get_config
+
+logger = logging.getLogger(__name__)
+
+# (product_id, warehouse_id, delta) rows per statement, within SQL Server's 2100 parameters
+FLUSH_BATCH = 500
+
+_APPLY_SQL = """
+UPDATE i
+SET quantity_on_hand = i.quantity_on_hand + d.delta, updated_at = GETDATE()
+OUTPUT INSERTED.product_id, INSERTED.warehouse_id
+FROM inventory i
+JOIN (VALUES {rows}) AS d(product_id, warehouse_id, delta)
+  ON d.product_id = i.product_id AND d.warehouse_id = i.warehouse_id
+"""
+
+
+class InventoryDeltaQueue:
+    """Journaled, coalescing buffer of quantity_on_hand deltas"""
+
+    def __init__(self, journal_path, window_ms=5, fsync=False, compact_bytes=1048576):
+        self.journal_path = journal_path
+        self.own_journal = None
+        self.window = window_ms / 1000
+        self.fsync = fsync
+        self.compact_bytes = compact_bytes
+        self._pending = {}
+        self._seq = 0
+        self._lock = Lock()
+        self._flush_lock = Lock()
+        self._wake = Event()
+        self._stop = Event()
+        self._thread = None
+        self._fd = None
+        self._pid = None
+        self._started = False
+        self.deltas = 0
+        self.flushes = 0
+        self.rows_written = 0
+        self.replayed = 0
+        self.missing = 0
+        self.failures = 0
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _open_journal(self):
+        """Create this process's journal and hold an flock on it until exit"""
+        if self._fd is not None:
+            # Forked from the process that owns that journal: its deltas are its own to flush
+            os.close(self._fd)
+            self._pending = {}
+            self._seq = 0
+        directory = os.path.dirname(self.journal_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.own_journal = f"{self.journal_path}.{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._fd = os.open(self.own_journal, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        fcntl.flock(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        self._pid = os.getpid()
+
+    def _append(self, record):
+        os.write(self._fd, (json.dumps(record, separators=(',', ':')) + '\n').encode())
+        if self.fsync:
+            os.fsync(self._fd)
+
+    def start(self):
+        """Queue unflushed journal entries for replay and start the flush thread"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._open_journal()
+        self._replay()
+        self._stop.clear()
+        self._thread = Thread(target=self._run, name='inventory-delta-flush', daemon=True)
+        self._thread.start()
+        self._started = True
+        logger.info(f"Inventory delta queue started (window {self.window * 1000:g} ms, journal {self.journal_path})")
+
+    def _after_fork(self):
+        """In a forked child: fresh locks, and a flush thread of its own if the parent ran one"""
+        # Another thread may have held these at the fork
+        self._lock = Lock()
+        self._flush_lock = Lock()
+        self._wake = Event()
+        self._stop = Event()
+        self._thread = None
+        if self._started:
+            self.start()
+
+    def _replay(self):
+        """Adopt the journals of processes that have exited"""
+        for path in sorted(glob.glob(f"{self.journal_path}.*")) + [self.journal_path]:
+            if path != self.own_journal and os.path.exists(path):
+                self._adopt(path)
+        if self.replayed:
+            # Applied (and checkpointed) by the first flush
+            self._wake.set()
+
+    def _adopt(self, path):
+        try:
+            fd = os.open(path, os.O_RDWR)
+        except FileNotFoundError:
+            return
+        try:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return  # owner still running
+            try:
+                current = os.stat(path)
+            except FileNotFoundError:
+                return  # adopted and removed by another process since we opened it
+            opened = os.fstat(fd)
+            if (opened.st_dev, opened.st_ino) != (current.st_dev, current.st_ino):
+                return  # path now names a different file
+            entries, checkpoint = [], 0
+            with os.fdopen(os.dup(fd)) as journal:
+                for line in journal:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break  # torn final write
+                    if 'checkpoint' in record:
+                        checkpoint = record['checkpoint']
+                    else:
+                        entries.append(record)
+            entries = [record for record in entries if record['seq'] > checkpoint]
+            # Re-journal under this process before the old file goes away
+            with self._lock:
+                for record in entries:
+                    self._queue(record['product_id'], record['warehouse_id'], record['delta'])
+            self.replayed += len(entries)
+            os.unlink(path)
+            if entries:
+                logger.warning(f"Replaying {len(entries)} unflushed inventory deltas from {path}")
+        finally:
+            os.close(fd)
+
+    def add(self, product_id, warehouse_id, delta):
+        """
+        Queue a quantity_on_hand adjustment; returns once it is journaled
+
+        The database is updated by the next flush, within the coalescing window.
+        """
+        with self._lock:
+            self._queue(product_id, warehouse_id, delta)
+            self.deltas += 1
+        self._wake.set()
+
+    def _queue(self, product_id, warehouse_id, delta):
+        # Caller holds self._lock
+        if self._pid != os.getpid():
+            # First use, or a forked child: never append to another process's journal
+            self._open_journal()
+        self._seq += 1
+        self._append({'seq': self._seq, 'product_id': product_id,
+                      'warehouse_id': warehouse_id, 'delta': delta})
+        key = (product_id, warehouse_id)
+        self._pending[key] = self._pending.get(key, 0) + delta
+
+    def settle(self, product_id, warehouse_id):
+        """
+        Apply this process's pending delta for a bin before an absolute write to it
+
+        Waits for a flush in progress (which may hold the delta). Deltas
+        buffered by other processes are not seen.
+
+        Raises:
+            RuntimeError: The pending delta could not be written
+        """
+        key = (product_id, warehouse_id)
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending.get(key):
+                    return
+        failures = self.failures
+        self.flush()
+        if self.failures != failures:
+            raise RuntimeError(f"Pending stock adjustments for product {product_id} in warehouse "
+                               f"{warehouse_id} could not be applied")
+
+    def flush(self):
+        """Apply everything buffered so far; returns the number of rows updated"""
+        with self._flush_lock:
+            with self._lock:
+                if self._fd is not None and self._pid != os.getpid():
+                    self._open_journal()
+                pending, self._pending = self._pending, {}
+                high = self._seq
+            pending = {key: delta for key, delta in pending.items() if delta}
+            if not pending:
+                return 0
+            try:
+                applied = self._apply(pending)
+            except Exception as e:
+                # Keep the deltas (and their journal entries) for the next flush
+                self.failures += 1
+                logger.error(f"Error flushing {len(pending)} inventory deltas: {str(e)}")
+                with self._lock:
+                    for key, delta in pending.items():
+                        self._pending[key] = self._pending.get(key, 0) + delta
+                self._wake.set()
+                return 0
+            missing = sorted(key for key in pending if key not in applied)
+            if missing:
+                self.missing += len(missing)
+                logger.warning(f"Dropped inventory deltas for {len(missing)} (product_id, warehouse_id) pair(s) "
+                               f"without an inventory row: "
+                               + ', '.join(f"{key}: {pending[key]:+d}" for key in missing[:20])
+                               + (' ...' if len(missing) > 20 else ''))
+            with self._lock:
+                self.flushes += 1
+                self.rows_written += len(applied)
+                self._append({'checkpoint': high})
+                # Only this process writes its journal, so compacting it loses nothing
+                if self._seq == high and os.fstat(self._fd).st_size > self.compact_bytes:
+                    os.ftruncate(self._fd, 0)
+            return len(applied)
+
+    def _apply(self, pending):
+        """Write the deltas in one transaction; returns the (product_id, warehouse_id) pairs updated"""
+        items = sorted(pending.items())
+        statements = []
+        for start in range(0, len(items), FLUSH_BATCH):
+            batch = items[start:start + FLUSH_BATCH]
+            statements.append((
+                _APPLY_SQL.format(rows=', '.join('(?, ?, ?)' for _ in batch)),
+                [value for (product_id, warehouse_id), delta in batch
+                 for value in (product_id, warehouse_id, delta)]
+            ))
+
+        def run():
+            applied = set()
+            with get_db_connection() as conn:
+                cursor = conn.cursor()
+                for query, params in statements:
+                    cursor.execute(query, params)
+                    applied.update((row[0], row[1]) for row in cursor.fetchall())
+                conn.commit()
+            return applied
+
+        # Deltas are not idempotent: retry only when the transaction surely rolled back
+        return with_retry(run, idempotent=False)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait()
+            self._wake.clear()
+            # Let more deltas for the same bins arrive before writing
+            self._stop.wait(self.window)
+            if not self.flush() and self._pending:
+                self._stop.wait(1)  # flush failed; retry once a second
+
+    def stop(self):
+        """Flush what is buffered and stop the flush thread"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.flush()
+        with self._lock:
+            if not self._pending and self._fd is not None and self._pid == os.getpid():
+                # Everything is applied; nothing left for another process to adopt
+                os.unlink(self.own_journal)
+                os.close(self._fd)
+                self._fd = self._pid = None
+        stats = self.stats()
+        logger.info(f"Inventory delta queue stopped: {stats['deltas']} deltas in {stats['rows_written']} "
+                    f"row updates (coalescing ratio {stats['coalescing_ratio']}), {stats['pending']} pending")
+
+    def stats(self):
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            'deltas': self.deltas,
+            'flushes': self.flushes,
+            'rows_written': self.rows_written,
+            'coalescing_ratio': round(self.deltas / self.rows_written, 2) if self.rows_written else 0.0,
+            'pending': pending,
+            'replayed': self.replayed,
+            'missing': self.missing,
+            'failures': self.failures
+        }
+
+
+_config = get_config()
+inventory_deltas = InventoryDeltaQueue(
+    _config.INVENTORY_JOURNAL_PATH,
+    window_ms=_config.INVENTORY_COALESCE_MS,
+    fsync=_config.INVENTORY_JOURNAL_FSYNC
+)
@@ -1,14 +1,54 @@
 """Inventory service layer"""
-from app.utils.db_connection import execute_query, execute_transaction
-from app.utils.query_helpers import QueryBuilder
+from app.utils.db_connection import execute_query, execute_transaction, update_changed
+from app.utils.query_helpers import QueryBuilder, build_in_condition
+from app.utils.reference_data import enrich
+from app.services.inventory_deltas import inventory_deltas
+
+# Columns update() may change
+UPDATABLE_COLUMNS = ('quantity_on_hand', 'quantity_reserved', 'bin_location', 'last_stock_check',
+                     'last_restock_date')
+
+
+class InsufficientStockError(Exception):
+    """Raised when available stock cannot cover a reservation"""
+
+    def __init__(self, warehouse_id, shortages):
+        self.warehouse_id = warehouse_id
+        self.shortages = shortages
+        products = ', '.join(str(s['product_id']) for s in shortages)
+        super().__init__(f"Insufficient stock in warehouse {warehouse_id} for product(s) {products}")
+
+
+# Set-based reservation: one statement for every product of an order. Rows
+# only match while enough stock is available, so a concurrent reservation
+# can never drive quantity_available below zero.
+_RESERVE_SQL = """
+UPDATE i
+SET quantity_reserved = i.quantity_reserved + r.quantity, updated_at = GETDATE()
+OUTPUT INSERTED.product_id
+FROM inventory i
+JOIN (VALUES {rows}) AS r(product_id, quantity) ON r.product_id = i.product_id
+WHERE i.warehouse_id = ? AND i.quantity_available >= r.quantity
+"""
+
+# Gives back what an order's items reserved; never drives quantity_reserved
+# below zero, so a release that has already happened elsewhere is harmless
+_RELEASE_SQL = """
+UPDATE i
+SET quantity_reserved = CASE WHEN i.quantity_reserved > r.quantity THEN i.quantity_reserved - r.quantity ELSE 0 END,
+    updated_at = GETDATE()
+FROM inventory i
+JOIN (SELECT product_id, SUM(quantity) AS quantity FROM order_items WHERE order_id = ? GROUP BY product_id)
+    AS r ON r.product_id = i.product_id
+WHERE i.warehouse_id = ?
+"""
 
 class InventoryService:
     @staticmethod
     def get_all(page=1, limit=50, product_id=None, warehouse_id=None, low_stock=False):
         query = QueryBuilder('inventory i').select("""
-            i.*, p.product_name, p.product_code, w.warehouse_name
-        """).join('products p ON i.product_id = p.product_id')
-        query.join('warehouses w ON i.warehouse_id = w.warehouse_id')
+            i.*, p.product_name, p.product_code
+        """).join('JOIN products p ON i.product_id = p.product_id')
         
         if product_id:
             query.where('i.product_id = ?', product_id)
@@ -18,19 +58,19 @@ class InventoryService:
             query.where('i.quantity_available <= p.reorder_level')
         
         query.order('i.updated_at DESC').paginate(page, limit)
-        return execute_query(query.sql, query.params)
+        return enrich(execute_query(query.sql, query.params),
+                      'warehouses', 'warehouse_id', {'warehouse_name': 'warehouse_name'})
     
     @staticmethod
     def get_by_id(inventory_id):
         query = """
-        SELECT i.*, p.product_name, p.product_code, w.warehouse_name
+        SELECT i.*, p.product_name, p.product_code
         FROM inventory i
         JOIN products p ON i.product_id = p.product_id
-        JOIN warehouses w ON i.warehouse_id = w.warehouse_id
         WHERE i.inventory_id = ?
         """
         result = execute_query(query, [inventory_id])
-        return result[0] if result else None
+        return enrich(result[0], 'warehouses', 'warehouse_id', {'warehouse_name': 'warehouse_name'}) if result else None
     
     @staticmethod
     def create(data):
@@ -47,17 +87,75 @@ class InventoryService:
     
     @staticmethod
     def update(inventory_id, data):
-        query = """
-        UPDATE inventory 
-        SET quantity_on_hand = ?, quantity_reserved = ?, bin_location = ?,
-            last_stock_check = ?, last_restock_date = ?, updated_at = GETDATE()
-        WHERE inventory_id = ?
-        """
-        params = [data.get('quantity_on_hand'), data.get('quantity_reserved'),
-                  data.get('bin_location'), data.get('last_stock_check'),
-                  data.get('last_restock_date'), inventory_id]
-        return execute_transaction(query, params)
+        """
+        Write only the columns that changed; True on success (also when none did), None if no such row
+        
+        An absolute quantity_on_hand is written only after this process's
+        pending adjustments for the bin are applied, so a later flush cannot
+        add them on top of the new count.
+        """
+        if inventory_deltas.window > 0 and 'quantity_on_hand' in data:
+            rows = execute_query('SELECT product_id, warehouse_id FROM inventory WHERE inventory_id = ?',
+                                 [inventory_id])
+            if rows:
+                inventory_deltas.settle(rows[0]['product_id'], rows[0]['warehouse_id'])
+        changes = update_changed('inventory', 'inventory_id', inventory_id, data, UPDATABLE_COLUMNS)
+        return None if changes is None else True
+    
+    @staticmethod
+    def adjust(product_id, warehouse_id, delta):
+        """
+        Add `delta` (negative to remove) to quantity_on_hand
+        
+        With INVENTORY_COALESCE_MS > 0 the delta is journaled and applied by
+        the delta queue's next flush together with other deltas for the
+        same bins; otherwise it is written immediately.
+        """
+        if inventory_deltas.window > 0:
+            inventory_deltas.add(product_id, warehouse_id, delta)
+            return True
+        return execute_transaction([(
+            'UPDATE inventory SET quantity_on_hand = quantity_on_hand + ?, updated_at = GETDATE() '
+            'WHERE product_id = ? AND warehouse_id = ?',
+            [delta, product_id, warehouse_id]
+        )])
     
     @staticmethod
     def delete(inventory_id):
         return execute_transaction('DELETE FROM inventory WHERE inventory_id = ?', [inventory_id])
+    
+    @staticmethod
+    def reserve(cursor, warehouse_id, quantities):
+        """
+        Reserve stock for several products inside the caller's transaction
+        
+        Args:
+            cursor: Cursor of the open transaction
+            warehouse_id: Warehouse to reserve from
+            quantities: Dict of {product_id: quantity}
+        
+        Raises:
+            InsufficientStockError: Some product lacks available stock; the
+                caller must roll back, since the others were reserved
+        """
+        items = sorted(quantities.items())
+        params = [value for item in items for value in item] + [warehouse_id]
+        cursor.execute(_RESERVE_SQL.format(rows=', '.join('(?, ?)' for _ in items)), params)
+        reserved = {row[0] for row in cursor.fetchall()}
+        
+        missing = [product_id for product_id, _ in items if product_id not in reserved]
+        if missing:
+            condition, in_params = build_in_condition('product_id', missing)
+            cursor.execute(f'SELECT product_id, quantity_available FROM inventory '
+                           f'WHERE warehouse_id = ? AND {condition}', [warehouse_id] + in_params)
+            available = {row[0]: row[1] for row in cursor.fetchall()}
+            raise InsufficientStockError(warehouse_id, [
+                {'product_id': product_id, 'requested': quantities[product_id],
+                 'available': available.get(product_id, 0)}
+                for product_id in missing
+            ])
+    
+    @staticmethod
+    def release(cursor, warehouse_id, order_id):
+        """Give back the stock an order's items reserved, inside the caller's transaction"""
+        cursor.execute(_RELEASE_SQL, [order_id, warehouse_id])
@@ -1,7 +1,11 @@
 """Invoice service layer"""
-from app.utils.db_connection import execute_query, execute_transaction
+from app.utils.db_connection import execute_query, execute_transaction, update_changed
 from app.utils.query_helpers import QueryBuilder
 
+# Columns update() may change
+UPDATABLE_COLUMNS = ('due_date', 'subtotal', 'tax_amount', 'total_amount', 'amount_paid',
+                     'invoice_status', 'payment_terms', 'notes')
+
 class InvoiceService:
     @staticmethod
     def get_all(page=1, limit=50, customer_id=None, status=None, overdue=False):
@@ -49,16 +53,9 @@ class InvoiceService:
     
     @staticmethod
     def update(invoice_id, data):
-        query = """
-        UPDATE invoices 
-        SET due_date = ?, subtotal = ?, tax_amount = ?, total_amount = ?, amount_paid = ?,
-            invoice_status = ?, payment_terms = ?, notes = ?, updated_at = GETDATE()
-        WHERE invoice_id = ?
-        """
-        params = [data.get('due_date'), data.get('subtotal'), data.get('tax_amount'),
-                  data.get('total_amount'), data.get('amount_paid'), data.get('invoice_status'),
-                  data.get('payment_terms'), data.get('notes'), invoice_id]
-        return execute_transaction(query, params)
+        """Write only the columns that changed; True on success (also when none did), None if no such row"""
+        changes = update_changed('invoices', 'invoice_id', invoice_id, data, UPDATABLE_COLUMNS)
+        return None if changes is None else True
     
     @staticmethod
     def delete(invoice_id):
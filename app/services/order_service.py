@@ -1,22 +1,48 @@
 """Order service layer"""
-from app.utils.db_connection import get_connection
-from app.utils.query_helpers import QueryBuilder, rows_to_dict_list
+from app.utils.db_connection import get_connection, stream_query, after_commit
+from app.utils.query_helpers import QueryBuilder, build_insert_query, build_update_query, build_in_condition, changed_columns, rows_to_dict_list, row_to_dict
+from app.utils.sales_rollup import SalesRollup
+from app.services.inventory_service import InventoryService
+from app.services.reservation_engine import reservation_engine
+from app.utils.http_cache import invalidate_reports
+from app.utils.entity_cache import get_entity, put_entity
+from config.config import get_config
 from app.models.order import Order
+from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
 import logging
+import uuid
 
 logger = logging.getLogger(__name__)
 
+CENT = Decimal('0.01')
+
+ORDER_ITEM_COLUMNS = ('order_id', 'product_id', 'quantity', 'unit_price', 'discount_percent', 'tax_rate', 'line_total')
+
+# SQL Server allows 2100 parameters per statement and 1000 rows per VALUES list
+ORDER_ITEM_BATCH = min(1000, 2000 // len(ORDER_ITEM_COLUMNS))
+
+
+def _money(value):
+    return Decimal(str(value or 0)).quantize(CENT, rounding=ROUND_HALF_UP)
+
 class OrderService:
+    @staticmethod
+    def _list_query(page, limit, customer_id=None, status=None):
+        """Paginated list query shared by get_all and iter_all"""
+        query = QueryBuilder('orders').select('*')
+        if customer_id:
+            query.where('customer_id = ?', customer_id)
+        if status:
+            query.where('status = ?', status)
+        query.order('order_date', 'DESC').paginate(page, limit)
+        return query
+    
     @staticmethod
     def get_all(page=1, limit=50, customer_id=None, status=None):
         """Get all orders with pagination"""
         with get_connection() as conn:
-            query = QueryBuilder('orders').select('*')
-            if customer_id:
-                query.where('customer_id = ?', customer_id)
-            if status:
-                query.where('status = ?', status)
-            query.order('order_date', 'DESC').paginate(page, limit)
+            query = OrderService._list_query(page, limit, customer_id, status)
             
             cursor = conn.cursor()
             cursor.execute(query.sql, query.params)
@@ -24,38 +50,239 @@ class OrderService:
             columns = [column[0] for column in cursor.description]
             return [dict(zip(columns, row)) for row in rows]
     
+    @staticmethod
+    def iter_all(page=1, limit=50, customer_id=None, status=None, chunk_size=None):
+        """Same page as get_all, streamed from the cursor in chunks of rows"""
+        query = OrderService._list_query(page, limit, customer_id, status)
+        return stream_query(query.sql, query.params, chunk_size or get_config().EXPORT_CHUNK_SIZE)
+    
     @staticmethod
     def get_by_id(order_id):
-        """Get order by ID"""
+        """Get order by ID (read through the entity cache)"""
+        return get_entity('order', order_id, lambda: OrderService._fetch_by_id(order_id))
+    
+    @staticmethod
+    def _fetch_by_id(order_id):
+        """Read a order row from the database"""
         with get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute('SELECT * FROM orders WHERE order_id = ?', (order_id,))
             row = cursor.fetchone()
             return dict(zip([col[0] for col in cursor.description], row)) if row else None
     
+    @staticmethod
+    def _fetch_for_write(cursor, order_id, lock=False):
+        """Read an order row inside the caller's transaction"""
+        hint = ' WITH (UPDLOCK, ROWLOCK)' if lock else ''
+        cursor.execute(f'SELECT * FROM orders{hint} WHERE order_id = ?', (order_id,))
+        return row_to_dict(cursor, cursor.fetchone())
+    
     @staticmethod
     def create(data):
-        """Create new order"""
+        """Create new order and add it to the daily sales rollups"""
         with get_connection() as conn:
-            query = QueryBuilder('orders').build_insert_query(data)
+            query, params = build_insert_query('orders', data, returning=True)
             cursor = conn.cursor()
-            cursor.execute(query.sql, query.params)
-            cursor.execute('SELECT @@IDENTITY')
-            order_id = cursor.fetchone()[0]
+            cursor.execute(query, params)
+            created = row_to_dict(cursor, cursor.fetchone())
+            touched = SalesRollup.apply_change(cursor, before=None, after=created)
             conn.commit()
-            return OrderService.get_by_id(order_id)
+            # Inside unit_of_work() these wait for the unit to commit
+            after_commit(lambda: SalesRollup.notify_committed(touched))
+            after_commit(invalidate_reports)
+            return put_entity('order', created['order_id'], created)
+    
+    @staticmethod
+    def place(data):
+        """
+        Create an order with its line items and reserve their stock
+        
+        Prices and tax rates come from the catalog; line totals and the order's
+        subtotal, tax and total are computed here. The order row, item rows and
+        rollups are written in one transaction with one statement each (items
+        in batches of ORDER_ITEM_BATCH). With RESERVATION_STRATEGY 'locking'
+        (the default) the reservation is part of that transaction, so nothing
+        is written on failure. With 'optimistic' stock is reserved first by the
+        reservation engine and released again if the order cannot be written;
+        a process that dies between the two leaves quantity_reserved too high,
+        and nothing reconciles it.
+        
+        Args:
+            data: Order fields plus 'items', a list of {product_id, quantity,
+                discount_percent (optional)}; 'warehouse_id' defaults to
+                DEFAULT_WAREHOUSE_ID
+        
+        Returns:
+            Created order dict with an 'items' list
+        
+        Raises:
+            ValueError: Invalid line items or unknown/inactive products
+            InsufficientStockError: Not enough available stock (no order is
+                written and no stock stays reserved)
+        """
+        config = get_config()
+        items = OrderService._validate_items(data.get('items'), config.ORDER_MAX_LINE_ITEMS)
+        order = {key: value for key, value in data.items() if key != 'items'}
+        order['warehouse_id'] = order.get('warehouse_id') or config.DEFAULT_WAREHOUSE_ID
+        order['stock_reserved'] = 1
+        order.setdefault('order_number', f"SO-{datetime.now():%Y%m%d}-{uuid.uuid4().hex[:10].upper()}")
+        
+        quantities = {}
+        for item in items:
+            quantities[item['product_id']] = quantities.get(item['product_id'], 0) + item['quantity']
+        
+        if config.RESERVATION_STRATEGY == 'locking':
+            with get_connection() as conn:
+                cursor = conn.cursor()
+                lines = OrderService._price_lines(cursor, items)
+                order.update(OrderService._order_totals(lines, order))
+                InventoryService.reserve(cursor, order['warehouse_id'], quantities)
+                created, created_items, touched = OrderService._write_order(cursor, order, lines)
+                conn.commit()
+        else:
+            # Reserve outside the order transaction so hot inventory rows are
+            # locked for one statement each, not for the whole order
+            with get_connection() as conn:
+                lines = OrderService._price_lines(conn.cursor(), items)
+            order.update(OrderService._order_totals(lines, order))
+            reservations = reservation_engine.reserve(order['warehouse_id'], quantities)
+            try:
+                with get_connection() as conn:
+                    cursor = conn.cursor()
+                    created, created_items, touched = OrderService._write_order(cursor, order, lines)
+                    conn.commit()
+            except Exception:
+                reservation_engine.release(reservations)
+                raise
+        
+        after_commit(lambda: SalesRollup.notify_committed(touched))
+        after_commit(invalidate_reports)
+        return dict(put_entity('order', created['order_id'], created), items=created_items)
+    
+    @staticmethod
+    def _write_order(cursor, order, lines):
+        """Insert the order and its items and update rollups (caller commits)"""
+        query, params = build_insert_query('orders', order, returning=True)
+        cursor.execute(query, params)
+        created = row_to_dict(cursor, cursor.fetchone())
+        created_items = OrderService._insert_items(cursor, created['order_id'], lines)
+        touched = SalesRollup.apply_change(cursor, before=None, after=created)
+        return created, created_items, touched
+    
+    @staticmethod
+    def _validate_items(items, max_items):
+        """Check the shape of line items; returns them with integer ids and quantities"""
+        if not isinstance(items, list) or not items:
+            raise ValueError("'items' must be a non-empty list")
+        if len(items) > max_items:
+            raise ValueError(f"An order can have at most {max_items} line items")
+        validated = []
+        for index, item in enumerate(items):
+            try:
+                product_id = int(item['product_id'])
+                quantity = int(item['quantity'])
+                discount = Decimal(str(item.get('discount_percent') or 0))
+            except (KeyError, TypeError, ValueError, ArithmeticError):
+                raise ValueError(f"items[{index}] needs an integer product_id and quantity")
+            if quantity <= 0:
+                raise ValueError(f"items[{index}].quantity must be positive")
+            if not 0 <= discount <= 100:
+                raise ValueError(f"items[{index}].discount_percent must be between 0 and 100")
+            validated.append({'product_id': product_id, 'quantity': quantity, 'discount_percent': discount})
+        return validated
+    
+    @staticmethod
+    def _price_lines(cursor, items):
+        """Price line items from the catalog (one query for all products)"""
+        product_ids = sorted({item['product_id'] for item in items})
+        condition, params = build_in_condition('product_id', product_ids)
+        cursor.execute(f'SELECT product_id, unit_price, tax_rate FROM products '
+                       f'WHERE is_active = 1 AND {condition}', params)
+        catalog = {row['product_id']: row for row in rows_to_dict_list(cursor, cursor.fetchall())}
+        
+        unknown = [product_id for product_id in product_ids if product_id not in catalog]
+        if unknown:
+            raise ValueError(f"Unknown or inactive product(s): {', '.join(map(str, unknown))}")
+        
+        lines = []
+        for item in items:
+            product = catalog[item['product_id']]
+            unit_price = _money(product['unit_price'])
+            discount = item['discount_percent']
+            lines.append({
+                'product_id': item['product_id'],
+                'quantity': item['quantity'],
+                'unit_price': unit_price,
+                'discount_percent': discount,
+                'tax_rate': Decimal(str(product.get('tax_rate') or 0)),
+                'line_total': _money(unit_price * item['quantity'] * (100 - discount) / 100)
+            })
+        return lines
+    
+    @staticmethod
+    def _order_totals(lines, order):
+        """Subtotal, tax and total for priced lines plus the order's shipping and discount"""
+        subtotal = sum((line['line_total'] for line in lines), Decimal('0'))
+        tax = _money(sum((line['line_total'] * line['tax_rate'] / 100 for line in lines), Decimal('0')))
+        shipping = _money(order.get('shipping_amount'))
+        discount = _money(order.get('discount_amount'))
+        return {
+            'subtotal': subtotal,
+            'tax_amount': tax,
+            'shipping_amount': shipping,
+            'discount_amount': discount,
+            'total_amount': subtotal + tax + shipping - discount
+        }
+    
+    @staticmethod
+    def _insert_items(cursor, order_id, lines):
+        """Insert line items with multi-row INSERTs; returns the inserted rows"""
+        columns = ', '.join(ORDER_ITEM_COLUMNS)
+        placeholders = '(' + ', '.join('?' for _ in ORDER_ITEM_COLUMNS) + ')'
+        created = []
+        for start in range(0, len(lines), ORDER_ITEM_BATCH):
+            batch = lines[start:start + ORDER_ITEM_BATCH]
+            params = [value for line in batch
+                      for value in (order_id,) + tuple(line[col] for col in ORDER_ITEM_COLUMNS[1:])]
+            cursor.execute(f"INSERT INTO order_items ({columns}) OUTPUT INSERTED.* "
+                           f"VALUES {', '.join(placeholders for _ in batch)}", params)
+            created.extend(rows_to_dict_list(cursor, cursor.fetchall()))
+        return created
     
     @staticmethod
     def update(order_id, data):
-        """Update order"""
+        """
+        Update the order's changed columns and move its rollup contribution
+        in the same transaction; nothing is written when no value changed.
+        Cancelling an order placed with items gives its reserved stock back
+        in that transaction too.
+        """
         with get_connection() as conn:
-            query = QueryBuilder('orders').build_update_query(data, f'order_id = {order_id}')
             cursor = conn.cursor()
-            cursor.execute(query.sql, query.params)
+            before = OrderService._fetch_for_write(cursor, order_id, lock=True)
+            if not before:
+                return None
+            changes = changed_columns(before, data, [column for column in before
+                                                     if column not in ('order_id', 'stock_reserved')])
+            if not changes:
+                # Nothing written: no rollback, which inside unit_of_work() would doom the unit
+                return put_entity('order', order_id, before)
+            release = changes.get('order_status') == 'cancelled' and before.get('stock_reserved')
+            if release:
+                changes['stock_reserved'] = 0
+            query, params = build_update_query('orders', changes, 'order_id = ?', (order_id,),
+                                               touch_column='updated_at', returning=True)
+            cursor.execute(query, params)
+            after = row_to_dict(cursor, cursor.fetchone())
+            if release:
+                InventoryService.release(cursor, before['warehouse_id'], order_id)
+            touched = SalesRollup.apply_change(cursor, before=before, after=after)
             conn.commit()
-            return OrderService.get_by_id(order_id)
+            after_commit(lambda: SalesRollup.notify_committed(touched))
+            after_commit(invalidate_reports)
+            return put_entity('order', order_id, after)
     
     @staticmethod
     def delete(order_id):
         """Delete order (soft delete)"""
-        return OrderService.update(order_id, {'status': 'cancelled'})
+        return OrderService.update(order_id, {'order_status': 'cancelled'})
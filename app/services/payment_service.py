@@ -1,7 +1,11 @@
 """Payment service layer"""
-from app.utils.db_connection import execute_query, execute_transaction
+from app.utils.db_connection import execute_query, execute_transaction, update_changed
 from app.utils.query_helpers import QueryBuilder
 
+# Columns update() may change
+UPDATABLE_COLUMNS = ('payment_method', 'payment_amount', 'reference_number', 'payment_status',
+                     'notes')
+
 class PaymentService:
     @staticmethod
     def get_all(page=1, limit=50, customer_id=None, invoice_id=None, status=None):
@@ -47,16 +51,9 @@ class PaymentService:
     
     @staticmethod
     def update(payment_id, data):
-        query = """
-        UPDATE payments 
-        SET payment_method = ?, payment_amount = ?, reference_number = ?, 
-            payment_status = ?, notes = ?, updated_at = GETDATE()
-        WHERE payment_id = ?
-        """
-        params = [data.get('payment_method'), data.get('payment_amount'), 
-                  data.get('reference_number'), data.get('payment_status'),
-                  data.get('notes'), payment_id]
-        return execute_transaction(query, params)
+        """Write only the columns that changed; True on success (also when none did), None if no such row"""
+        changes = update_changed('payments', 'payment_id', payment_id, data, UPDATABLE_COLUMNS)
+        return None if changes is None else True
     
     @staticmethod
     def delete(payment_id):
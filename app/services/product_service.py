@@ -1,22 +1,31 @@
 """Product service layer"""
-from app.utils.db_connection import get_connection
-from app.utils.query_helpers import QueryBuilder, rows_to_dict_list
+from app.utils.db_connection import get_connection, stream_query
+from app.utils.query_helpers import QueryBuilder, build_insert_query, build_update_query, changed_columns, rows_to_dict_list, row_to_dict
+from app.utils.http_cache import invalidate_reports, invalidate_entity_response
+from app.utils.entity_cache import get_entity, put_entity
+from config.config import get_config
 from app.models.product import Product
 import logging
 
 logger = logging.getLogger(__name__)
 
 class ProductService:
+    @staticmethod
+    def _list_query(page, limit, category=None, status=None):
+        """Paginated list query shared by get_all and iter_all"""
+        query = QueryBuilder('products').select('*')
+        if category:
+            query.where('category = ?', category)
+        if status:
+            query.where('status = ?', status)
+        query.order('created_at', 'DESC').paginate(page, limit)
+        return query
+    
     @staticmethod
     def get_all(page=1, limit=50, category=None, status=None):
         """Get all products with pagination"""
         with get_connection() as conn:
-            query = QueryBuilder('products').select('*')
-            if category:
-                query.where('category = ?', category)
-            if status:
-                query.where('status = ?', status)
-            query.order('created_at', 'DESC').paginate(page, limit)
+            query = ProductService._list_query(page, limit, category, status)
             
             cursor = conn.cursor()
             cursor.execute(query.sql, query.params)
@@ -24,9 +33,20 @@ class ProductService:
             columns = [column[0] for column in cursor.description]
             return [dict(zip(columns, row)) for row in rows]
     
+    @staticmethod
+    def iter_all(page=1, limit=50, category=None, status=None, chunk_size=None):
+        """Same page as get_all, streamed from the cursor in chunks of rows"""
+        query = ProductService._list_query(page, limit, category, status)
+        return stream_query(query.sql, query.params, chunk_size or get_config().EXPORT_CHUNK_SIZE)
+    
     @staticmethod
     def get_by_id(product_id):
-        """Get product by ID"""
+        """Get product by ID (read through the entity cache)"""
+        return get_entity('product', product_id, lambda: ProductService._fetch_by_id(product_id))
+    
+    @staticmethod
+    def _fetch_by_id(product_id):
+        """Read a product row from the database"""
         with get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute('SELECT * FROM products WHERE product_id = ?', (product_id,))
@@ -37,25 +57,44 @@ class ProductService:
     def create(data):
         """Create new product"""
         with get_connection() as conn:
-            query = QueryBuilder('products').build_insert_query(data)
+            query, params = build_insert_query('products', data, returning=True)
             cursor = conn.cursor()
-            cursor.execute(query.sql, query.params)
-            cursor.execute('SELECT @@IDENTITY')
-            product_id = cursor.fetchone()[0]
+            cursor.execute(query, params)
+            created = row_to_dict(cursor, cursor.fetchone())
             conn.commit()
-            return ProductService.get_by_id(product_id)
+            invalidate_reports()
+            return put_entity('product', created['product_id'], created)
     
     @staticmethod
     def update(product_id, data):
-        """Update product"""
+        """
+        Update the product's changed columns
+        
+        `data` is diffed against the row read with an update lock in the
+        same transaction (never the cached copy, which another worker may
+        have left stale); only columns whose values differ are written, and
+        nothing is written when none do.
+        """
         with get_connection() as conn:
-            query = QueryBuilder('products').build_update_query(data, f'product_id = {product_id}')
             cursor = conn.cursor()
-            cursor.execute(query.sql, query.params)
+            cursor.execute('SELECT * FROM products WITH (UPDLOCK, ROWLOCK) WHERE product_id = ?', (product_id,))
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            current = row_to_dict(cursor, row)
+            changes = changed_columns(current, data, [column for column in current if column != 'product_id'])
+            if not changes:
+                return put_entity('product', product_id, current)
+            query, params = build_update_query('products', changes, 'product_id = ?', (product_id,),
+                                               touch_column='updated_at', returning=True)
+            cursor.execute(query, params)
+            updated = row_to_dict(cursor, cursor.fetchone())
             conn.commit()
-            return ProductService.get_by_id(product_id)
+            invalidate_reports()
+            invalidate_entity_response('product', product_id)
+            return put_entity('product', product_id, updated)
     
     @staticmethod
     def delete(product_id):
-        """Delete product (soft delete)"""
-        return ProductService.update(product_id, {'status': 'inactive'})
+        """Delete product (soft delete: products are deactivated through is_active)"""
+        return ProductService.update(product_id, {'is_active': 0})
@@ -0,0 +1,249 @@
+"""
+Inventory reservation engine
+Reserves stock without holding row locks for the length of an order
+transaction. Each product is reserved in its own short transaction with a
+conditional decrement that is also checked against the row's rowversion
+(optimistic concurrency): a conflicting writer makes the update match no
+row, and the engine re-reads and retries with jittered exponential backoff.
+The availability predicate alone prevents overselling; the rowversion check
+keeps the engine's cached view of each row honest.
+
+When RESERVATION_MAX_RETRIES conflicts in a row are exhausted, the engine
+falls back to one update without the rowversion check (RESERVE_QUERY). It
+still cannot oversell, but it is no longer optimistic: it waits on the row
+lock like the locking strategy. stats()['fallbacks'] counts these (GET
+/health reports the stats as 'reservations'); a high ratio to
+'reservations' means the product is too hot for this strategy and
+RESERVATION_COALESCE_MS or RESERVATION_STRATEGY=locking fits better.
+
+Reservations commit before the order that needs them. OrderService.place
+releases them if the order fails, but a process that dies in between leaves
+quantity_reserved inflated with nothing to reconcile it, which is why
+'locking' is the default strategy.
+
+With RESERVATION_COALESCE_MS > 0, concurrent requests for the same product
+and warehouse in this process are merged into one update.
+"""
+import logging
+import random
+import time
+from threading import Event, Lock
+from app.utils.db_connection import get_connection
+from app.utils.query_helpers import row_to_dict
+from app.services.inventory_service import InsufficientStockError
+from config.config import get_config
+
+logger = logging.getLogger(__name__)
+
+INVENTORY_READ_QUERY = """
+SELECT inventory_id, quantity_on_hand - quantity_reserved AS quantity_available, row_version
+FROM inventory
+WHERE product_id = ? AND warehouse_id = ?
+"""
+
+RESERVE_VERSIONED_QUERY = """
+UPDATE inventory
+SET quantity_reserved = quantity_reserved + ?, updated_at = GETDATE()
+OUTPUT INSERTED.quantity_on_hand - INSERTED.quantity_reserved AS quantity_available, INSERTED.row_version
+WHERE inventory_id = ? AND row_version = ? AND quantity_on_hand - quantity_reserved >= ?
+"""
+
+# Last attempt once retries are exhausted: no version check, so it cannot
+# conflict, only fail for lack of stock
+RESERVE_QUERY = """
+UPDATE inventory
+SET quantity_reserved = quantity_reserved + ?, updated_at = GETDATE()
+OUTPUT INSERTED.quantity_on_hand - INSERTED.quantity_reserved AS quantity_available, INSERTED.row_version
+WHERE inventory_id = ? AND quantity_on_hand - quantity_reserved >= ?
+"""
+
+RELEASE_QUERY = """
+UPDATE inventory
+SET quantity_reserved = quantity_reserved - ?, updated_at = GETDATE()
+WHERE product_id = ? AND warehouse_id = ? AND quantity_reserved >= ?
+"""
+
+
+class _Pending:
+    """A request waiting in a coalescing batch"""
+
+    __slots__ = ('quantity', 'done', 'error')
+
+    def __init__(self, quantity):
+        self.quantity = quantity
+        self.done = Event()
+        self.error = None
+
+
+class ReservationEngine:
+    """Optimistic, optionally coalescing stock reservations"""
+
+    def __init__(self, max_retries=None, backoff_ms=None, coalesce_ms=None):
+        config = get_config()
+        self.max_retries = config.RESERVATION_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff = (config.RESERVATION_BACKOFF_MS if backoff_ms is None else backoff_ms) / 1000
+        self.coalesce_window = (config.RESERVATION_COALESCE_MS if coalesce_ms is None else coalesce_ms) / 1000
+        # (product_id, warehouse_id) -> row as last seen: inventory_id, quantity_available, row_version
+        self._views = {}
+        self._queues = {}
+        self._lock = Lock()
+        self.reservations = 0
+        self.conflicts = 0
+        self.fallbacks = 0
+        self.batches = 0
+        self.coalesced = 0
+
+    def reserve(self, warehouse_id, quantities):
+        """
+        Reserve stock for several products, each in its own short transaction
+
+        Args:
+            warehouse_id: Warehouse to reserve from
+            quantities: Dict of {product_id: quantity}
+
+        Returns:
+            List of (product_id, warehouse_id, quantity) reservations; pass
+            to release() if the order is not written
+
+        Raises:
+            InsufficientStockError: Some product lacks stock; reservations
+                already made for the others are released
+        """
+        reserved, shortages = [], []
+        for product_id, quantity in sorted(quantities.items()):
+            try:
+                self._reserve_one(product_id, warehouse_id, quantity)
+                reserved.append((product_id, warehouse_id, quantity))
+            except InsufficientStockError as e:
+                shortages.extend(e.shortages)
+            except Exception:
+                self.release(reserved)
+                raise
+        if shortages:
+            self.release(reserved)
+            raise InsufficientStockError(warehouse_id, shortages)
+        return reserved
+
+    def release(self, reservations):
+        """Give reserved stock back (compensates a failed order)"""
+        for product_id, warehouse_id, quantity in reservations:
+            try:
+                self._execute(RELEASE_QUERY, (quantity, product_id, warehouse_id, quantity))
+                self._views.pop((product_id, warehouse_id), None)
+            except Exception as e:
+                logger.error(f"Error releasing {quantity} of product {product_id} "
+                             f"in warehouse {warehouse_id}: {str(e)}")
+
+    def _reserve_one(self, product_id, warehouse_id, quantity):
+        if self.coalesce_window > 0:
+            self._reserve_coalesced(product_id, warehouse_id, quantity)
+        else:
+            self._reserve_direct(product_id, warehouse_id, quantity)
+
+    def _reserve_coalesced(self, product_id, warehouse_id, quantity):
+        """Join (or lead) the batch of requests for one product and warehouse"""
+        key = (product_id, warehouse_id)
+        pending = _Pending(quantity)
+        with self._lock:
+            batch = self._queues.get(key)
+            leader = batch is None
+            if leader:
+                batch = self._queues[key] = []
+            batch.append(pending)
+
+        if leader:
+            time.sleep(self.coalesce_window)
+            with self._lock:
+                batch = self._queues.pop(key)
+            self._run_batch(product_id, warehouse_id, batch)
+        else:
+            pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+
+    def _run_batch(self, product_id, warehouse_id, batch):
+        self.batches += 1
+        self.coalesced += len(batch)
+        try:
+            self._reserve_direct(product_id, warehouse_id, sum(p.quantity for p in batch))
+        except InsufficientStockError:
+            # Not enough for the whole batch: serve requests one at a time, in arrival order
+            for pending in batch:
+                try:
+                    self._reserve_direct(product_id, warehouse_id, pending.quantity)
+                except Exception as e:
+                    pending.error = e
+        except Exception as e:
+            for pending in batch:
+                pending.error = e
+        finally:
+            for pending in batch:
+                pending.done.set()
+
+    def _reserve_direct(self, product_id, warehouse_id, quantity):
+        """Optimistic conditional decrement with retries; returns the row as updated"""
+        key = (product_id, warehouse_id)
+        view = self._views.get(key)
+        fresh = False
+        for attempt in range(self.max_retries + 1):
+            if view is None or (not fresh and view['quantity_available'] < quantity):
+                view, fresh = self._read(key), True
+            if view is None or view['quantity_available'] < quantity:
+                raise InsufficientStockError(warehouse_id, [{
+                    'product_id': product_id, 'requested': quantity,
+                    'available': view['quantity_available'] if view else 0
+                }])
+
+            row = self._execute(RESERVE_VERSIONED_QUERY,
+                                (quantity, view['inventory_id'], view['row_version'], quantity))
+            if row is not None:
+                return self._updated(key, view, row)
+
+            # Another writer changed the row since we read it
+            self.conflicts += 1
+            view, fresh = None, False
+            if attempt < self.max_retries:
+                time.sleep(random.uniform(0, self.backoff * (2 ** attempt)))
+
+        self.fallbacks += 1
+        view = view or self._read(key)
+        row = self._execute(RESERVE_QUERY, (quantity, view['inventory_id'], quantity)) if view else None
+        if row is None:
+            self._views.pop(key, None)
+            raise InsufficientStockError(warehouse_id, [{
+                'product_id': product_id, 'requested': quantity, 'available': None
+            }])
+        return self._updated(key, view, row)
+
+    def _updated(self, key, view, row):
+        self.reservations += 1
+        view = dict(view, quantity_available=row['quantity_available'], row_version=row['row_version'])
+        self._views[key] = view
+        return view
+
+    def _read(self, key):
+        row = self._execute(INVENTORY_READ_QUERY, key)
+        if row is None:
+            self._views.pop(key, None)
+        return row
+
+    def _execute(self, query, params):
+        """Run one statement in its own transaction; returns the first row (dict) or None"""
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            row = row_to_dict(cursor, cursor.fetchone()) if cursor.description else None
+            conn.commit()
+            return row
+
+    def stats(self):
+        return {
+            'reservations': self.reservations,
+            'conflicts': self.conflicts,
+            'fallbacks': self.fallbacks,
+            'batches': self.batches,
+            'coalesced_requests': self.coalesced
+        }
+
+
+reservation_engine = ReservationEngine()
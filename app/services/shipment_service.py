@@ -1,14 +1,18 @@
 """Shipment service layer"""
-from app.utils.db_connection import execute_query, execute_transaction
+from app.utils.db_connection import execute_query, execute_transaction, update_changed
 from app.utils.query_helpers import QueryBuilder
+from app.utils.reference_data import enrich
+
+# Columns update() may change
+UPDATABLE_COLUMNS = ('carrier', 'tracking_number', 'estimated_delivery', 'actual_delivery',
+                     'shipment_status', 'shipping_cost', 'weight', 'notes')
 
 class ShipmentService:
     @staticmethod
     def get_all(page=1, limit=50, order_id=None, status=None):
         query = QueryBuilder('shipments s').select("""
-            s.*, o.order_number, w.warehouse_name
-        """).join('orders o ON s.order_id = o.order_id')
-        query.join('warehouses w ON s.warehouse_id = w.warehouse_id')
+            s.*, o.order_number
+        """).join('JOIN orders o ON s.order_id = o.order_id')
         
         if order_id:
             query.where('s.order_id = ?', order_id)
@@ -16,19 +20,19 @@ class ShipmentService:
             query.where('s.shipment_status = ?', status)
         
         query.order('s.shipment_date DESC').paginate(page, limit)
-        return execute_query(query.sql, query.params)
+        return enrich(execute_query(query.sql, query.params),
+                      'warehouses', 'warehouse_id', {'warehouse_name': 'warehouse_name'})
     
     @staticmethod
     def get_by_id(shipment_id):
         query = """
-        SELECT s.*, o.order_number, w.warehouse_name
+        SELECT s.*, o.order_number
         FROM shipments s
         JOIN orders o ON s.order_id = o.order_id
-        JOIN warehouses w ON s.warehouse_id = w.warehouse_id
         WHERE s.shipment_id = ?
         """
         result = execute_query(query, [shipment_id])
-        return result[0] if result else None
+        return enrich(result[0], 'warehouses', 'warehouse_id', {'warehouse_name': 'warehouse_name'}) if result else None
     
     @staticmethod
     def create(data):
@@ -47,16 +51,9 @@ class ShipmentService:
     
     @staticmethod
     def update(shipment_id, data):
-        query = """
-        UPDATE shipments 
-        SET carrier = ?, tracking_number = ?, estimated_delivery = ?, actual_delivery = ?,
-            shipment_status = ?, shipping_cost = ?, weight = ?, notes = ?, updated_at = GETDATE()
-        WHERE shipment_id = ?
-        """
-        params = [data.get('carrier'), data.get('tracking_number'), data.get('estimated_delivery'),
-                  data.get('actual_delivery'), data.get('shipment_status'), data.get('shipping_cost'),
-                  data.get('weight'), data.get('notes'), shipment_id]
-        return execute_transaction(query, params)
+        """Write only the columns that changed; True on success (also when none did), None if no such row"""
+        changes = update_changed('shipments', 'shipment_id', shipment_id, data, UPDATABLE_COLUMNS)
+        return None if changes is None else True
     
     @staticmethod
     def delete(shipment_id):
@@ -1,6 +1,12 @@
 """Supplier service layer"""
-from app.utils.db_connection import execute_query, execute_transaction
+from app.utils.db_connection import execute_query, execute_transaction, update_changed
 from app.utils.query_helpers import QueryBuilder
+from app.utils.reference_data import reference_data
+
+# Columns update() may change
+UPDATABLE_COLUMNS = ('supplier_name', 'contact_person', 'email', 'phone', 'address', 'city',
+                     'state', 'country', 'postal_code', 'payment_terms', 'tax_id', 'rating',
+                     'status')
 
 class SupplierService:
     @staticmethod
@@ -29,23 +35,20 @@ class SupplierService:
                   data.get('state'), data.get('country'), data.get('postal_code'),
                   data.get('payment_terms', 30), data.get('tax_id'), data.get('rating'),
                   data.get('status', 'active')]
-        return execute_transaction(query, params)
+        result = execute_transaction(query, params)
+        reference_data.mark_stale('suppliers')
+        return result
     
     @staticmethod
     def update(supplier_id, data):
-        query = """
-        UPDATE suppliers 
-        SET supplier_name = ?, contact_person = ?, email = ?, phone = ?, address = ?,
-            city = ?, state = ?, country = ?, postal_code = ?, payment_terms = ?,
-            tax_id = ?, rating = ?, status = ?, updated_at = GETDATE()
-        WHERE supplier_id = ?
-        """
-        params = [data.get('supplier_name'), data.get('contact_person'), data.get('email'),
-                  data.get('phone'), data.get('address'), data.get('city'), data.get('state'),
-                  data.get('country'), data.get('postal_code'), data.get('payment_terms'),
-                  data.get('tax_id'), data.get('rating'), data.get('status'), supplier_id]
-        return execute_transaction(query, params)
+        """Write only the columns that changed; True on success (also when none did), None if no such row"""
+        changes = update_changed('suppliers', 'supplier_id', supplier_id, data, UPDATABLE_COLUMNS)
+        if changes:
+            reference_data.mark_stale('suppliers')
+        return None if changes is None else True
     
     @staticmethod
     def delete(supplier_id):
-        return execute_transaction('DELETE FROM suppliers WHERE supplier_id = ?', [supplier_id])
+        result = execute_transaction('DELETE FROM suppliers WHERE supplier_id = ?', [supplier_id])
+        reference_data.mark_stale('suppliers')
+        return result
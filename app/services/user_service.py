@@ -1,8 +1,12 @@
 """User service layer"""
-from app.utils.db_connection import execute_query, execute_transaction
+from app.utils.db_connection import execute_query, execute_transaction, update_changed
 from app.utils.query_helpers import QueryBuilder, rows_to_dict_list
+from app.utils.reference_data import reference_data
 from datetime import datetime
 
+# Columns update() may change
+UPDATABLE_COLUMNS = ('username', 'email', 'first_name', 'last_name', 'role', 'is_active')
+
 class UserService:
     @staticmethod
     def get_all(page=1, limit=50, role=None, is_active=None):
@@ -29,21 +33,21 @@ class UserService:
         params = [data.get('username'), data.get('email'), data.get('password_hash'),
                   data.get('first_name'), data.get('last_name'), 
                   data.get('role', 'user'), data.get('is_active', True)]
-        return execute_transaction(query, params)
+        result = execute_transaction(query, params)
+        reference_data.mark_stale('users')
+        return result
     
     @staticmethod
     def update(user_id, data):
-        query = """
-        UPDATE users 
-        SET username = ?, email = ?, first_name = ?, last_name = ?, 
-            role = ?, is_active = ?, updated_at = GETDATE()
-        WHERE user_id = ?
-        """
-        params = [data.get('username'), data.get('email'), data.get('first_name'),
-                  data.get('last_name'), data.get('role'), data.get('is_active'), user_id]
-        return execute_transaction(query, params)
+        """Write only the columns that changed; True on success (also when none did), None if no such row"""
+        changes = update_changed('users', 'user_id', user_id, data, UPDATABLE_COLUMNS)
+        if changes:
+            reference_data.mark_stale('users')
+        return None if changes is None else True
     
     @staticmethod
     def delete(user_id):
         query = 'DELETE FROM users WHERE user_id = ?'
-        return execute_transaction(query, [user_id])
+        result = execute_transaction(query, [user_id])
+        reference_data.mark_stale('users')
+        return result
@@ -1,6 +1,11 @@
 """Warehouse service layer"""
-from app.utils.db_connection import execute_query, execute_transaction
+from app.utils.db_connection import execute_query, execute_transaction, update_changed
 from app.utils.query_helpers import QueryBuilder
+from app.utils.reference_data import reference_data
+
+# Columns update() may change
+UPDATABLE_COLUMNS = ('warehouse_name', 'location', 'address', 'city', 'state', 'country',
+                     'postal_code', 'phone', 'manager_user_id', 'capacity', 'status')
 
 class WarehouseService:
     @staticmethod
@@ -27,23 +32,20 @@ class WarehouseService:
                   data.get('address'), data.get('city'), data.get('state'), data.get('country'),
                   data.get('postal_code'), data.get('phone'), data.get('manager_user_id'),
                   data.get('capacity'), data.get('status', 'active')]
-        return execute_transaction(query, params)
+        result = execute_transaction(query, params)
+        reference_data.mark_stale('warehouses')
+        return result
     
     @staticmethod
     def update(warehouse_id, data):
-        query = """
-        UPDATE warehouses 
-        SET warehouse_name = ?, location = ?, address = ?, city = ?, state = ?,
-            country = ?, postal_code = ?, phone = ?, manager_user_id = ?, 
-            capacity = ?, status = ?, updated_at = GETDATE()
-        WHERE warehouse_id = ?
-        """
-        params = [data.get('warehouse_name'), data.get('location'), data.get('address'),
-                  data.get('city'), data.get('state'), data.get('country'),
-                  data.get('postal_code'), data.get('phone'), data.get('manager_user_id'),
-                  data.get('capacity'), data.get('status'), warehouse_id]
-        return execute_transaction(query, params)
+        """Write only the columns that changed; True on success (also when none did), None if no such row"""
+        changes = update_changed('warehouses', 'warehouse_id', warehouse_id, data, UPDATABLE_COLUMNS)
+        if changes:
+            reference_data.mark_stale('warehouses')
+        return None if changes is None else True
     
     @staticmethod
     def delete(warehouse_id):
-        return execute_transaction('DELETE FROM warehouses WHERE warehouse_id = ?', [warehouse_id])
+        result = execute_transaction('DELETE FROM warehouses WHERE warehouse_id = ?', [warehouse_id])
+        reference_data.mark_stale('warehouses')
+        return result
@@ -4,8 +4,16 @@ from .db_connection import (
     get_connection,
     get_db_cursor,
     execute_query,
+    stream_query,
     execute_many,
     execute_transaction,
+    update_changed,
+    unit_of_work,
+    UnitOfWork,
+    after_commit,
+    with_retry,
+    retry_stats,
+    classify_error,
     call_stored_procedure,
     test_connection,
     initialize_pool,
@@ -23,7 +31,8 @@ from .query_helpers import (
     sanitize_order_by,
     format_sql_params,
     row_to_dict,
-    rows_to_dict_list
+    rows_to_dict_list,
+    changed_columns
 )
 
 __all__ = [
@@ -31,8 +40,16 @@ __all__ = [
     'get_connection',
     'get_db_cursor',
     'execute_query',
+    'stream_query',
     'execute_many',
     'execute_transaction',
+    'update_changed',
+    'unit_of_work',
+    'UnitOfWork',
+    'after_commit',
+    'with_retry',
+    'retry_stats',
+    'classify_error',
     'call_stored_procedure',
     'test_connection',
     'initialize_pool',
@@ -48,5 +65,6 @@ __all__ = [
     'sanitize_order_by',
     'format_sql_params',
     'row_to_dict',
-    'rows_to_dict_list'
+    'rows_to_dict_list',
+    'changed_columns'
 ]
@@ -1,138 +1,375 @@
 """Advanced data layer with complex queries, analytics, and reporting"""
-from app.utils.db_connection import get_db_connection, execute_query
+from app.utils.db_connection import get_db_connection, execute_query, stream_query
 from app.utils.query_helpers import QueryBuilder, rows_to_dict_list
+from app.utils.sales_rollup import SalesRollup
+from app.utils.forecasting import RevenueForecaster
+from config.config import get_config
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime, timedelta
+from threading import Lock, local
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Per-dimension aggregates for the warehouse utilization report. Each query
+# reads one fact table once, so no join multiplies inventory rows.
+WAREHOUSE_BASE_QUERY = """
+SELECT 
+    w.warehouse_id,
+    w.warehouse_code,
+    w.warehouse_name,
+    w.location,
+    w.capacity,
+    u.first_name as manager_first_name,
+    u.last_name as manager_last_name
+FROM dbo.warehouses w
+LEFT JOIN dbo.users u ON w.manager_user_id = u.user_id
+"""
+
+INVENTORY_BY_WAREHOUSE_QUERY = """
+SELECT 
+    i.warehouse_id,
+    COUNT(DISTINCT i.product_id) as unique_products,
+    SUM(i.quantity_on_hand) as total_units_stored,
+    SUM(i.quantity_reserved) as total_units_reserved,
+    SUM(i.quantity_available) as total_units_available
+FROM dbo.inventory i
+GROUP BY i.warehouse_id
+"""
+
+ORDERS_BY_WAREHOUSE_QUERY = """
+SELECT o.warehouse_id, COUNT(*) as orders_fulfilled
+FROM dbo.orders o
+WHERE o.warehouse_id IS NOT NULL
+GROUP BY o.warehouse_id
+"""
+
+SHIPMENTS_BY_WAREHOUSE_QUERY = """
+SELECT s.warehouse_id, COUNT(*) as shipments_sent
+FROM dbo.shipments s
+GROUP BY s.warehouse_id
+"""
+
+# Per-dimension aggregates for the supplier performance report
+SUPPLIER_BASE_QUERY = """
+SELECT s.supplier_id, s.supplier_code, s.supplier_name, s.rating, s.payment_terms
+FROM dbo.suppliers s
+WHERE s.status = 'active'
+"""
+
+_ACTIVE_SUPPLIER_FILTER = "p.supplier_id IN (SELECT supplier_id FROM dbo.suppliers WHERE status = 'active')"
+
+PRODUCTS_BY_SUPPLIER_QUERY = f"""
+SELECT 
+    p.supplier_id,
+    COUNT(*) as products_supplied,
+    AVG(p.unit_price - p.cost_price) as avg_profit_per_unit
+FROM dbo.products p
+WHERE {_ACTIVE_SUPPLIER_FILTER}
+GROUP BY p.supplier_id
+"""
+
+INVENTORY_BY_SUPPLIER_QUERY = f"""
+SELECT 
+    p.supplier_id,
+    COUNT(*) as inventory_locations,
+    SUM(i.quantity_on_hand) as total_units_in_stock,
+    MAX(i.last_restock_date) as last_restock_date
+FROM dbo.inventory i
+INNER JOIN dbo.products p ON i.product_id = p.product_id
+WHERE {_ACTIVE_SUPPLIER_FILTER}
+GROUP BY p.supplier_id
+"""
+
+SALES_BY_SUPPLIER_QUERY = f"""
+SELECT 
+    p.supplier_id,
+    COUNT(DISTINCT oi.order_id) as orders_containing_products,
+    SUM(oi.quantity) as total_units_sold,
+    SUM(oi.line_total) as total_sales_value
+FROM dbo.order_items oi
+INNER JOIN dbo.products p ON oi.product_id = p.product_id
+WHERE {_ACTIVE_SUPPLIER_FILTER}
+GROUP BY p.supplier_id
+"""
+
+
+INVENTORY_STATUS_QUERY = """
+SELECT 
+    p.product_id,
+    p.product_code,
+    p.product_name,
+    p.category,
+    p.unit_price,
+    w.warehouse_id,
+    w.warehouse_name,
+    i.quantity_on_hand,
+    i.quantity_reserved,
+    i.quantity_available,
+    p.reorder_level,
+    p.reorder_quantity,
+    CASE 
+        WHEN i.quantity_available <= p.reorder_level THEN 'REORDER_NEEDED'
+        WHEN i.quantity_available <= (p.reorder_level * 1.5) THEN 'LOW_STOCK'
+        ELSE 'ADEQUATE'
+    END as stock_status,
+    s.supplier_name,
+    s.supplier_code,
+    i.last_stock_check,
+    i.last_restock_date
+FROM dbo.products p
+LEFT JOIN dbo.inventory i ON p.product_id = i.product_id
+LEFT JOIN dbo.warehouses w ON i.warehouse_id = w.warehouse_id
+LEFT JOIN dbo.suppliers s ON p.supplier_id = s.supplier_id
+WHERE p.is_active = 1
+ORDER BY 
+    CASE 
+        WHEN i.quantity_available <= p.reorder_level THEN 1
+        WHEN i.quantity_available <= (p.reorder_level * 1.5) THEN 2
+        ELSE 3
+    END,
+    p.product_name
+"""
+
+PAYMENT_COLLECTION_QUERY = """
+SELECT 
+    c.customer_id,
+    c.company_name,
+    c.credit_limit,
+    COUNT(DISTINCT i.invoice_id) as total_invoices,
+    SUM(i.total_amount) as total_invoiced,
+    SUM(i.amount_paid) as total_collected,
+    SUM(i.amount_due) as total_outstanding,
+    COUNT(DISTINCT CASE WHEN i.due_date < GETDATE() AND i.amount_due > 0 THEN i.invoice_id END) as overdue_invoices,
+    SUM(CASE WHEN i.due_date < GETDATE() THEN i.amount_due ELSE 0 END) as overdue_amount,
+    AVG(DATEDIFF(day, i.invoice_date, p.payment_date)) as avg_days_to_payment,
+    MAX(i.due_date) as latest_due_date,
+    CASE 
+        WHEN SUM(CASE WHEN i.due_date < GETDATE() THEN i.amount_due ELSE 0 END) > c.credit_limit * 0.8 THEN 'CRITICAL'
+        WHEN SUM(CASE WHEN i.due_date < GETDATE() THEN i.amount_due ELSE 0 END) > c.credit_limit * 0.5 THEN 'WARNING'
+        ELSE 'GOOD'
+    END as credit_status
+FROM dbo.customers c
+LEFT JOIN dbo.invoices i ON c.customer_id = i.customer_id
+LEFT JOIN dbo.payments p ON i.invoice_id = p.invoice_id
+GROUP BY c.customer_id, c.company_name, c.credit_limit
+HAVING SUM(i.amount_due) > 0
+ORDER BY total_outstanding DESC
+"""
+
+
+# Marks threads running a report for run_reports()
+_report_thread = local()
+
+
+def run_parallel(jobs):
+    """
+    Run independent queries concurrently, each on its own pooled connection
+    
+    Inside a report run by run_reports() the queries run one after another
+    on the report's thread instead: the report pool already runs up to
+    DASHBOARD_MAX_WORKERS reports at once, and fanning out again from each
+    could take every pooled connection.
+    
+    Args:
+        jobs: Dictionary of name -> (query, params)
+    
+    Returns:
+        Dictionary of name -> result rows
+    """
+    if getattr(_report_thread, 'active', False):
+        return {name: execute_query(query, params) for name, (query, params) in jobs.items()}
+    with ThreadPoolExecutor(max_workers=len(jobs)) as executor:
+        futures = {
+            name: executor.submit(execute_query, query, params)
+            for name, (query, params) in jobs.items()
+        }
+        return {name: future.result() for name, future in futures.items()}
+
+
+_report_executor = None
+_report_executor_lock = Lock()
+
+
+def get_report_executor():
+    """Shared bounded thread pool for running whole reports concurrently"""
+    global _report_executor
+    
+    if _report_executor is None:
+        with _report_executor_lock:
+            if _report_executor is None:
+                _report_executor = ThreadPoolExecutor(
+                    max_workers=get_config().DASHBOARD_MAX_WORKERS,
+                    thread_name_prefix='report'
+                )
+    return _report_executor
+
+
+def run_reports(jobs, timeout=None):
+    """
+    Run report callables on the shared report pool and collect per-report outcomes
+    
+    Each report runs its own queries, so every worker holds its own pooled
+    connection, one at a time (run_parallel() does not fan out further), and
+    a dashboard never needs more than DASHBOARD_MAX_WORKERS connections. One
+    failing or slow report does not affect the others.
+    
+    Args:
+        jobs: Dictionary of report name -> zero-argument callable
+        timeout: Seconds to wait for all reports (None = no limit)
+    
+    Returns:
+        Dictionary of report name -> {'status', 'elapsed_ms', 'data' | 'error'}
+    """
+    def timed(fn):
+        start = time.perf_counter()
+        _report_thread.active = True
+        try:
+            return {'status': 'ok', 'data': fn(), 'elapsed_ms': round((time.perf_counter() - start) * 1000, 2)}
+        except Exception as e:
+            logger.error(f"Report failed: {str(e)}")
+            return {'status': 'error', 'error': str(e), 'elapsed_ms': round((time.perf_counter() - start) * 1000, 2)}
+        finally:
+            _report_thread.active = False
+    
+    executor = get_report_executor()
+    futures = {name: executor.submit(timed, fn) for name, fn in jobs.items()}
+    wait(futures.values(), timeout=timeout)
+    
+    results = {}
+    for name, future in futures.items():
+        if future.done():
+            results[name] = future.result()
+        else:
+            future.cancel()
+            results[name] = {'status': 'timeout', 'error': f'Report did not finish within {timeout}s', 'elapsed_ms': None}
+    return results
+
+
+def _index_by(rows, key):
+    return {row.get(key): row for row in rows or []}
+
 
 class AdvancedDataLayer:
     """Complex database operations including analytics, aggregations, and multi-table joins"""
     
     @staticmethod
-    def get_customer_analytics(customer_id=None, start_date=None, end_date=None):
-        """Get comprehensive customer analytics with order history, revenue, and payment stats"""
-        query = """
-        SELECT 
-            c.customer_id,
-            c.company_name,
-            c.customer_type,
-            c.credit_limit,
-            c.current_balance,
-            COUNT(DISTINCT o.order_id) as total_orders,
-            COALESCE(SUM(o.total_amount), 0) as total_revenue,
-            COALESCE(AVG(o.total_amount), 0) as avg_order_value,
-            COUNT(DISTINCT i.invoice_id) as total_invoices,
-            COALESCE(SUM(i.amount_paid), 0) as total_paid,
-            COALESCE(SUM(i.amount_due), 0) as outstanding_balance,
-            COUNT(DISTINCT p.payment_id) as total_payments,
-            MAX(o.order_date) as last_order_date,
-            MAX(p.payment_date) as last_payment_date
-        FROM dbo.customers c
-        LEFT JOIN dbo.orders o ON c.customer_id = o.customer_id
-        LEFT JOIN dbo.invoices i ON c.customer_id = i.customer_id
-        LEFT JOIN dbo.payments p ON c.customer_id = p.customer_id
-        WHERE 1=1
+    def build_customer_analytics_query(customer_id=None, start_date=None, end_date=None):
         """
-        params = []
+        Build the customer analytics query on per-customer subtotals
+        
+        Orders, invoices and payments are each aggregated per customer before
+        being joined to customers, so every source row is read once and the
+        join is 1:1:1:1 instead of orders x invoices x payments per customer.
+        
+        Returns:
+            Tuple of (query, params)
+        """
+        order_filter = ""
+        order_params = []
+        customer_filter = ""
+        customer_params = []
         
         if customer_id:
-            query += " AND c.customer_id = ?"
-            params.append(customer_id)
+            order_filter += " AND o.customer_id = ?"
+            order_params.append(customer_id)
+            customer_filter += " AND c.customer_id = ?"
+            customer_params.append(customer_id)
         
         if start_date:
-            query += " AND o.order_date >= ?"
-            params.append(start_date)
+            order_filter += " AND o.order_date >= ?"
+            order_params.append(start_date)
         
         if end_date:
-            query += " AND o.order_date <= ?"
-            params.append(end_date)
+            order_filter += " AND o.order_date <= ?"
+            order_params.append(end_date)
         
-        query += " GROUP BY c.customer_id, c.company_name, c.customer_type, c.credit_limit, c.current_balance"
-        query += " ORDER BY total_revenue DESC"
+        # A date range restricts the report to customers with orders in it
+        if start_date or end_date:
+            customer_filter += " AND ot.customer_id IS NOT NULL"
         
+        invoice_filter = " AND i.customer_id = ?" if customer_id else ""
+        payment_filter = " AND p.customer_id = ?" if customer_id else ""
+        single = [customer_id] if customer_id else []
+        
+        query = f"""
+        WITH OrderTotals AS (
+            SELECT 
+                o.customer_id,
+                COUNT(*) as total_orders,
+                SUM(o.total_amount) as total_revenue,
+                AVG(o.total_amount) as avg_order_value,
+                MAX(o.order_date) as last_order_date
+            FROM dbo.orders o
+            WHERE 1=1{order_filter}
+            GROUP BY o.customer_id
+        ),
+        InvoiceTotals AS (
+            SELECT 
+                i.customer_id,
+                COUNT(*) as total_invoices,
+                SUM(i.amount_paid) as total_paid,
+                SUM(i.amount_due) as outstanding_balance
+            FROM dbo.invoices i
+            WHERE 1=1{invoice_filter}
+            GROUP BY i.customer_id
+        ),
+        PaymentTotals AS (
+            SELECT 
+                p.customer_id,
+                COUNT(*) as total_payments,
+                MAX(p.payment_date) as last_payment_date
+            FROM dbo.payments p
+            WHERE 1=1{payment_filter}
+            GROUP BY p.customer_id
+        )
+        SELECT 
+            c.customer_id,
+            c.company_name,
+            c.customer_type,
+            c.credit_limit,
+            c.current_balance,
+            COALESCE(ot.total_orders, 0) as total_orders,
+            COALESCE(ot.total_revenue, 0) as total_revenue,
+            COALESCE(ot.avg_order_value, 0) as avg_order_value,
+            COALESCE(it.total_invoices, 0) as total_invoices,
+            COALESCE(it.total_paid, 0) as total_paid,
+            COALESCE(it.outstanding_balance, 0) as outstanding_balance,
+            COALESCE(pt.total_payments, 0) as total_payments,
+            ot.last_order_date,
+            pt.last_payment_date
+        FROM dbo.customers c
+        LEFT JOIN OrderTotals ot ON c.customer_id = ot.customer_id
+        LEFT JOIN InvoiceTotals it ON c.customer_id = it.customer_id
+        LEFT JOIN PaymentTotals pt ON c.customer_id = pt.customer_id
+        WHERE 1=1{customer_filter}
+        ORDER BY total_revenue DESC
+        """
+        params = order_params + single + single + customer_params
+        return query, params
+    
+    @staticmethod
+    def get_customer_analytics(customer_id=None, start_date=None, end_date=None):
+        """Get comprehensive customer analytics with order history, revenue, and payment stats"""
+        query, params = AdvancedDataLayer.build_customer_analytics_query(customer_id, start_date, end_date)
         return execute_query(query, params)
     
     @staticmethod
     def get_inventory_status_report():
         """Get comprehensive inventory status across all warehouses with reorder alerts"""
-        query = """
-        SELECT 
-            p.product_id,
-            p.product_code,
-            p.product_name,
-            p.category,
-            p.unit_price,
-            w.warehouse_id,
-            w.warehouse_name,
-            i.quantity_on_hand,
-            i.quantity_reserved,
-            i.quantity_available,
-            p.reorder_level,
-            p.reorder_quantity,
-            CASE 
-                WHEN i.quantity_available <= p.reorder_level THEN 'REORDER_NEEDED'
-                WHEN i.quantity_available <= (p.reorder_level * 1.5) THEN 'LOW_STOCK'
-                ELSE 'ADEQUATE'
-            END as stock_status,
-            s.supplier_name,
-            s.supplier_code,
-            i.last_stock_check,
-            i.last_restock_date
-        FROM dbo.products p
-        LEFT JOIN dbo.inventory i ON p.product_id = i.product_id
-        LEFT JOIN dbo.warehouses w ON i.warehouse_id = w.warehouse_id
-        LEFT JOIN dbo.suppliers s ON p.supplier_id = s.supplier_id
-        WHERE p.is_active = 1
-        ORDER BY 
-            CASE 
-                WHEN i.quantity_available <= p.reorder_level THEN 1
-                WHEN i.quantity_available <= (p.reorder_level * 1.5) THEN 2
-                ELSE 3
-            END,
-            p.product_name
-        """
-        return execute_query(query)
+        return execute_query(INVENTORY_STATUS_QUERY)
+    
+    @staticmethod
+    def stream_inventory_status_report(chunk_size=None):
+        """Inventory status report as a generator of row chunks (see stream_query)"""
+        chunk_size = chunk_size or get_config().EXPORT_CHUNK_SIZE
+        return stream_query(INVENTORY_STATUS_QUERY, chunk_size=chunk_size)
     
     @staticmethod
     def get_sales_performance_by_period(period='month', start_date=None, end_date=None):
-        """Get sales performance metrics grouped by time period"""
-        date_format = {
-            'day': "CONVERT(VARCHAR(10), o.order_date, 120)",
-            'week': "DATEPART(YEAR, o.order_date) * 100 + DATEPART(WEEK, o.order_date)",
-            'month': "FORMAT(o.order_date, 'yyyy-MM')",
-            'quarter': "CONCAT(YEAR(o.order_date), '-Q', DATEPART(QUARTER, o.order_date))",
-            'year': "YEAR(o.order_date)"
-        }.get(period, "FORMAT(o.order_date, 'yyyy-MM')")
-        
-        query = f"""
-        SELECT 
-            {date_format} as period,
-            COUNT(DISTINCT o.order_id) as total_orders,
-            COUNT(DISTINCT o.customer_id) as unique_customers,
-            SUM(o.subtotal) as gross_revenue,
-            SUM(o.discount_amount) as total_discounts,
-            SUM(o.tax_amount) as total_tax,
-            SUM(o.shipping_amount) as total_shipping,
-            SUM(o.total_amount) as net_revenue,
-            AVG(o.total_amount) as avg_order_value,
-            COUNT(DISTINCT CASE WHEN o.order_status = 'cancelled' THEN o.order_id END) as cancelled_orders,
-            SUM(CASE WHEN o.payment_status = 'paid' THEN o.total_amount ELSE 0 END) as paid_amount,
-            SUM(CASE WHEN o.payment_status = 'unpaid' THEN o.total_amount ELSE 0 END) as unpaid_amount
-        FROM dbo.orders o
-        WHERE 1=1
-        """
-        params = []
-        
-        if start_date:
-            query += " AND o.order_date >= ?"
-            params.append(start_date)
-        
-        if end_date:
-            query += " AND o.order_date <= ?"
-            params.append(end_date)
-        
-        query += f" GROUP BY {date_format}"
-        query += " ORDER BY period DESC"
-        
-        return execute_query(query, params)
+        """Get sales performance metrics grouped by time period (served from the daily rollups)"""
+        return SalesRollup.get_sales_performance(period, start_date, end_date)
     
     @staticmethod
     def get_product_performance_analysis(top_n=20):
@@ -253,64 +490,72 @@ class AdvancedDataLayer:
     @staticmethod
     def get_payment_collection_report():
         """Get accounts receivable and payment collection metrics"""
-        query = """
-        SELECT 
-            c.customer_id,
-            c.company_name,
-            c.credit_limit,
-            COUNT(DISTINCT i.invoice_id) as total_invoices,
-            SUM(i.total_amount) as total_invoiced,
-            SUM(i.amount_paid) as total_collected,
-            SUM(i.amount_due) as total_outstanding,
-            COUNT(DISTINCT CASE WHEN i.due_date < GETDATE() AND i.amount_due > 0 THEN i.invoice_id END) as overdue_invoices,
-            SUM(CASE WHEN i.due_date < GETDATE() THEN i.amount_due ELSE 0 END) as overdue_amount,
-            AVG(DATEDIFF(day, i.invoice_date, p.payment_date)) as avg_days_to_payment,
-            MAX(i.due_date) as latest_due_date,
-            CASE 
-                WHEN SUM(CASE WHEN i.due_date < GETDATE() THEN i.amount_due ELSE 0 END) > c.credit_limit * 0.8 THEN 'CRITICAL'
-                WHEN SUM(CASE WHEN i.due_date < GETDATE() THEN i.amount_due ELSE 0 END) > c.credit_limit * 0.5 THEN 'WARNING'
-                ELSE 'GOOD'
-            END as credit_status
-        FROM dbo.customers c
-        LEFT JOIN dbo.invoices i ON c.customer_id = i.customer_id
-        LEFT JOIN dbo.payments p ON i.invoice_id = p.invoice_id
-        GROUP BY c.customer_id, c.company_name, c.credit_limit
-        HAVING SUM(i.amount_due) > 0
-        ORDER BY total_outstanding DESC
+        return execute_query(PAYMENT_COLLECTION_QUERY)
+    
+    @staticmethod
+    def stream_payment_collection_report(chunk_size=None):
+        """Payment collection report as a generator of row chunks (see stream_query)"""
+        chunk_size = chunk_size or get_config().EXPORT_CHUNK_SIZE
+        return stream_query(PAYMENT_COLLECTION_QUERY, chunk_size=chunk_size)
+    
+    @staticmethod
+    def merge_warehouse_utilization(warehouses, inventory, orders, shipments):
         """
-        return execute_query(query)
+        Merge per-warehouse aggregates into the utilization report
+        
+        Args:
+            warehouses: Warehouse rows (WAREHOUSE_BASE_QUERY)
+            inventory: Inventory totals per warehouse (INVENTORY_BY_WAREHOUSE_QUERY)
+            orders: Order counts per warehouse (ORDERS_BY_WAREHOUSE_QUERY)
+            shipments: Shipment counts per warehouse (SHIPMENTS_BY_WAREHOUSE_QUERY)
+        
+        Returns:
+            List of report rows ordered by utilization_pct descending
+        """
+        inventory_by_id = _index_by(inventory, 'warehouse_id')
+        orders_by_id = _index_by(orders, 'warehouse_id')
+        shipments_by_id = _index_by(shipments, 'warehouse_id')
+        
+        report = []
+        for warehouse in warehouses:
+            warehouse_id = warehouse.get('warehouse_id')
+            stock = inventory_by_id.get(warehouse_id, {})
+            capacity = warehouse.get('capacity') or 0
+            units_stored = stock.get('total_units_stored') or 0
+            first_name = warehouse.get('manager_first_name')
+            last_name = warehouse.get('manager_last_name')
+            
+            report.append({
+                'warehouse_id': warehouse_id,
+                'warehouse_code': warehouse.get('warehouse_code'),
+                'warehouse_name': warehouse.get('warehouse_name'),
+                'location': warehouse.get('location'),
+                'capacity': warehouse.get('capacity'),
+                'unique_products': stock.get('unique_products') or 0,
+                'total_units_stored': units_stored,
+                'total_units_reserved': stock.get('total_units_reserved') or 0,
+                'total_units_available': stock.get('total_units_available') or 0,
+                'utilization_pct': (float(units_stored) / float(capacity)) * 100 if capacity > 0 else 0,
+                'orders_fulfilled': orders_by_id.get(warehouse_id, {}).get('orders_fulfilled') or 0,
+                'shipments_sent': shipments_by_id.get(warehouse_id, {}).get('shipments_sent') or 0,
+                'manager_name': f"{first_name} {last_name}" if first_name is not None and last_name is not None else None
+            })
+        
+        report.sort(key=lambda row: row['utilization_pct'], reverse=True)
+        return report
     
     @staticmethod
     def get_warehouse_utilization():
         """Get warehouse capacity and utilization metrics"""
-        query = """
-        SELECT 
-            w.warehouse_id,
-            w.warehouse_code,
-            w.warehouse_name,
-            w.location,
-            w.capacity,
-            COUNT(DISTINCT i.product_id) as unique_products,
-            SUM(i.quantity_on_hand) as total_units_stored,
-            SUM(i.quantity_reserved) as total_units_reserved,
-            SUM(i.quantity_available) as total_units_available,
-            CASE 
-                WHEN w.capacity > 0 THEN (CAST(SUM(i.quantity_on_hand) AS FLOAT) / w.capacity) * 100
-                ELSE 0 
-            END as utilization_pct,
-            COUNT(DISTINCT o.order_id) as orders_fulfilled,
-            COUNT(DISTINCT s.shipment_id) as shipments_sent,
-            u.first_name + ' ' + u.last_name as manager_name
-        FROM dbo.warehouses w
-        LEFT JOIN dbo.inventory i ON w.warehouse_id = i.warehouse_id
-        LEFT JOIN dbo.orders o ON w.warehouse_id = o.warehouse_id
-        LEFT JOIN dbo.shipments s ON w.warehouse_id = s.warehouse_id
-        LEFT JOIN dbo.users u ON w.manager_user_id = u.user_id
-        GROUP BY w.warehouse_id, w.warehouse_code, w.warehouse_name, w.location, 
-                 w.capacity, u.first_name, u.last_name
-        ORDER BY utilization_pct DESC
-        """
-        return execute_query(query)
+        results = run_parallel({
+            'warehouses': (WAREHOUSE_BASE_QUERY, None),
+            'inventory': (INVENTORY_BY_WAREHOUSE_QUERY, None),
+            'orders': (ORDERS_BY_WAREHOUSE_QUERY, None),
+            'shipments': (SHIPMENTS_BY_WAREHOUSE_QUERY, None)
+        })
+        return AdvancedDataLayer.merge_warehouse_utilization(
+            results['warehouses'], results['inventory'], results['orders'], results['shipments']
+        )
     
     @staticmethod
     def get_activity_summary_by_user(start_date=None, end_date=None):
@@ -352,57 +597,64 @@ class AdvancedDataLayer:
         """
         return execute_query(query, params)
     
+    @staticmethod
+    def merge_supplier_performance(suppliers, products, inventory, sales):
+        """
+        Merge per-supplier aggregates into the supplier performance report
+        
+        Args:
+            suppliers: Active supplier rows (SUPPLIER_BASE_QUERY)
+            products: Product totals per supplier (PRODUCTS_BY_SUPPLIER_QUERY)
+            inventory: Stock totals per supplier (INVENTORY_BY_SUPPLIER_QUERY)
+            sales: Sales totals per supplier (SALES_BY_SUPPLIER_QUERY)
+        
+        Returns:
+            List of report rows ordered by total_sales_value descending
+        """
+        products_by_id = _index_by(products, 'supplier_id')
+        inventory_by_id = _index_by(inventory, 'supplier_id')
+        sales_by_id = _index_by(sales, 'supplier_id')
+        
+        report = []
+        for supplier in suppliers:
+            supplier_id = supplier.get('supplier_id')
+            catalog = products_by_id.get(supplier_id, {})
+            stock = inventory_by_id.get(supplier_id, {})
+            sold = sales_by_id.get(supplier_id, {})
+            
+            report.append({
+                'supplier_id': supplier_id,
+                'supplier_code': supplier.get('supplier_code'),
+                'supplier_name': supplier.get('supplier_name'),
+                'rating': supplier.get('rating'),
+                'payment_terms': supplier.get('payment_terms'),
+                'products_supplied': catalog.get('products_supplied') or 0,
+                'inventory_locations': stock.get('inventory_locations') or 0,
+                'total_units_in_stock': stock.get('total_units_in_stock') or 0,
+                'orders_containing_products': sold.get('orders_containing_products') or 0,
+                'total_units_sold': sold.get('total_units_sold') or 0,
+                'total_sales_value': sold.get('total_sales_value') or 0,
+                'avg_profit_per_unit': catalog.get('avg_profit_per_unit'),
+                'last_restock_date': stock.get('last_restock_date')
+            })
+        
+        report.sort(key=lambda row: row['total_sales_value'], reverse=True)
+        return report
+    
     @staticmethod
     def get_supplier_performance():
         """Get supplier performance metrics and ratings"""
-        query = """
-        SELECT 
-            s.supplier_id,
-            s.supplier_code,
-            s.supplier_name,
-            s.rating,
-            s.payment_terms,
-            COUNT(DISTINCT p.product_id) as products_supplied,
-            COUNT(DISTINCT i.inventory_id) as inventory_locations,
-            SUM(i.quantity_on_hand) as total_units_in_stock,
-            COUNT(DISTINCT oi.order_id) as orders_containing_products,
-            SUM(oi.quantity) as total_units_sold,
-            SUM(oi.line_total) as total_sales_value,
-            AVG(p.unit_price - p.cost_price) as avg_profit_per_unit,
-            MAX(i.last_restock_date) as last_restock_date
-        FROM dbo.suppliers s
-        LEFT JOIN dbo.products p ON s.supplier_id = p.supplier_id
-        LEFT JOIN dbo.inventory i ON p.product_id = i.product_id
-        LEFT JOIN dbo.order_items oi ON p.product_id = oi.product_id
-        WHERE s.status = 'active'
-        GROUP BY s.supplier_id, s.supplier_code, s.supplier_name, s.rating, s.payment_terms
-        ORDER BY total_sales_value DESC
-        """
-        return execute_query(query)
+        results = run_parallel({
+            'suppliers': (SUPPLIER_BASE_QUERY, None),
+            'products': (PRODUCTS_BY_SUPPLIER_QUERY, None),
+            'inventory': (INVENTORY_BY_SUPPLIER_QUERY, None),
+            'sales': (SALES_BY_SUPPLIER_QUERY, None)
+        })
+        return AdvancedDataLayer.merge_supplier_performance(
+            results['suppliers'], results['products'], results['inventory'], results['sales']
+        )
     
     @staticmethod
     def get_revenue_forecast(months_ahead=3):
-        """Get revenue forecast based on historical trends"""
-        query = """
-        WITH MonthlyRevenue AS (
-            SELECT 
-                FORMAT(order_date, 'yyyy-MM') as month,
-                SUM(total_amount) as revenue,
-                COUNT(DISTINCT order_id) as order_count,
-                AVG(total_amount) as avg_order_value
-            FROM dbo.orders
-            WHERE order_status NOT IN ('cancelled')
-                AND order_date >= DATEADD(MONTH, -12, GETDATE())
-            GROUP BY FORMAT(order_date, 'yyyy-MM')
-        )
-        SELECT 
-            month,
-            revenue,
-            order_count,
-            avg_order_value,
-            AVG(revenue) OVER (ORDER BY month ROWS BETWEEN 2 PRECEDING AND CURRENT ROW) as moving_avg_3month,
-            (revenue - LAG(revenue) OVER (ORDER BY month)) / NULLIF(LAG(revenue) OVER (ORDER BY month), 0) * 100 as growth_rate_pct
-        FROM MonthlyRevenue
-        ORDER BY month DESC
-        """
-        return execute_query(query)
+        """Get revenue forecast (Holt-Winters / exponential smoothing over monthly rollups)"""
+        return RevenueForecaster.get_forecast(months_ahead)
@@ -0,0 +1,191 @@
+"""
+Caching utilities
+Thread-safe LRU caches with per-entry TTL and hit-rate statistics, kept in a
+named registry so every cache in the process can be inspected and cleared.
+CACHE_BACKEND selects in-process caches ('local') or caches shared by every
+worker on the host ('shared', see app.utils.shared_cache).
+"""
+import logging
+import time
+from collections import OrderedDict
+from threading import Lock
+from app.utils.shared_cache import SHARED_CACHE_AVAILABLE, SharedMemoryCache
+from config.config import get_config
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+CACHE_BACKENDS = ('local', 'shared')
+
+# Keys share version counters in this many stripes
+VERSION_STRIPES = 64
+
+
+class TTLCache:
+    """LRU cache with per-entry time-to-live"""
+
+    def __init__(self, name, maxsize=1024, ttl=300):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        self._generation = 0
+        self._versions = [0] * VERSION_STRIPES
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        """Get a value, or `default` if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def version(self, key):
+        """Version token for `key`; pass to set(if_version=...) after loading a value"""
+        return self._generation, self._versions[hash(key) % VERSION_STRIPES]
+
+    def set(self, key, value, ttl=None, if_version=None):
+        """
+        Store a value; `ttl` overrides the cache default (None = cache default)
+
+        With `if_version`, the value is stored only if no write or delete
+        touched the key's version stripe since version() returned that token.
+        """
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+
+        with self._lock:
+            stripe = hash(key) % VERSION_STRIPES
+            if if_version is None:
+                self._versions[stripe] += 1
+            elif if_version != (self._generation, self._versions[stripe]):
+                return value
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def get_or_set(self, key, factory, ttl=None):
+        """Return the cached value or compute, store and return factory()"""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            token = self.version(key)
+            value = self.set(key, factory(), ttl, if_version=token)
+        return value
+
+    def delete(self, key):
+        """Remove a single entry"""
+        with self._lock:
+            self._versions[hash(key) % VERSION_STRIPES] += 1
+            return self._entries.pop(key, _MISSING) is not _MISSING
+
+    def clear(self):
+        """Remove all entries"""
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """Size and hit-rate statistics"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'name': self.name,
+                'backend': 'local',
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+_caches = {}
+_registry_lock = Lock()
+
+
+def _create_cache(name, maxsize, ttl, config):
+    backend = str(config.CACHE_BACKEND).lower()
+    if backend not in CACHE_BACKENDS:
+        raise ValueError(f"CACHE_BACKEND must be one of {CACHE_BACKENDS}, got '{backend}'")
+
+    if backend == 'shared':
+        if not SHARED_CACHE_AVAILABLE:
+            logger.warning(f"Shared cache backend unavailable on this platform; cache '{name}' is process-local")
+        else:
+            try:
+                return SharedMemoryCache(
+                    name, maxsize=maxsize, ttl=ttl,
+                    slot_size=config.SHARED_CACHE_SLOT_SIZE,
+                    max_value_size=config.SHARED_CACHE_MAX_VALUE_BYTES,
+                    directory=config.SHARED_CACHE_DIR or None,
+                    namespace=config.SHARED_CACHE_NAMESPACE
+                )
+            except OSError as e:
+                logger.error(f"Error creating shared cache '{name}', using a process-local cache: {str(e)}")
+    return TTLCache(name, maxsize=maxsize, ttl=ttl)
+
+
+def get_cache(name, maxsize=None, ttl=None):
+    """
+    Get (or create) a named cache
+
+    Args:
+        name: Cache name
+        maxsize: Maximum number of entries (default CACHE_DEFAULT_MAXSIZE)
+        ttl: Default time-to-live in seconds (default CACHE_DEFAULT_TTL)
+
+    Returns:
+        Cache instance (TTLCache or SharedMemoryCache, per CACHE_BACKEND)
+        shared by every caller using the same name
+    """
+    cache = _caches.get(name)
+    if cache is not None:
+        return cache
+
+    with _registry_lock:
+        cache = _caches.get(name)
+        if cache is None:
+            config = get_config()
+            cache = _create_cache(
+                name,
+                maxsize if maxsize is not None else config.CACHE_DEFAULT_MAXSIZE,
+                ttl if ttl is not None else config.CACHE_DEFAULT_TTL,
+                config
+            )
+            _caches[name] = cache
+            logger.debug(f"Cache '{name}' created (maxsize={cache.maxsize}, ttl={cache.ttl})")
+    return cache
+
+
+def cache_stats():
+    """Statistics for every registered cache"""
+    return {name: cache.stats() for name, cache in list(_caches.items())}
+
+
+def clear_all_caches():
+    """Clear every registered cache"""
+    for cache in list(_caches.values()):
+        cache.clear()
@@ -0,0 +1,127 @@
+"""
+Response compression
+gzip, brotli and zstd content encoding negotiated from Accept-Encoding, with
+a minimum-size threshold. brotli and zstd are used only when their packages
+are installed.
+"""
+import gzip
+import logging
+from flask import Response, current_app, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Media types worth compressing (text/* plus these)
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'application/msgpack',
+                      'application/javascript', 'application/xml')
+
+
+def _zstd_compress(data, level):
+    return zstandard.ZstdCompressor(level=level).compress(data)
+
+
+# encoding -> (compress(data, level), level); dict order is the
+# server preference when the client accepts several with equal quality
+ENCODERS = {}
+if brotli is not None:
+    ENCODERS['br'] = (lambda data, level: brotli.compress(data, quality=level), 5)
+if zstandard is not None:
+    ENCODERS['zstd'] = (_zstd_compress, 3)
+ENCODERS['gzip'] = (lambda data, level: gzip.compress(data, compresslevel=level, mtime=0), 6)
+
+
+def is_compressible(mimetype):
+    return bool(mimetype) and (mimetype.startswith('text/') or mimetype in COMPRESSIBLE_TYPES)
+
+
+def negotiate_encoding(size):
+    """
+    Pick a content encoding for a body of `size` bytes
+
+    Returns:
+        Encoding name, or None to send the body as is
+    """
+    config = current_app.config
+    if not config.get('COMPRESSION_ENABLED', True) or size < config.get('COMPRESSION_MIN_SIZE', 1024):
+        return None
+
+    best, best_quality = None, 0
+    for encoding in ENCODERS:
+        quality = request.accept_encodings.quality(encoding)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(data, encoding):
+    """Compress bytes with a negotiated encoding"""
+    compressor, level = ENCODERS[encoding]
+    return compressor(data, level)
+
+
+def encoded_response(variants, body_factory, mimetype='application/json'):
+    """
+    Response built from memoized encoded bodies
+
+    Args:
+        variants: Dict that caches bodies per encoding ('identity' plus any
+            compressed variants); stored alongside a cache entry so a hot
+            body is serialized and compressed once
+        body_factory: Callable returning the uncompressed body bytes
+        mimetype: Response media type
+
+    Returns:
+        Flask Response with Content-Encoding set when compressed
+    """
+    body = variants.get('identity')
+    if body is None:
+        body = variants.setdefault('identity', body_factory())
+
+    encoding = negotiate_encoding(len(body))
+    if encoding:
+        encoded = variants.get(encoding)
+        if encoded is None:
+            encoded = variants.setdefault(encoding, compress(body, encoding))
+        body = encoded
+
+    response = Response(body, mimetype=mimetype)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def compress_response(response):
+    """after_request hook: compress eligible buffered responses"""
+    if (response.status_code < 200 or response.status_code in (204, 304)
+            or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or not is_compressible(response.mimetype)):
+        return response
+
+    data = response.get_data()
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate_encoding(len(data))
+    if encoding:
+        response.set_data(compress(data, encoding))
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def init_compression(app):
+    """Register the compression hook on the app"""
+    if not app.config.get('COMPRESSION_ENABLED', True):
+        logger.info("Response compression disabled")
+        return
+    app.after_request(compress_response)
+    logger.info(f"Response compression enabled ({', '.join(ENCODERS)}; "
+                f"min size {app.config.get('COMPRESSION_MIN_SIZE', 1024)} bytes)")
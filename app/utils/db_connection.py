@@ -4,10 +4,15 @@ Handles MSSQL connections using pyodbc or mock database
 """
 import os
 import logging
+import random
+import re
+import time
 from contextlib import contextmanager
+from contextvars import ContextVar
 from threading import Lock
 from queue import Queue, Empty
 from config.config import get_config
+from app.utils.query_helpers import build_update_query, changed_columns
 
 logger = logging.getLogger(__name__)
 
@@ -116,6 +121,15 @@ class DatabaseConnectionPool:
         except Exception as e:
             logger.error(f"Error returning connection to pool: {str(e)}")
     
+    def discard_connection(self, conn):
+        """Close a broken connection instead of returning it to the pool"""
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._lock:
+            self._current_size -= 1
+
     def close_all(self):
         """Close all connections in the pool"""
         while not self._pool.empty():
@@ -131,6 +145,128 @@ class DatabaseConnectionPool:
         logger.info("All connections closed")
 
 
+# Transient SQL Server errors by native error number (found in the driver message as "(1205)")
+TRANSIENT_ERRORS = {
+    1205: 'deadlock',          # chosen as deadlock victim
+    3960: 'serialization',     # snapshot isolation update conflict
+    41302: 'serialization',    # in-memory OLTP update conflict
+    233: 'connection',         # no process on the other end of the pipe
+    10053: 'connection',       # connection aborted
+    10054: 'connection',       # connection reset by peer
+}
+
+# ... and by ODBC SQLSTATE (first element of pyodbc.Error.args)
+TRANSIENT_SQLSTATES = {
+    '40001': 'serialization',  # serialization failure (SQL Server reports deadlocks this way)
+    '08S01': 'connection',     # communication link failure
+    '08001': 'connection',     # unable to establish connection
+}
+
+# Native error code as pyodbc formats it: "... (1205) (SQLExecDirectW)". Only
+# the number right before the ODBC function name (or ending the message) is
+# the code; other parenthesized numbers are message text, such as a
+# duplicate key value.
+_NATIVE_CODE = re.compile(r'\((\d+)\)\s*(?:\(SQL\w+\)|$)')
+
+
+def classify_error(error):
+    """
+    Classify a database error for retrying
+
+    Returns:
+        'deadlock', 'serialization' or 'connection' for transient errors,
+        None for errors that would fail again
+    """
+    args = getattr(error, 'args', ())
+    sqlstate = args[0] if args and isinstance(args[0], str) else None
+    for arg in args:
+        for code in _NATIVE_CODE.findall(str(arg).strip()):
+            if int(code) in TRANSIENT_ERRORS:
+                return TRANSIENT_ERRORS[int(code)]
+    return TRANSIENT_SQLSTATES.get(sqlstate)
+
+
+class RetryPolicy:
+    """
+    Re-runs a unit of work that failed with a transient error
+
+    Deadlock victims and serialization failures were rolled back by the
+    server, so the whole unit can always run again. After a dropped
+    connection the outcome of a commit is unknown, so those are retried
+    only for idempotent units. Delays use exponential backoff with full
+    jitter: uniform(0, min(max_delay, base_delay * 2 ** retry)).
+    """
+
+    def __init__(self, max_attempts=4, base_delay_ms=50, max_delay_ms=1000):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay_ms / 1000
+        self.max_delay = max_delay_ms / 1000
+        self._lock = Lock()
+        self._counts = {'retries': 0, 'recovered': 0, 'exhausted': 0}
+        self._by_kind = {}
+
+    def _count(self, name, kind=None):
+        with self._lock:
+            self._counts[name] += 1
+            if kind:
+                self._by_kind[kind] = self._by_kind.get(kind, 0) + 1
+
+    def run(self, work, idempotent=True):
+        """Call work() until it succeeds, fails permanently or runs out of attempts"""
+        if _current_unit.get() is not None:
+            # Part of a larger transaction: only the whole unit could be retried
+            return work()
+        attempt = 1
+        while True:
+            try:
+                result = work()
+            except Exception as e:
+                kind = classify_error(e)
+                if kind is None or (kind == 'connection' and not idempotent):
+                    raise
+                if attempt >= self.max_attempts:
+                    self._count('exhausted')
+                    logger.error(f"Giving up after {attempt} attempts ({kind}): {str(e)}")
+                    raise
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+                self._count('retries', kind)
+                logger.warning(f"Transient database error ({kind}), retry {attempt} "
+                               f"in {delay * 1000:.0f} ms: {str(e)}")
+                time.sleep(delay)
+                attempt += 1
+                continue
+            if attempt > 1:
+                self._count('recovered')
+            return result
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counts, by_error=dict(self._by_kind))
+
+
+_retry_config = get_config()
+retry_policy = RetryPolicy(
+    max_attempts=_retry_config.DB_RETRY_ATTEMPTS,
+    base_delay_ms=_retry_config.DB_RETRY_BASE_MS,
+    max_delay_ms=_retry_config.DB_RETRY_MAX_MS
+)
+
+
+def with_retry(work, idempotent=True):
+    """
+    Run a unit of work under the retry policy
+
+    `work` must open its own connection (get_connection / get_db_cursor)
+    so every attempt starts a fresh transaction.
+    """
+    return retry_policy.run(work, idempotent)
+
+
+def retry_stats():
+    """Retry counters: retries (total and by error class), recovered and exhausted units"""
+    return retry_policy.stats()
+
+
 # Global connection pool instance
 _connection_pool = None
 _pool_lock = Lock()
@@ -163,7 +299,17 @@ def get_pool():
 
 @contextmanager
 def get_db_connection():
-    """Context manager for database connections"""
+    """
+    Context manager for database connections
+    
+    Inside unit_of_work() this yields the unit's connection instead, so
+    the caller's statements join its transaction.
+    """
+    unit = _current_unit.get()
+    if unit is not None:
+        yield unit.participant
+        return
+    
     pool = get_pool()
     conn = None
     
@@ -172,10 +318,14 @@ def get_db_connection():
         yield conn
     except Exception as e:
         if conn:
-            try:
-                conn.rollback()
-            except:
-                pass
+            if classify_error(e) == 'connection':
+                pool.discard_connection(conn)
+                conn = None
+            else:
+                try:
+                    conn.rollback()
+                except:
+                    pass
         logger.error(f"Database connection error: {str(e)}")
         raise
     finally:
@@ -200,6 +350,154 @@ def get_db_cursor(commit=False):
             cursor.close()
 
 
+# Unit of work active in this thread/context
+_current_unit = ContextVar('unit_of_work', default=None)
+
+# Parameters per batch sent by UnitOfWork.flush (SQL Server allows 2100 per request)
+MAX_BATCH_PARAMS = 2000
+
+
+class _ParticipantConnection:
+    """Connection handed to code running inside a unit of work"""
+    
+    def __init__(self, unit):
+        self._unit = unit
+    
+    def cursor(self):
+        # Queued writes go first so reads see them
+        self._unit.flush()
+        return self._unit.connection.cursor()
+    
+    def commit(self):
+        # The outermost unit_of_work() commits
+        self._unit.flush()
+    
+    def rollback(self):
+        self._unit.rollback_only = True
+    
+    def __getattr__(self, name):
+        return getattr(self._unit.connection, name)
+
+
+class UnitOfWork:
+    """
+    One connection and one transaction for a read-decide-write sequence
+    
+    Reads run immediately; writes passed to queue() (or execute_transaction)
+    are held and sent together, several statements per round trip, before
+    the next read and at commit.
+    """
+    
+    def __init__(self, connection):
+        self.connection = connection
+        self.participant = _ParticipantConnection(self)
+        self.rollback_only = False
+        self.round_trips = 0
+        self._cursor = connection.cursor()
+        self._queued = []
+        self._after_commit = []
+    
+    def queue(self, query, params=None):
+        """Add a write to the next batch"""
+        self._queued.append((query.strip().rstrip(';'), list(params or ())))
+    
+    def flush(self):
+        """Send queued writes in as few batches as the parameter limit allows"""
+        queued, self._queued = self._queued, []
+        batch, batch_params = [], []
+        for query, params in queued:
+            if batch and len(batch_params) + len(params) > MAX_BATCH_PARAMS:
+                self._send(batch, batch_params)
+                batch, batch_params = [], []
+            batch.append(query)
+            batch_params.extend(params)
+        if batch:
+            self._send(batch, batch_params)
+    
+    def _send(self, queries, params):
+        self.round_trips += 1
+        if len(queries) == 1:
+            self._cursor.execute(queries[0], params) if params else self._cursor.execute(queries[0])
+            return
+        sql = 'SET NOCOUNT ON;\n' + ';\n'.join(queries)
+        self._cursor.execute(sql, params) if params else self._cursor.execute(sql)
+        # Step through every statement's result so errors in later ones surface here
+        while self._cursor.nextset():
+            pass
+    
+    def execute(self, query, params=None):
+        """Run a statement now (after queued writes); returns the cursor"""
+        self.flush()
+        self.round_trips += 1
+        if params:
+            self._cursor.execute(query, params)
+        else:
+            self._cursor.execute(query)
+        return self._cursor
+    
+    def fetch_all(self, query, params=None):
+        """Rows of a query as dictionaries"""
+        cursor = self.execute(query, params)
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+    
+    def fetch_one(self, query, params=None):
+        """First row of a query as a dictionary, or None"""
+        cursor = self.execute(query, params)
+        row = cursor.fetchone()
+        return dict(zip([column[0] for column in cursor.description], row)) if row else None
+    
+    def after_commit(self, callback):
+        """Run callback once the transaction has committed (skipped on rollback)"""
+        self._after_commit.append(callback)
+
+
+@contextmanager
+def unit_of_work():
+    """
+    Run a block in one transaction on one pooled connection
+    
+    Statements issued through execute_query, execute_transaction,
+    update_changed or get_connection() inside the block join the unit, as
+    do nested unit_of_work() blocks; the outermost block commits once.
+    An exception anywhere rolls everything back.
+    
+    Yields:
+        The UnitOfWork
+    """
+    unit = _current_unit.get()
+    if unit is not None:
+        try:
+            yield unit
+        except Exception:
+            unit.rollback_only = True
+            raise
+        return
+    
+    with get_db_connection() as conn:
+        unit = UnitOfWork(conn)
+        token = _current_unit.set(unit)
+        try:
+            yield unit
+            unit.flush()
+            if unit.rollback_only:
+                raise RuntimeError('Unit of work rolled back by a participant')
+            conn.commit()
+        finally:
+            _current_unit.reset(token)
+    for callback in unit._after_commit:
+        callback()
+
+
+def after_commit(callback):
+    """Run callback after the current unit of work commits, or now outside one"""
+    unit = _current_unit.get()
+    if unit is None:
+        callback()
+    else:
+        unit.after_commit(callback)
+
+
 def execute_query(query, params=None, fetch_one=False, fetch_all=True, commit=False):
     """
     Execute a SQL query and return results
@@ -213,27 +511,72 @@ def execute_query(query, params=None, fetch_one=False, fetch_all=True, commit=Fa
     
     Returns:
         Query results or None
+    
+    Transient errors are retried under the retry policy (dropped
+    connections only when commit is False).
     """
-    with get_db_cursor(commit=commit) as cursor:
+    def run():
+        with get_db_cursor(commit=commit) as cursor:
+            try:
+                if params:
+                    cursor.execute(query, params)
+                else:
+                    cursor.execute(query)
+            
+                if fetch_one:
+                    row = cursor.fetchone()
+                    return dict(zip([column[0] for column in cursor.description], row)) if row else None
+                elif fetch_all:
+                    columns = [column[0] for column in cursor.description]
+                    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+                else:
+                    return cursor.rowcount
+                
+            except Exception as e:
+                logger.error(f"Query execution error: {str(e)}")
+                logger.error(f"Query: {query}")
+                logger.error(f"Params: {params}")
+                raise
+    
+    # Without a commit nothing was written, so a dropped connection is safe to retry
+    return retry_policy.run(run, idempotent=not commit)
+
+
+def stream_query(query, params=None, chunk_size=1000):
+    """
+    Execute a SQL query and yield results in chunks
+    
+    Rows are pulled from the forward-only cursor with fetchmany, so memory
+    stays bounded by chunk_size regardless of result size. The pooled
+    connection is held until the generator is exhausted or closed.
+    
+    Args:
+        query: SQL query string
+        params: Query parameters (tuple or list)
+        chunk_size: Rows per chunk
+    
+    Yields:
+        Lists of row dictionaries
+    """
+    with get_db_cursor() as cursor:
         try:
             if params:
                 cursor.execute(query, params)
             else:
                 cursor.execute(query)
             
-            if fetch_one:
-                row = cursor.fetchone()
-                return dict(zip([column[0] for column in cursor.description], row)) if row else None
-            elif fetch_all:
-                columns = [column[0] for column in cursor.description]
-                return [dict(zip(columns, row)) for row in cursor.fetchall()]
-            else:
-                return cursor.rowcount
+            columns = [column[0] for column in cursor.description]
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield [dict(zip(columns, row)) for row in rows]
                 
+        except GeneratorExit:
+            raise
         except Exception as e:
-            logger.error(f"Query execution error: {str(e)}")
+            logger.error(f"Streaming query error: {str(e)}")
             logger.error(f"Query: {query}")
-            logger.error(f"Params: {params}")
             raise
 
 
@@ -258,34 +601,99 @@ def execute_many(query, params_list, commit=True):
             raise
 
 
-def execute_transaction(queries_with_params):
+def execute_transaction(queries_with_params, params=None, idempotent=False):
     """
     Execute multiple queries in a single transaction
     
     Args:
-        queries_with_params: List of tuples (query, params)
+        queries_with_params: List of tuples (query, params), or a single
+            query string with its parameters in `params`
+        params: Parameters of a single query
+        idempotent: The statements can safely run twice, so a transaction
+            whose connection dropped (commit outcome unknown) is retried too;
+            deadlocks and serialization failures are always retried
     
     Returns:
-        True if successful
+        True if successful (inside unit_of_work(), once queued)
     """
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
-        try:
-            for query, params in queries_with_params:
-                if params:
-                    cursor.execute(query, params)
-                else:
-                    cursor.execute(query)
+    if isinstance(queries_with_params, str):
+        queries_with_params = [(queries_with_params, params)]
+    
+    unit = _current_unit.get()
+    if unit is not None:
+        for query, query_params in queries_with_params:
+            unit.queue(query, query_params)
+        return True
+    
+    def run():
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                for query, params in queries_with_params:
+                    if params:
+                        cursor.execute(query, params)
+                    else:
+                        cursor.execute(query)
             
-            conn.commit()
-            return True
+                conn.commit()
+                return True
             
-        except Exception as e:
-            conn.rollback()
-            logger.error(f"Transaction error: {str(e)}")
-            raise
-        finally:
-            cursor.close()
+            except Exception as e:
+                conn.rollback()
+                logger.error(f"Transaction error: {str(e)}")
+                raise
+            finally:
+                cursor.close()
+    
+    return retry_policy.run(run, idempotent)
+
+
+def update_changed(table, key_column, key, data, columns, touch_column='updated_at'):
+    """
+    Update only the columns whose values changed
+    
+    Reads the row with an update lock, diffs `data` against it and writes
+    the changed columns in the same transaction. Nothing is written when
+    no column changed, so unchanged values are never overwritten (or
+    nulled) and untouched indexes are not maintained.
+    
+    Args:
+        table: Table name
+        key_column: Primary key column
+        key: Primary key value
+        data: Fields sent by the client
+        columns: Columns the caller may update
+        touch_column: Timestamp column set to GETDATE() when something changed
+    
+    Returns:
+        Dict of the columns written ({} if nothing changed), or None if the row does not exist
+    """
+    def run():
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(f"SELECT {', '.join(columns)} FROM {table} WITH (UPDLOCK, ROWLOCK) "
+                               f"WHERE {key_column} = ?", [key])
+                row = cursor.fetchone()
+                if row is None:
+                    return None
+                current = dict(zip([column[0] for column in cursor.description], row))
+                changes = changed_columns(current, data, columns)
+                if changes:
+                    query, params = build_update_query(table, changes, f"{key_column} = ?", (key,),
+                                                       touch_column=touch_column)
+                    cursor.execute(query, params)
+                conn.commit()
+                return changes
+            except Exception as e:
+                conn.rollback()
+                logger.error(f"Update error on {table} {key}: {str(e)}")
+                raise
+            finally:
+                cursor.close()
+    
+    # A rerun re-reads and re-diffs the row, so repeating it is harmless
+    return retry_policy.run(run)
 
 
 def call_stored_procedure(proc_name, params=None):
@@ -0,0 +1,71 @@
+"""
+Entity cache
+Per-entity LRU/TTL caches for rows read by primary key. Services read
+through get_entity() and write through put_entity() / evict_entity() after
+committing, so cached rows never outlive a write made through the API.
+Inside unit_of_work() the cache writes wait for the unit to commit.
+"""
+import logging
+from app.utils.cache import get_cache, cache_stats
+from app.utils.db_connection import after_commit
+from config.config import get_config
+
+logger = logging.getLogger(__name__)
+
+
+def entity_cache(entity):
+    """The TTLCache holding rows for an entity ('customer', 'product', ...)"""
+    config = get_config()
+    return get_cache(
+        f"entity:{entity}",
+        maxsize=config.ENTITY_CACHE_MAXSIZE.get(entity, config.CACHE_DEFAULT_MAXSIZE),
+        ttl=config.ENTITY_CACHE_TTL
+    )
+
+
+def get_entity(entity, entity_id, loader):
+    """
+    Read-through lookup by primary key
+
+    Args:
+        entity: Entity name
+        entity_id: Primary key
+        loader: Callable that fetches the row from the database (dict or None)
+
+    Returns:
+        Copy of the row dict, or None if it does not exist (misses are not cached)
+    """
+    cache = entity_cache(entity)
+    row = cache.get(entity_id)
+    if row is None:
+        # Don't store a row that a concurrent write has already replaced
+        token = cache.version(entity_id)
+        row = loader()
+        if row is None:
+            return None
+        cache.set(entity_id, row, if_version=token)
+    return dict(row)
+
+
+def put_entity(entity, entity_id, row):
+    """Store a freshly written row (write-through); returns a copy of it"""
+    if row is None:
+        evict_entity(entity, entity_id)
+        return None
+    row = dict(row)
+    after_commit(lambda: entity_cache(entity).set(entity_id, row))
+    return dict(row)
+
+
+def evict_entity(entity, entity_id):
+    """Drop a cached row"""
+    after_commit(lambda: entity_cache(entity).delete(entity_id))
+
+
+def entity_cache_stats():
+    """Size and hit-rate statistics for every entity cache"""
+    return {
+        name.split(':', 1)[1]: stats
+        for name, stats in cache_stats().items()
+        if name.startswith('entity:')
+    }
@@ -0,0 +1,180 @@
+"""
+Streaming report export
+Renders row chunks (lists of dictionaries, as yielded by stream_query) as
+CSV, NDJSON or an Arrow IPC stream without materializing the full result
+"""
+import csv
+import io
+import logging
+from datetime import date, datetime, time
+from itertools import chain
+from flask import Response, current_app, request, stream_with_context
+
+try:
+    import pyarrow as pa
+    ARROW_AVAILABLE = True
+except ImportError:
+    pa = None
+    ARROW_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# format -> (mimetype, file extension)
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrows')
+}
+
+
+class ExportFormatError(ValueError):
+    """Requested export format is unknown or unavailable"""
+
+
+def requested_export_format():
+    """
+    Export format from the `format` query argument
+
+    Returns:
+        Format name, or None for the default JSON response
+
+    Raises:
+        ExportFormatError: Unknown format, or arrow without pyarrow installed
+    """
+    fmt = (request.args.get('format') or '').strip().lower()
+    if not fmt or fmt == 'json':
+        return None
+    if fmt not in EXPORT_FORMATS:
+        raise ExportFormatError(
+            f"Unsupported format '{fmt}'. Use one of: json, {', '.join(EXPORT_FORMATS)}"
+        )
+    if fmt == 'arrow' and not ARROW_AVAILABLE:
+        raise ExportFormatError("Arrow export requires pyarrow to be installed")
+    return fmt
+
+
+def wants_ndjson():
+    """True when the Accept header prefers application/x-ndjson over JSON"""
+    best = request.accept_mimetypes.best_match(['application/json', 'application/x-ndjson'])
+    return best == 'application/x-ndjson'
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    return value
+
+
+def iter_csv(chunks):
+    """Yield CSV text, one piece per chunk, with a header from the first row"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    columns = None
+
+    for rows in chunks:
+        if not rows:
+            continue
+        if columns is None:
+            columns = list(rows[0].keys())
+            writer.writerow(columns)
+        for row in rows:
+            writer.writerow([_csv_value(row.get(column)) for column in columns])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+
+
+def iter_ndjson(chunks):
+    """Yield newline-delimited JSON, one piece per chunk"""
+    dumps = current_app.json.dumps
+    for rows in chunks:
+        if rows:
+            yield ''.join(dumps(row) + '\n' for row in rows)
+
+
+def _arrow_schema(rows):
+    """
+    Infer a schema from the first chunk
+
+    Decimal columns are widened to full precision so larger values in later
+    chunks still fit.
+
+    Returns:
+        Tuple of (schema, names of all-null columns typed as string)
+    """
+    inferred = pa.Table.from_pylist(rows).schema
+    null_columns = [field.name for field in inferred if pa.types.is_null(field.type)]
+    fields = []
+    for field in inferred:
+        if field.name in null_columns:
+            field = pa.field(field.name, pa.string())
+        elif pa.types.is_decimal(field.type):
+            field = pa.field(field.name, pa.decimal128(38, field.type.scale))
+        fields.append(field)
+    schema = pa.schema(fields)
+    return schema, null_columns
+
+
+def iter_arrow(chunks):
+    """Yield an Arrow IPC stream, one record batch per chunk"""
+    sink = io.BytesIO()
+    writer = None
+    schema = None
+    null_columns = ()
+
+    for rows in chunks:
+        if not rows:
+            continue
+        if writer is None:
+            schema, null_columns = _arrow_schema(rows)
+            writer = pa.ipc.new_stream(sink, schema)
+        if null_columns:
+            rows = [
+                {**row, **{name: str(row[name]) for name in null_columns if row.get(name) is not None}}
+                for row in rows
+            ]
+        writer.write_batch(pa.RecordBatch.from_pylist(rows, schema=schema))
+        yield sink.getvalue()
+        sink.seek(0)
+        sink.truncate(0)
+
+    if writer is None:
+        return
+    writer.close()
+    yield sink.getvalue()
+
+
+_RENDERERS = {
+    'csv': iter_csv,
+    'ndjson': iter_ndjson,
+    'arrow': iter_arrow
+}
+
+
+def export_response(chunks, fmt, filename=None):
+    """
+    Build a streaming response
+
+    The first chunk is pulled before the response starts so that query errors
+    surface to the caller (and become a normal error response) instead of
+    truncating a stream that has already sent a 200.
+
+    Args:
+        chunks: Iterable of row lists (a materialized report can be passed as [rows])
+        fmt: Export format from requested_export_format()
+        filename: Download name without extension (None streams inline)
+
+    Returns:
+        Flask Response
+    """
+    chunks = iter(chunks)
+    first = next(chunks, [])
+    mimetype, extension = EXPORT_FORMATS[fmt]
+    body = _RENDERERS[fmt](chain([first], chunks))
+
+    headers = {}
+    if filename:
+        headers['Content-Disposition'] = f'attachment; filename="{filename}.{extension}"'
+    return Response(stream_with_context(body), mimetype=mimetype, headers=headers)
@@ -0,0 +1,253 @@
+"""
+Revenue forecasting
+Exponential smoothing (Holt-Winters additive, Holt linear trend) fitted in
+process over the monthly revenue series from the daily sales rollups
+"""
+import logging
+import math
+from datetime import date
+from itertools import product
+from app.utils.cache import get_cache
+from app.utils.sales_rollup import SalesRollup
+from config.config import get_config
+
+logger = logging.getLogger(__name__)
+
+SEASON_LENGTH = 12
+CONFIDENCE_LEVEL = 0.95
+Z_SCORE = 1.96
+
+# Smoothing parameter grid searched on every refit
+PARAMETER_GRID = [round(0.05 + 0.1 * step, 2) for step in range(10)]
+
+
+def forecast_cache():
+    """The revenue forecast cache, with its size and TTL whichever caller creates it first"""
+    return get_cache('revenue_forecast', maxsize=64, ttl=get_config().FORECAST_CACHE_TTL)
+
+
+def _add_months(month_start, months):
+    """Shift a first-of-month date by a number of months"""
+    index = month_start.year * 12 + (month_start.month - 1) + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _month_key(month_start):
+    return month_start.strftime('%Y-%m')
+
+
+def holt_linear(series, alpha, beta):
+    """
+    Holt's linear trend method
+
+    Returns:
+        Tuple of (level, trend, sse) after consuming the series
+    """
+    level = series[0]
+    trend = series[1] - series[0]
+    sse = 0.0
+    for value in series[1:]:
+        error = value - (level + trend)
+        sse += error * error
+        previous_level = level
+        level = alpha * value + (1 - alpha) * (level + trend)
+        trend = beta * (level - previous_level) + (1 - beta) * trend
+    return level, trend, sse
+
+
+def holt_winters_additive(series, alpha, beta, gamma, season_length=SEASON_LENGTH):
+    """
+    Additive Holt-Winters; needs at least two full seasons
+
+    Returns:
+        Tuple of (level, trend, seasonals, sse) where seasonals are aligned so
+        seasonals[(h - 1) % season_length] applies h steps past the series end
+    """
+    first = series[:season_length]
+    second = series[season_length:2 * season_length]
+    level = sum(first) / season_length
+    trend = (sum(second) - sum(first)) / (season_length * season_length)
+    seasonals = [value - level for value in first]
+
+    sse = 0.0
+    for index in range(season_length, len(series)):
+        value = series[index]
+        season = seasonals[index % season_length]
+        error = value - (level + trend + season)
+        sse += error * error
+        previous_level = level
+        level = alpha * (value - season) + (1 - alpha) * (level + trend)
+        trend = beta * (level - previous_level) + (1 - beta) * trend
+        seasonals[index % season_length] = gamma * (value - level) + (1 - gamma) * season
+
+    offset = len(series) % season_length
+    aligned = seasonals[offset:] + seasonals[:offset]
+    return level, trend, aligned, sse
+
+
+def fit_model(series):
+    """
+    Fit the best smoothing model for the series by grid search on SSE
+
+    Returns:
+        Model dictionary consumed by project()
+    """
+    n = len(series)
+
+    if n >= 2 * SEASON_LENGTH:
+        best = None
+        for alpha, beta, gamma in product(PARAMETER_GRID, PARAMETER_GRID, PARAMETER_GRID):
+            level, trend, seasonals, sse = holt_winters_additive(series, alpha, beta, gamma)
+            if best is None or sse < best[0]:
+                best = (sse, alpha, beta, gamma, level, trend, seasonals)
+        sse, alpha, beta, gamma, level, trend, seasonals = best
+        residual_count = n - SEASON_LENGTH
+        return {
+            'method': 'holt_winters_additive',
+            'alpha': alpha, 'beta': beta, 'gamma': gamma,
+            'season_length': SEASON_LENGTH,
+            'level': level, 'trend': trend, 'seasonals': seasonals,
+            'rmse': math.sqrt(sse / max(residual_count - 3, 1))
+        }
+
+    if n >= 3:
+        best = None
+        for alpha, beta in product(PARAMETER_GRID, PARAMETER_GRID):
+            level, trend, sse = holt_linear(series, alpha, beta)
+            if best is None or sse < best[0]:
+                best = (sse, alpha, beta, level, trend)
+        sse, alpha, beta, level, trend = best
+        return {
+            'method': 'holt_linear',
+            'alpha': alpha, 'beta': beta, 'gamma': None,
+            'season_length': None,
+            'level': level, 'trend': trend, 'seasonals': None,
+            'rmse': math.sqrt(sse / max(n - 1 - 2, 1))
+        }
+
+    # Too little history to smooth: flat forecast at the mean
+    mean = sum(series) / n if n else 0.0
+    spread = math.sqrt(sum((value - mean) ** 2 for value in series) / n) if n else 0.0
+    return {
+        'method': 'mean',
+        'alpha': None, 'beta': None, 'gamma': None,
+        'season_length': None,
+        'level': mean, 'trend': 0.0, 'seasonals': None,
+        'rmse': spread
+    }
+
+
+def project(model, steps):
+    """
+    Project a fitted model forward
+
+    Returns:
+        List of (point, lower, upper) tuples for steps 1..steps
+    """
+    projections = []
+    seasonals = model['seasonals']
+    for step in range(1, steps + 1):
+        point = model['level'] + step * model['trend']
+        if seasonals:
+            point += seasonals[(step - 1) % len(seasonals)]
+        margin = Z_SCORE * model['rmse'] * math.sqrt(step)
+        projections.append((point, point - margin, point + margin))
+    return projections
+
+
+def _history_rows(months, series, counts):
+    """Historical rows with the same metrics the SQL report used to return"""
+    rows = []
+    for index, month in enumerate(months):
+        revenue = series[index]
+        window = series[max(0, index - 2):index + 1]
+        previous = series[index - 1] if index > 0 else None
+        rows.append({
+            'month': month,
+            'revenue': round(revenue, 2),
+            'order_count': counts[index],
+            'avg_order_value': round(revenue / counts[index], 2) if counts[index] else 0,
+            'moving_avg_3month': round(sum(window) / len(window), 2),
+            'growth_rate_pct': round((revenue - previous) / previous * 100, 2) if previous else None
+        })
+    rows.reverse()
+    return rows
+
+
+class RevenueForecaster:
+    """Cached monthly revenue model; refits only when the last complete month changes"""
+
+    @staticmethod
+    def _load_and_fit(anchor):
+        """Load complete months before `anchor` from the rollups and fit a model"""
+        config = get_config()
+        history_months = config.FORECAST_HISTORY_MONTHS
+        start = _add_months(anchor, -history_months)
+        rows = SalesRollup.get_monthly_revenue(start, anchor)
+        by_month = {row['month']: row for row in rows}
+
+        # Dense series from the first month with sales up to the last complete month
+        months = [_month_key(_add_months(start, offset)) for offset in range(history_months)]
+        first = next((i for i, month in enumerate(months) if month in by_month), len(months))
+        months = months[first:]
+        series = [float(by_month[m]['revenue'] or 0) if m in by_month else 0.0 for m in months]
+        counts = [int(by_month[m]['order_count'] or 0) if m in by_month else 0 for m in months]
+
+        model = fit_model(series)
+        logger.info(f"Revenue forecast refit through {_month_key(_add_months(anchor, -1))} "
+                    f"({model['method']}, {len(series)} months)")
+        return {
+            'model': model,
+            'history': _history_rows(months, series, counts),
+            'trained_through': months[-1] if months else None
+        }
+
+    @staticmethod
+    def get_forecast(months_ahead=3):
+        """
+        Revenue forecast starting with the current month
+
+        Args:
+            months_ahead: Number of months to project (clamped to 1..FORECAST_MAX_MONTHS_AHEAD)
+
+        Returns:
+            Dictionary with model parameters, monthly history and projections
+        """
+        config = get_config()
+        months_ahead = max(1, min(int(months_ahead), config.FORECAST_MAX_MONTHS_AHEAD))
+        anchor = date.today().replace(day=1)
+        cache = forecast_cache()
+
+        response_key = (_month_key(anchor), months_ahead)
+        cached = cache.get(response_key)
+        if cached is not None:
+            return cached
+
+        fitted = cache.get_or_set(_month_key(anchor), lambda: RevenueForecaster._load_and_fit(anchor))
+        model = fitted['model']
+
+        forecast = []
+        for step, (point, lower, upper) in enumerate(project(model, months_ahead)):
+            forecast.append({
+                'month': _month_key(_add_months(anchor, step)),
+                'revenue': round(max(point, 0.0), 2),
+                'lower_bound': round(max(lower, 0.0), 2),
+                'upper_bound': round(max(upper, 0.0), 2),
+                'confidence_level': CONFIDENCE_LEVEL
+            })
+
+        result = {
+            'months_ahead': months_ahead,
+            'model': {
+                'method': model['method'],
+                'alpha': model['alpha'],
+                'beta': model['beta'],
+                'gamma': model['gamma'],
+                'season_length': model['season_length'],
+                'rmse': round(model['rmse'], 2),
+                'trained_through': fitted['trained_through']
+            },
+            'history': fitted['history'],
+            'forecast': forecast
+        }
+        return cache.set(response_key, result)
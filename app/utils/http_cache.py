@@ -0,0 +1,256 @@
+"""
+HTTP validators and conditional GET
+Entity validators come from the row's updated_at (rows are read through the
+entity cache); analytics reports are served from versioned snapshots. A
+matching If-None-Match / If-Modified-Since is answered with 304 before a
+body is serialized, and without a database read while the row or snapshot
+is cached. Entities listed in RESPONSE_CACHE_ENTITIES also keep their
+encoded response bodies, so a hot row is not re-serialized per request.
+"""
+import hashlib
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from itertools import count
+from flask import Response, request
+from app.utils.cache import TTLCache, get_cache
+from app.utils.db_connection import after_commit
+from app.utils.compression import encoded_response, negotiate_encoding
+from app.utils.entity_cache import entity_cache
+from app.utils.responses import (JSON_MIMETYPE, MSGPACK_AVAILABLE, MSGPACK_MIMETYPE, negotiated_mimetype,
+                                 respond, serialize)
+from config.config import get_config
+
+logger = logging.getLogger(__name__)
+
+# Snapshot versions restart with the process, so tag them with the process
+# identity to keep an ETag from a previous run from ever matching.
+_SNAPSHOT_EPOCH = f"{os.getpid():x}{int(time.time()):x}"
+_snapshot_versions = count(1)
+
+# Serialized/compressed report bodies by snapshot ETag. Always process-local:
+# with the shared backend a snapshot comes back as a copy on every read, and
+# an ETag never names two different bodies, so these need no invalidation.
+_report_bodies = TTLCache('report_bodies', maxsize=512, ttl=600)
+
+
+def _snapshot_cache():
+    return get_cache('report_snapshots', maxsize=256, ttl=get_config().REPORT_SNAPSHOT_TTL)
+
+
+_entity_responses = None
+_RESPONSE_MIMETYPES = (JSON_MIMETYPE, MSGPACK_MIMETYPE)
+
+
+def _entity_response_cache():
+    """Encoded entity responses; process-local, since the point is to skip decoding"""
+    global _entity_responses
+    if _entity_responses is None:
+        config = get_config()
+        _entity_responses = TTLCache('entity_responses', maxsize=config.RESPONSE_CACHE_MAXSIZE,
+                                     ttl=config.ENTITY_CACHE_TTL)
+    return _entity_responses
+
+
+def _as_utc(value):
+    """Database timestamps are naive; treat them as UTC and drop sub-second precision"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).replace(microsecond=0)
+
+
+def is_not_modified(validator):
+    """
+    Evaluate the request's conditional headers against a validator
+
+    If-None-Match takes precedence over If-Modified-Since (RFC 9110 13.2.2).
+    """
+    if validator is None:
+        return False
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(validator['etag'])
+    if request.if_modified_since and validator.get('last_modified'):
+        return validator['last_modified'] <= request.if_modified_since
+    return False
+
+
+def apply_validator(response, validator):
+    """Set ETag / Last-Modified and ask clients to revalidate before reuse"""
+    if validator is not None:
+        response.set_etag(validator['etag'], weak=True)
+        if validator.get('last_modified'):
+            response.last_modified = validator['last_modified']
+        response.cache_control.no_cache = True
+    return response
+
+
+def not_modified(validator):
+    """Empty 304 response carrying the validator"""
+    return apply_validator(Response(status=304), validator)
+
+
+def entity_validator(entity, row, entity_id):
+    """
+    Validator for an entity row
+
+    Returns:
+        Validator dict, or None if the row has no updated_at
+    """
+    updated_at = row.get('updated_at') if row else None
+    if not isinstance(updated_at, datetime):
+        return None
+    return {
+        'etag': f"{entity}-{entity_id}-{updated_at.strftime('%Y%m%d%H%M%S%f')}",
+        'last_modified': _as_utc(updated_at)
+    }
+
+
+def entity_response(entity, entity_id, loader, not_found_message):
+    """
+    Conditional GET for a single entity
+
+    Args:
+        entity: Entity name used in ETags
+        entity_id: Primary key
+        loader: Callable returning the row dict or None (normally the
+            service's cached get_by_id)
+        not_found_message: Error message for the 404 body
+
+    Returns:
+        Tuple of (response, status)
+    """
+    if entity in get_config().RESPONSE_CACHE_ENTITIES:
+        return _cached_entity_response(entity, entity_id, loader, not_found_message)
+
+    row = loader()
+    if not row:
+        return respond({'error': not_found_message}, 404)
+
+    validator = entity_validator(entity, row, entity_id)
+    if is_not_modified(validator):
+        return not_modified(validator), 304
+    response, status = respond(row, 200)
+    return apply_validator(response, validator), status
+
+
+def _cached_entity_response(entity, entity_id, loader, not_found_message):
+    """
+    entity_response() served from pre-encoded responses
+
+    Entries are keyed by (entity, id, media type) and hold the encoded body,
+    the validator and, per content encoding, the final body bytes and
+    header list, so a hit builds the response without serializing,
+    compressing or touching a header. Each entry records the entity cache
+    version of the row it was built from, so a write made in any worker
+    makes it stale even before invalidate_entity_response() runs.
+    """
+    mimetype = negotiated_mimetype()
+    key = (entity, entity_id, mimetype)
+    cache = _entity_response_cache()
+    version = entity_cache(entity).version(entity_id)
+
+    cached = cache.get(key)
+    if cached is None or cached['version'] != version:
+        token = cache.version(key)
+        row = loader()
+        if not row:
+            return respond({'error': not_found_message}, 404)
+        cached = cache.set(key, {
+            'body': serialize(row, mimetype),
+            'validator': entity_validator(entity, row, entity_id),
+            'version': version,
+            'encoded': {}
+        }, if_version=token)
+
+    validator = cached['validator']
+    if is_not_modified(validator):
+        return not_modified(validator), 304
+
+    encoding = negotiate_encoding(len(cached['body']))
+    encoded = cached['encoded'].get(encoding)
+    if encoded is None:
+        response = encoded_response({'identity': cached['body']}, lambda: cached['body'], mimetype)
+        if MSGPACK_AVAILABLE:
+            response.vary.add('Accept')
+        apply_validator(response, validator)
+        encoded = cached['encoded'].setdefault(encoding, (response.get_data(), list(response.headers.items())))
+    body, headers = encoded
+    return Response(body, headers=headers), 200
+
+
+def invalidate_entity_response(entity, entity_id):
+    """Drop the encoded responses of an entity row; called after writes"""
+    if entity in get_config().RESPONSE_CACHE_ENTITIES:
+        def drop():
+            cache = _entity_response_cache()
+            for mimetype in _RESPONSE_MIMETYPES:
+                cache.delete((entity, entity_id, mimetype))
+        after_commit(drop)
+
+
+def report_snapshot(name, args, loader):
+    """
+    Get (or build) the snapshot of a report for the given arguments
+
+    Args:
+        name: Report name
+        args: Dict of query arguments that identify the snapshot
+        loader: Callable producing the report data
+
+    Returns:
+        Dict with data, etag and last_modified
+    """
+    key = (name, tuple(sorted(args.items())))
+    cache = _snapshot_cache()
+    snapshot = cache.get(key)
+    if snapshot is None:
+        token = cache.version(key)
+        data = loader()
+        snapshot = cache.set(key, {
+            'data': data,
+            'etag': f"{name}-{_SNAPSHOT_EPOCH}-{next(_snapshot_versions)}",
+            'last_modified': datetime.now(timezone.utc).replace(microsecond=0)
+        }, if_version=token)
+    return snapshot
+
+
+def snapshot_args(exclude=('format',)):
+    """Query arguments of the current request that key a report snapshot"""
+    return {key: value for key, value in request.args.items() if key not in exclude}
+
+
+def report_response(name, loader):
+    """
+    Conditional GET for an analytics report served from its snapshot
+
+    Returns:
+        Tuple of (response, status)
+    """
+    snapshot = report_snapshot(name, snapshot_args(), loader)
+    if is_not_modified(snapshot):
+        return not_modified(snapshot), 304
+    # The serialized body and each compressed variant are kept per snapshot
+    # and representation, so repeat requests neither re-serialize nor recompress
+    mimetype = negotiated_mimetype()
+    response = encoded_response(
+        _report_bodies.get_or_set(snapshot['etag'], dict).setdefault(mimetype, {}),
+        lambda: serialize(snapshot['data'], mimetype),
+        mimetype
+    )
+    response.vary.add('Accept')
+    return apply_validator(response, snapshot), 200
+
+
+def combined_validator(snapshots):
+    """Validator for a response assembled from several snapshots"""
+    digest = hashlib.sha1('|'.join(sorted(s['etag'] for s in snapshots)).encode()).hexdigest()
+    return {
+        'etag': f"combined-{digest[:20]}",
+        'last_modified': max((s['last_modified'] for s in snapshots), default=None)
+    }
+
+
+def invalidate_reports():
+    """Drop every report snapshot; called after writes that change report inputs"""
+    after_commit(lambda: _snapshot_cache().clear())
@@ -0,0 +1,161 @@
+"""
+Idempotency keys for create routes
+A client that sends `Idempotency-Key` on a POST gets the stored response of
+the first request with that key on every retry instead of a second insert.
+Keys are scoped to the route, kept for IDEMPOTENCY_TTL seconds in a named
+cache (shared between workers with CACHE_BACKEND=shared), and bound to the
+request body: reusing a key with a different body is rejected with 422.
+A retry that arrives while the first request is still running waits for
+its response (up to IDEMPOTENCY_WAIT_SECONDS) instead of executing again.
+The in-progress claim expires after IDEMPOTENCY_PENDING_TTL seconds, so a
+worker that dies mid-request does not block the key for the full TTL.
+"""
+import hashlib
+import logging
+import time
+import uuid
+from functools import wraps
+from threading import Event, Lock
+from flask import Response, make_response, request
+from app.utils.cache import get_cache
+from app.utils.responses import respond
+from config.config import get_config
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+
+# Seconds between checks while a request in another worker holds the key
+_POLL_INTERVAL = 0.05
+
+# Keys being executed in this process -> Event set when the response is stored
+_in_flight = {}
+_in_flight_lock = Lock()
+
+
+def _store():
+    config = get_config()
+    return get_cache('idempotency', maxsize=config.IDEMPOTENCY_MAXSIZE, ttl=config.IDEMPOTENCY_TTL)
+
+
+def _fingerprint():
+    return hashlib.sha256(request.get_data()).hexdigest()
+
+
+def _claim(store, scope, fingerprint):
+    """
+    Record that this request is executing `scope`
+
+    Returns:
+        None if claimed, else the existing entry (pending or completed)
+    """
+    with _in_flight_lock:
+        token = store.version(scope)
+        entry = store.get(scope)
+        if entry is not None:
+            return entry
+        owner = uuid.uuid4().hex
+        store.set(scope, {'state': 'pending', 'owner': owner, 'fingerprint': fingerprint},
+                  ttl=get_config().IDEMPOTENCY_PENDING_TTL, if_version=token)
+        entry = store.get(scope)
+        if entry is None or entry.get('owner') != owner:
+            # Another worker claimed it between our read and write
+            return entry or {'state': 'pending', 'fingerprint': fingerprint}
+        _in_flight[scope] = Event()
+        return None
+
+
+def _wait(store, scope, timeout):
+    """Entry for `scope` once it is no longer pending (None if released or timed out)"""
+    deadline = time.monotonic() + timeout
+    event = _in_flight.get(scope)
+    if event is not None:
+        event.wait(timeout)
+    while True:
+        entry = store.get(scope)
+        if entry is None or entry['state'] != 'pending' or time.monotonic() >= deadline:
+            return entry
+        time.sleep(_POLL_INTERVAL)
+
+
+def _replay(entry):
+    if entry['body'] is None:
+        return respond({'error': f'A request with this {IDEMPOTENCY_HEADER} already completed '
+                                 f'with status {entry["status"]}; its response was too large to keep'}, 409)
+    response = Response(entry['body'], status=entry['status'], mimetype=entry['mimetype'])
+    response.headers[REPLAYED_HEADER] = 'true'
+    return response
+
+
+def _complete(store, scope, fingerprint, response):
+    """Store the response for replays; at least record completion if the body can't be kept"""
+    entry = {
+        'state': 'completed',
+        'fingerprint': fingerprint,
+        'status': response.status_code,
+        'mimetype': response.mimetype,
+        'body': response.get_data()
+    }
+    store.set(scope, entry)
+    stored = store.get(scope)
+    if stored is None or stored.get('state') != 'completed':
+        # Without this, the next retry would find no entry and execute again
+        logger.error(f"Response for {IDEMPOTENCY_HEADER} {scope[2]!r} on {scope[1]} ({len(entry['body'])} bytes) "
+                     f"could not be stored; retries will get 409 instead of a replay")
+        store.set(scope, dict(entry, body=None))
+
+
+def _release(scope):
+    with _in_flight_lock:
+        event = _in_flight.pop(scope, None)
+    if event is not None:
+        event.set()
+
+
+def idempotent(view):
+    """
+    Honor the Idempotency-Key header on a create route
+
+    Responses below 500 are stored and replayed; server errors and
+    exceptions release the key so the client's retry runs again.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if key is None:
+            return view(*args, **kwargs)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return respond({'error': f'{IDEMPOTENCY_HEADER} must be 1-{MAX_KEY_LENGTH} characters'}, 400)
+
+        store = _store()
+        scope = (request.method, request.path, key)
+        fingerprint = _fingerprint()
+        entry = _claim(store, scope, fingerprint)
+        while entry is not None:
+            if entry['fingerprint'] != fingerprint:
+                return respond({'error': f'{IDEMPOTENCY_HEADER} was already used with a different request body'}, 422)
+            if entry['state'] != 'pending':
+                return _replay(entry)
+            entry = _wait(store, scope, get_config().IDEMPOTENCY_WAIT_SECONDS)
+            if entry is None:
+                # The first request failed and released the key; claim it for this one
+                entry = _claim(store, scope, fingerprint)
+            elif entry['state'] == 'pending':
+                return respond({'error': f'A request with this {IDEMPOTENCY_HEADER} is still in progress'}, 409)
+
+        try:
+            response = make_response(view(*args, **kwargs))
+        except Exception:
+            store.delete(scope)
+            _release(scope)
+            raise
+        if response.status_code >= 500 or response.is_streamed:
+            store.delete(scope)
+        else:
+            _complete(store, scope, fingerprint, response)
+        _release(scope)
+        return response
+
+    return wrapper
@@ -0,0 +1,100 @@
+"""
+Fast JSON provider
+Serializes responses with orjson when it is installed (stdlib json
+otherwise), with a single policy for DECIMAL and DATETIME2 values:
+Decimals become strings (exact) or floats per JSON_DECIMAL_MODE, and
+dates/times are written as ISO 8601
+"""
+import dataclasses
+import decimal
+import json
+import logging
+import uuid
+from datetime import date, datetime, time
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+DECIMAL_MODES = ('str', 'float')
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """JSON provider for app.json; see module docstring for the value policy"""
+
+    def __init__(self, app):
+        super().__init__(app)
+        mode = str(app.config.get('JSON_DECIMAL_MODE', 'str')).lower()
+        if mode not in DECIMAL_MODES:
+            raise ValueError(f"JSON_DECIMAL_MODE must be one of {DECIMAL_MODES}, got '{mode}'")
+        self.decimal_mode = mode
+        self._convert_decimal = str if mode == 'str' else float
+        self.use_orjson = ORJSON_AVAILABLE
+
+    def default(self, o):
+        """Fallback for values neither encoder handles natively"""
+        if isinstance(o, decimal.Decimal):
+            return self._convert_decimal(o)
+        if isinstance(o, (datetime, date, time)):
+            return o.isoformat()
+        if isinstance(o, uuid.UUID):
+            return str(o)
+        if dataclasses.is_dataclass(o) and not isinstance(o, type):
+            return dataclasses.asdict(o)
+        if hasattr(o, '__html__'):
+            return str(o.__html__())
+        raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+    def _orjson_options(self, indent):
+        options = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumps_bytes(self, obj, indent=None):
+        """
+        Serialize to UTF-8 bytes
+
+        Uses orjson when available. Values orjson rejects (e.g. integers
+        beyond 64 bits) fall back to the stdlib encoder with the same policy.
+        """
+        if self.use_orjson:
+            try:
+                return orjson.dumps(obj, default=self.default, option=self._orjson_options(indent))
+            except TypeError:
+                pass
+        separators = None if indent else (',', ':')
+        return json.dumps(
+            obj, default=self.default, indent=indent, separators=separators,
+            ensure_ascii=self.ensure_ascii, sort_keys=self.sort_keys
+        ).encode('utf-8')
+
+    def dumps(self, obj, **kwargs):
+        """Serialize to str; extra stdlib options (cls, default, ...) use the stdlib encoder"""
+        indent = kwargs.pop('indent', None)
+        kwargs.pop('separators', None)
+        if not kwargs:
+            return self.dumps_bytes(obj, indent).decode('utf-8')
+        kwargs.setdefault('default', self.default)
+        kwargs.setdefault('ensure_ascii', self.ensure_ascii)
+        kwargs.setdefault('sort_keys', self.sort_keys)
+        return json.dumps(obj, indent=indent, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if self.use_orjson and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        """Build the JSON response from bytes, skipping the str round trip"""
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = 2 if (self.compact is None and self._app.debug) or self.compact is False else None
+        return self._app.response_class(self.dumps_bytes(obj, indent) + b'\n', mimetype=self.mimetype)
@@ -5,6 +5,7 @@ Intercepts pyodbc calls and returns fake data matching MSSQL structure
 import logging
 from datetime import datetime, timedelta
 import random
+import re
 
 logger = logging.getLogger(__name__)
 
@@ -24,7 +25,10 @@ class MockCursor:
         logger.debug(f"Mock executing query: {query[:100]}...")
         
         # Parse query to determine what data to return
-        if 'select' in self._last_query:
+        if 'output inserted.' in self._last_query:
+            self._results = self._mock_output_rows(query, params)
+            self._rowcount = len(self._results)
+        elif 'select' in self._last_query:
             self._results = self._generate_mock_data(query, params)
             self._rowcount = len(self._results)
         elif 'insert' in self._last_query:
@@ -53,10 +57,20 @@ class MockCursor:
             return self._results[0]
         return None
     
+    def fetchmany(self, size=1):
+        """Fetch the next `size` rows"""
+        rows = self._results[:size]
+        self._results = self._results[size:]
+        return rows
+    
     def fetchall(self):
         """Fetch all rows"""
         return self._results
     
+    def nextset(self):
+        """Move to the next result set of a batch (mock batches have one)"""
+        return False
+    
     def close(self):
         """Close cursor"""
         pass
@@ -66,17 +80,64 @@ class MockCursor:
         """Return number of affected rows"""
         return self._rowcount
     
+    def _mock_output_rows(self, query, params):
+        """Rows returned by INSERT/UPDATE ... OUTPUT: mock rows of the table with the written values"""
+        params = list(params or ())
+        joined = re.search(r'join\s*\(\s*values\s.*?\)\s*as\s+\w+\s*\(([^)]*)\)', query, re.I | re.S)
+        if joined:
+            # Set-based UPDATE ... FROM (VALUES ...): every source row matches
+            columns = [column.strip() for column in joined.group(1).split(',')]
+            output = re.findall(r'inserted\.(\w+)', query, re.I)
+            rows = [dict(zip(columns, params[i:i + len(columns)]))
+                    for i in range(0, len(params) - len(columns) + 1, len(columns))]
+            self.description = [(column,) for column in output]
+            return [tuple(row.get(column) for column in output) for row in rows]
+        
+        insert = re.match(r'\s*insert\s+into\s+(?:dbo\.)?(\w+)\s*\(([^)]*)\)', query, re.I)
+        if insert:
+            table = insert.group(1)
+            columns = [column.strip() for column in insert.group(2).split(',')]
+            chunks = [params[i:i + len(columns)] for i in range(0, len(params), len(columns))] or [[]]
+        else:
+            update = re.match(r'\s*update\s+(?:dbo\.)?(\w+)\s+set\s+(.*?)\s+output\s', query, re.I | re.S)
+            if not update:
+                return []
+            table = update.group(1)
+            columns = re.findall(r'(\w+)\s*=\s*\?', update.group(2))
+            chunks = [params]
+        
+        base = self._generate_mock_data(f'SELECT * FROM {table}', None)
+        template = dict(zip([col[0] for col in self.description], base[0])) if base else {}
+        rows = []
+        for chunk in chunks:
+            row = dict(template)
+            row.update(zip(columns, chunk))
+            if insert:
+                row[f"{table.rstrip('s')}_id"] = random.randint(1000, 9999)
+            else:
+                key = re.search(r'\bwhere\s+(\w+_id)\s*=\s*\?', query, re.I)
+                if key and params:
+                    row[key.group(1)] = params[-1]
+            row['updated_at'] = datetime.now()
+            rows.append(row)
+        self.description = [(column,) for column in rows[0]]
+        return [tuple(row.values()) for row in rows]
+    
     def _generate_mock_data(self, query, params):
         """Generate mock data based on query pattern"""
         query_lower = query.lower()
         
+        # Change feed queries
+        if 'change_stamp' in query_lower:
+            return self._mock_changes(query_lower, params)
+        
         # Customer queries
         if 'from customers' in query_lower or 'from customer' in query_lower:
             return self._mock_customers(query_lower)
         
         # Product queries
         elif 'from products' in query_lower or 'from product' in query_lower:
-            return self._mock_products(query_lower)
+            return self._mock_products(query_lower, params)
         
         # Order queries
         elif 'from orders' in query_lower or 'from order' in query_lower:
@@ -117,6 +178,18 @@ class MockCursor:
         # Default empty result
         return []
     
+    def _mock_changes(self, query, params):
+        """Rows of the queried table with updated_at and change_stamp columns"""
+        table = re.search(r'from (\w+)', query).group(1)
+        rows = self._generate_mock_data(f'SELECT * FROM {table}', None)
+        columns = [column[0] for column in self.description]
+        if 'row_version' in columns:
+            rows = [row[:columns.index('row_version')] for row in rows]
+            columns.remove('row_version')
+        stamp = datetime.now() - timedelta(minutes=5)
+        self.description = [(column,) for column in columns] + [('updated_at',), ('change_stamp',)]
+        return [tuple(row) + (stamp, stamp.strftime('%Y-%m-%d %H:%M:%S.%f0')) for row in rows]
+    
     def _mock_customers(self, query):
         """Generate mock customer data"""
         customers = [
@@ -140,19 +213,21 @@ class MockCursor:
         
         return customers
     
-    def _mock_products(self, query):
+    def _mock_products(self, query, params=None):
         """Generate mock product data"""
         products = [
-            (1, 'WGT-A-001', 'Widget A', 'Electronics', 29.99, 15.00, 'active', datetime.now()),
-            (2, 'WGT-B-002', 'Widget B', 'Electronics', 49.99, 25.00, 'active', datetime.now()),
-            (3, 'WGT-C-003', 'Widget C', 'Hardware', 39.99, 20.00, 'active', datetime.now()),
+            (1, 'WGT-A-001', 'Widget A', 'Electronics', 29.99, 15.00, 'active', True, datetime.now()),
+            (2, 'WGT-B-002', 'Widget B', 'Electronics', 49.99, 25.00, 'active', True, datetime.now()),
+            (3, 'WGT-C-003', 'Widget C', 'Hardware', 39.99, 20.00, 'active', True, datetime.now()),
         ]
         
         self.description = [
             ('product_id',), ('product_code',), ('product_name',), ('category',),
-            ('unit_price',), ('cost_price',), ('status',), ('created_at',)
+            ('unit_price',), ('cost_price',), ('status',), ('is_active',), ('created_at',)
         ]
         
+        if 'product_id in' in query and params:
+            return [product for product in products if product[0] in params]
         if 'where' in query and 'product_id' in query:
             return [products[0]]
         
@@ -211,15 +286,15 @@ class MockCursor:
     def _mock_inventory(self, query):
         """Generate mock inventory data"""
         inventory = [
-            (1, 1, 1, 100, 20, 80, 50, 200, datetime.now()),
-            (2, 2, 1, 35, 10, 25, 50, 150, datetime.now()),
-            (3, 3, 1, 150, 30, 120, 40, 180, datetime.now()),
+            (1, 1, 1, 100, 20, 80, 50, 200, datetime.now(), b'\x00\x00\x00\x00\x00\x00\x07\xd1'),
+            (2, 2, 1, 35, 10, 25, 50, 150, datetime.now(), b'\x00\x00\x00\x00\x00\x00\x07\xd2'),
+            (3, 3, 1, 150, 30, 120, 40, 180, datetime.now(), b'\x00\x00\x00\x00\x00\x00\x07\xd3'),
         ]
         
         self.description = [
             ('inventory_id',), ('product_id',), ('warehouse_id',), ('quantity_on_hand',),
             ('quantity_reserved',), ('quantity_available',), ('reorder_level',),
-            ('reorder_quantity',), ('last_updated',)
+            ('reorder_quantity',), ('last_updated',), ('row_version',)
         ]
         
         return inventory
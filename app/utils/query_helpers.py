@@ -3,7 +3,8 @@ Database query helpers and utilities
 Provides common query patterns and helper functions
 """
 import logging
-from datetime import datetime
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
 from typing import List, Dict, Any, Optional, Tuple
 
 logger = logging.getLogger(__name__)
@@ -136,13 +137,15 @@ class QueryBuilder:
         return params
 
 
-def build_insert_query(table_name: str, data: Dict[str, Any]) -> Tuple[str, tuple]:
+def build_insert_query(table_name: str, data: Dict[str, Any], returning: bool = False) -> Tuple[str, tuple]:
     """
     Build INSERT query from dictionary
     
     Args:
         table_name: Table name
         data: Dictionary of column:value pairs
+        returning: Return the inserted row (OUTPUT INSERTED.*); read it with
+            fetchone(). Not allowed on tables with enabled triggers.
     
     Returns:
         Tuple of (query, params)
@@ -150,14 +153,16 @@ def build_insert_query(table_name: str, data: Dict[str, Any]) -> Tuple[str, tupl
     columns = list(data.keys())
     placeholders = ','.join(['?' for _ in columns])
     column_names = ','.join(columns)
+    output = ' OUTPUT INSERTED.*' if returning else ''
     
-    query = f"INSERT INTO {table_name} ({column_names}) VALUES ({placeholders})"
+    query = f"INSERT INTO {table_name} ({column_names}){output} VALUES ({placeholders})"
     params = tuple(data.values())
     
     return query, params
 
 
-def build_update_query(table_name: str, data: Dict[str, Any], where_clause: str, where_params: tuple) -> Tuple[str, tuple]:
+def build_update_query(table_name: str, data: Dict[str, Any], where_clause: str, where_params: tuple,
+                       touch_column: Optional[str] = None, returning: bool = False) -> Tuple[str, tuple]:
     """
     Build UPDATE query from dictionary
     
@@ -166,14 +171,21 @@ def build_update_query(table_name: str, data: Dict[str, Any], where_clause: str,
         data: Dictionary of column:value pairs to update
         where_clause: WHERE condition
         where_params: WHERE parameters
+        touch_column: Timestamp column set to GETDATE() (e.g. 'updated_at')
+        returning: Return the updated rows (OUTPUT INSERTED.*); no rows when
+            nothing matched. Not allowed on tables with enabled triggers.
     
     Returns:
         Tuple of (query, params)
     """
-    set_clauses = [f"{col} = ?" for col in data.keys()]
+    set_clauses = [f"{col} = ?" for col in data.keys() if col != touch_column]
+    if touch_column:
+        set_clauses.append(f"{touch_column} = GETDATE()")
+        data = {col: value for col, value in data.items() if col != touch_column}
     set_clause = ', '.join(set_clauses)
+    output = ' OUTPUT INSERTED.*' if returning else ''
     
-    query = f"UPDATE {table_name} SET {set_clause} WHERE {where_clause}"
+    query = f"UPDATE {table_name} SET {set_clause}{output} WHERE {where_clause}"
     params = tuple(data.values()) + where_params
     
     return query, params
@@ -368,3 +380,48 @@ def rows_to_dict_list(cursor, rows) -> List[Dict[str, Any]]:
     
     columns = [column[0] for column in cursor.description]
     return [dict(zip(columns, row)) for row in rows]
+
+
+def _same_value(current: Any, new: Any) -> bool:
+    """Whether a client-supplied value equals a value read from the database"""
+    if current is None or new is None:
+        return current is None and new is None
+    if isinstance(current, Decimal) or isinstance(new, Decimal):
+        try:
+            return Decimal(str(current)) == Decimal(str(new))
+        except (InvalidOperation, ValueError):
+            return False
+    if isinstance(current, datetime) and isinstance(new, str):
+        try:
+            return current == datetime.fromisoformat(new)
+        except ValueError:
+            return False
+    if isinstance(current, date) and isinstance(new, str):
+        try:
+            return current == date.fromisoformat(new)
+        except ValueError:
+            return False
+    return current == new
+
+
+def changed_columns(current: Dict[str, Any], data: Dict[str, Any],
+                    columns: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Columns of `data` whose values differ from the current row
+    
+    Fields missing from `data` are left alone (not set to NULL), as are
+    fields that are not columns of the row or not in `columns`.
+    
+    Args:
+        current: Row as read from the database (or the entity cache)
+        data: Fields sent by the client
+        columns: Updatable columns (default: every column of `current`)
+    
+    Returns:
+        Dictionary of column:new value to write (empty when nothing changed)
+    """
+    allowed = current.keys() if columns is None else columns
+    return {
+        column: value for column, value in data.items()
+        if column in allowed and column in current and not _same_value(current[column], value)
+    }
@@ -0,0 +1,163 @@
+"""
+Reference data registry
+Small, slow-changing lookup tables (warehouses, suppliers, users) held in
+memory as id -> tuple maps. Loaded at startup and refreshed periodically by
+a background thread, so list queries can skip joining them and enrich rows
+in Python instead.
+"""
+import logging
+import time
+from threading import Event, Lock, Thread
+from app.utils.db_connection import execute_query
+
+logger = logging.getLogger(__name__)
+
+# table -> (key column, value columns); only the columns callers enrich with
+REFERENCE_TABLES = {
+    'warehouses': ('warehouse_id', ('warehouse_code', 'warehouse_name')),
+    'suppliers': ('supplier_id', ('supplier_code', 'supplier_name')),
+    'users': ('user_id', ('username',))
+}
+
+# Minimum seconds between reloads triggered by a lookup miss
+MISS_RELOAD_INTERVAL = 10
+
+
+class ReferenceTable:
+    """Immutable snapshot of one reference table"""
+
+    __slots__ = ('columns', 'rows', 'loaded_at')
+
+    def __init__(self, columns, rows, loaded_at):
+        self.columns = {column: index for index, column in enumerate(columns)}
+        self.rows = rows
+        self.loaded_at = loaded_at
+
+    def get(self, key, column):
+        row = self.rows.get(key)
+        return None if row is None else row[self.columns[column]]
+
+
+class ReferenceData:
+    """Registry of in-memory reference tables with background refresh"""
+
+    def __init__(self, tables=None):
+        self.tables = dict(tables or REFERENCE_TABLES)
+        self._snapshots = {}
+        self._stale = set()
+        self._lock = Lock()
+        self._stop = Event()
+        self._thread = None
+        self.refreshes = 0
+        self.failures = 0
+
+    def _load(self, table):
+        key, columns = self.tables[table]
+        rows = execute_query(f"SELECT {key}, {', '.join(columns)} FROM {table}")
+        snapshot = ReferenceTable(
+            columns,
+            {row[key]: tuple(row.get(column) for column in columns) for row in rows},
+            time.monotonic()
+        )
+        # Readers pick up the new snapshot on their next lookup; a dict item
+        # assignment is atomic, so no lock is needed on the read path
+        self._snapshots[table] = snapshot
+        self._stale.discard(table)
+        return snapshot
+
+    def refresh(self, tables=None):
+        """Reload tables from the database; failures keep the previous snapshot"""
+        with self._lock:
+            for table in tables or self.tables:
+                try:
+                    snapshot = self._load(table)
+                    self.refreshes += 1
+                    logger.debug(f"Reference data '{table}' loaded ({len(snapshot.rows)} rows)")
+                except Exception as e:
+                    self.failures += 1
+                    logger.error(f"Error loading reference data '{table}': {str(e)}")
+
+    def mark_stale(self, table):
+        """Reload a table on its next lookup (call after writing to it)"""
+        self._stale.add(table)
+
+    def _snapshot(self, table, key=None):
+        snapshot = self._snapshots.get(table)
+        if snapshot is None or table in self._stale:
+            self.refresh([table])
+        elif (key is not None and key not in snapshot.rows
+                and time.monotonic() - snapshot.loaded_at >= MISS_RELOAD_INTERVAL):
+            # Probably a row created since the last refresh
+            self.refresh([table])
+        return self._snapshots.get(table)
+
+    def lookup(self, table, key, column):
+        """Value of `column` for the row with primary key `key`, or None"""
+        if key is None:
+            return None
+        snapshot = self._snapshot(table, key)
+        return snapshot.get(key, column) if snapshot else None
+
+    def enrich(self, rows, table, key_field, fields):
+        """
+        Add reference columns to rows in place (LEFT JOIN semantics)
+
+        Args:
+            rows: List of row dicts (or a single row dict, or None)
+            table: Reference table name
+            key_field: Row field holding the table's primary key
+            fields: Dict of {output field: reference column}
+
+        Returns:
+            The rows passed in
+        """
+        if not rows:
+            return rows
+        batch = [rows] if isinstance(rows, dict) else rows
+        snapshot = self._snapshot(table)
+        if snapshot is not None:
+            missing = next((row[key_field] for row in batch
+                            if row.get(key_field) is not None and row[key_field] not in snapshot.rows), None)
+            if missing is not None:
+                snapshot = self._snapshot(table, missing)
+        for row in batch:
+            key = row.get(key_field)
+            for field, column in fields.items():
+                row[field] = snapshot.get(key, column) if snapshot and key is not None else None
+        return rows
+
+    def start(self, interval):
+        """Load every table now and keep refreshing every `interval` seconds"""
+        self.refresh()
+        if interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = Thread(target=self._run, args=(interval,), name='reference-data-refresh', daemon=True)
+        self._thread.start()
+        logger.info(f"Reference data refresh every {interval}s ({', '.join(self.tables)})")
+
+    def _run(self, interval):
+        while not self._stop.wait(interval):
+            self.refresh()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        now = time.monotonic()
+        return {
+            'tables': {
+                table: {'rows': len(snapshot.rows), 'age_seconds': round(now - snapshot.loaded_at, 1)}
+                for table, snapshot in self._snapshots.items()
+            },
+            'refreshes': self.refreshes,
+            'failures': self.failures
+        }
+
+
+reference_data = ReferenceData()
+
+
+def enrich(rows, table, key_field, fields):
+    """Enrich rows from the global registry; see ReferenceData.enrich"""
+    return reference_data.enrich(rows, table, key_field, fields)
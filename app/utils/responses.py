@@ -0,0 +1,60 @@
+"""
+Response helpers
+Content negotiation between JSON and MessagePack for API responses. Both
+representations are built from the same row objects and share the value
+policy of the app's JSON provider (Decimal mode, ISO datetimes).
+"""
+import logging
+from flask import Response, current_app, jsonify, request
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    msgpack = None
+    MSGPACK_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+JSON_MIMETYPE = 'application/json'
+MSGPACK_MIMETYPE = 'application/msgpack'
+
+# Also accept the older unregistered alias
+_MSGPACK_ALIASES = (MSGPACK_MIMETYPE, 'application/x-msgpack')
+
+
+def negotiated_mimetype():
+    """Response media type for the current request (JSON unless MessagePack is preferred)"""
+    if not MSGPACK_AVAILABLE:
+        return JSON_MIMETYPE
+    best = request.accept_mimetypes.best_match((JSON_MIMETYPE,) + _MSGPACK_ALIASES, default=JSON_MIMETYPE)
+    return MSGPACK_MIMETYPE if best in _MSGPACK_ALIASES else JSON_MIMETYPE
+
+
+def packb(data):
+    """Encode data as MessagePack using the JSON provider's fallback for Decimal/datetime"""
+    return msgpack.packb(data, default=current_app.json.default, use_bin_type=True, datetime=False)
+
+
+def serialize(data, mimetype):
+    """Serialize data for a negotiated media type"""
+    if mimetype == MSGPACK_MIMETYPE:
+        return packb(data)
+    return current_app.json.response(data).get_data()
+
+
+def respond(data, status=200):
+    """
+    Build an API response in the representation the client asked for
+
+    Use in place of jsonify(); returns the same (response, status) tuple
+    the routes already return.
+    """
+    mimetype = negotiated_mimetype()
+    if mimetype == MSGPACK_MIMETYPE:
+        response = Response(packb(data), mimetype=MSGPACK_MIMETYPE)
+    else:
+        response = jsonify(data)
+    if MSGPACK_AVAILABLE:
+        response.vary.add('Accept')
+    return response, status
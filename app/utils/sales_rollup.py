@@ -0,0 +1,344 @@
+"""
+Daily sales rollups
+Keeps per-day order aggregates current on every order write and answers
+period-level sales queries from them instead of scanning dbo.orders
+"""
+import logging
+from datetime import date, datetime
+from decimal import Decimal
+from app.utils.db_connection import get_db_cursor, execute_query
+
+logger = logging.getLogger(__name__)
+
+# Additive per-day metrics stored in dbo.daily_sales_rollup
+ROLLUP_METRICS = [
+    'order_count',
+    'cancelled_count',
+    'subtotal',
+    'discount_amount',
+    'tax_amount',
+    'shipping_amount',
+    'total_amount',
+    'cancelled_amount',
+    'paid_amount',
+    'unpaid_amount'
+]
+
+# Period grouping expressions over a DATE column
+PERIOD_EXPRESSIONS = {
+    'day': "CONVERT(VARCHAR(10), {col}, 120)",
+    'week': "DATEPART(YEAR, {col}) * 100 + DATEPART(WEEK, {col})",
+    'month': "CONVERT(CHAR(7), {col}, 120)",
+    'quarter': "CONCAT(YEAR({col}), '-Q', DATEPART(QUARTER, {col}))",
+    'year': "YEAR({col})"
+}
+
+_MERGE_ROLLUP_SQL = """
+MERGE dbo.daily_sales_rollup WITH (HOLDLOCK) AS t
+USING (SELECT CAST(? AS DATE) AS sales_date) AS s
+    ON t.sales_date = s.sales_date
+WHEN MATCHED THEN UPDATE SET {updates}, updated_at = GETDATE()
+WHEN NOT MATCHED THEN INSERT (sales_date, {columns}) VALUES (s.sales_date, {placeholders});
+""".format(
+    updates=', '.join(f"{col} = t.{col} + ?" for col in ROLLUP_METRICS),
+    columns=', '.join(ROLLUP_METRICS),
+    placeholders=', '.join('?' for _ in ROLLUP_METRICS)
+)
+
+_MERGE_CUSTOMER_SQL = """
+MERGE dbo.daily_sales_customers WITH (HOLDLOCK) AS t
+USING (SELECT CAST(? AS DATE) AS sales_date, ? AS customer_id) AS s
+    ON t.sales_date = s.sales_date AND t.customer_id = s.customer_id
+WHEN MATCHED THEN UPDATE SET order_count = t.order_count + ?
+WHEN NOT MATCHED THEN INSERT (sales_date, customer_id, order_count)
+    VALUES (s.sales_date, s.customer_id, ?);
+"""
+
+_REBUILD_STATEMENTS = [
+    "DELETE FROM dbo.daily_sales_customers",
+    "DELETE FROM dbo.daily_sales_rollup",
+    """
+    INSERT INTO dbo.daily_sales_rollup (sales_date, order_count, cancelled_count, subtotal,
+        discount_amount, tax_amount, shipping_amount, total_amount, cancelled_amount,
+        paid_amount, unpaid_amount)
+    SELECT
+        CAST(o.order_date AS DATE),
+        COUNT(*),
+        SUM(CASE WHEN o.order_status = 'cancelled' THEN 1 ELSE 0 END),
+        SUM(o.subtotal),
+        SUM(o.discount_amount),
+        SUM(o.tax_amount),
+        SUM(o.shipping_amount),
+        SUM(o.total_amount),
+        SUM(CASE WHEN o.order_status = 'cancelled' THEN o.total_amount ELSE 0 END),
+        SUM(CASE WHEN o.payment_status = 'paid' THEN o.total_amount ELSE 0 END),
+        SUM(CASE WHEN o.payment_status = 'unpaid' THEN o.total_amount ELSE 0 END)
+    FROM dbo.orders o
+    GROUP BY CAST(o.order_date AS DATE)
+    """,
+    """
+    INSERT INTO dbo.daily_sales_customers (sales_date, customer_id, order_count)
+    SELECT CAST(o.order_date AS DATE), o.customer_id, COUNT(*)
+    FROM dbo.orders o
+    GROUP BY CAST(o.order_date AS DATE), o.customer_id
+    """
+]
+
+
+def _to_date(value):
+    """Normalize an order_date value to a date"""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.fromisoformat(str(value)).date()
+
+
+def _amount(order, column):
+    value = order.get(column)
+    return Decimal(str(value)) if value is not None else Decimal('0')
+
+
+class SalesRollup:
+    """Incremental maintenance and period queries for the daily sales rollups"""
+
+    @staticmethod
+    def contribution(order):
+        """
+        Compute what a single order row contributes to the rollups
+
+        Args:
+            order: Order row dictionary (as stored in dbo.orders)
+
+        Returns:
+            Tuple of (sales_date, customer_id, metrics dict) or None
+        """
+        if not order:
+            return None
+
+        sales_date = _to_date(order.get('order_date'))
+        if sales_date is None:
+            return None
+
+        total = _amount(order, 'total_amount')
+        cancelled = order.get('order_status') == 'cancelled'
+        payment_status = order.get('payment_status')
+
+        metrics = {
+            'order_count': 1,
+            'cancelled_count': 1 if cancelled else 0,
+            'subtotal': _amount(order, 'subtotal'),
+            'discount_amount': _amount(order, 'discount_amount'),
+            'tax_amount': _amount(order, 'tax_amount'),
+            'shipping_amount': _amount(order, 'shipping_amount'),
+            'total_amount': total,
+            'cancelled_amount': total if cancelled else Decimal('0'),
+            'paid_amount': total if payment_status == 'paid' else Decimal('0'),
+            'unpaid_amount': total if payment_status == 'unpaid' else Decimal('0')
+        }
+        return sales_date, order.get('customer_id'), metrics
+
+    @staticmethod
+    def compute_deltas(before=None, after=None):
+        """
+        Net rollup deltas for an order going from `before` to `after`
+
+        Returns:
+            Tuple of (day_deltas, customer_deltas) where day_deltas maps
+            sales_date -> metrics and customer_deltas maps
+            (sales_date, customer_id) -> order count delta. Zero deltas are dropped.
+        """
+        day_deltas = {}
+        customer_deltas = {}
+
+        for sign, order in ((-1, before), (1, after)):
+            contribution = SalesRollup.contribution(order)
+            if contribution is None:
+                continue
+            sales_date, customer_id, metrics = contribution
+
+            day = day_deltas.setdefault(sales_date, {col: 0 for col in ROLLUP_METRICS})
+            for col, value in metrics.items():
+                day[col] += sign * value
+
+            if customer_id is not None:
+                key = (sales_date, customer_id)
+                customer_deltas[key] = customer_deltas.get(key, 0) + sign
+
+        day_deltas = {
+            d: metrics for d, metrics in day_deltas.items()
+            if any(metrics[col] for col in ROLLUP_METRICS)
+        }
+        customer_deltas = {k: v for k, v in customer_deltas.items() if v}
+        return day_deltas, customer_deltas
+
+    @staticmethod
+    def apply_change(cursor, before=None, after=None):
+        """
+        Apply an order write to the rollups on the caller's cursor
+
+        Must run inside the same transaction as the order write so the
+        rollups commit or roll back together with it.
+
+        Args:
+            cursor: Open cursor of the transaction that wrote the order
+            before: Order row before the write (None on create)
+            after: Order row after the write (None on hard delete)
+
+        Returns:
+            List of sales dates that were touched
+        """
+        day_deltas, customer_deltas = SalesRollup.compute_deltas(before, after)
+
+        for sales_date, metrics in day_deltas.items():
+            values = [metrics[col] for col in ROLLUP_METRICS]
+            cursor.execute(_MERGE_ROLLUP_SQL, [sales_date] + values + values)
+
+        for (sales_date, customer_id), delta in customer_deltas.items():
+            cursor.execute(_MERGE_CUSTOMER_SQL, [sales_date, customer_id, delta, delta])
+
+        return list(day_deltas.keys())
+
+    @staticmethod
+    def notify_committed(touched_dates):
+        """
+        Invalidate caches derived from closed months after a committed write
+
+        Month-level caches (e.g. the revenue forecast) only cover complete
+        months, so writes dated in the current month leave them valid.
+        """
+        from app.utils.forecasting import forecast_cache  # forecasting imports this module
+        month_start = date.today().replace(day=1)
+        if any(d < month_start for d in touched_dates or []):
+            forecast_cache().clear()
+
+    @staticmethod
+    def get_monthly_revenue(start_date, end_date):
+        """
+        Non-cancelled revenue and order counts per month from the rollups
+
+        Args:
+            start_date: First day included
+            end_date: First day excluded
+
+        Returns:
+            List of {'month', 'revenue', 'order_count'} ordered by month
+        """
+        query = """
+        SELECT 
+            CONVERT(CHAR(7), r.sales_date, 120) as month,
+            SUM(r.total_amount - r.cancelled_amount) as revenue,
+            SUM(r.order_count - r.cancelled_count) as order_count
+        FROM dbo.daily_sales_rollup r
+        WHERE r.sales_date >= ? AND r.sales_date < ?
+        GROUP BY CONVERT(CHAR(7), r.sales_date, 120)
+        ORDER BY month
+        """
+        return execute_query(query, [start_date, end_date])
+
+    @staticmethod
+    def backfill_if_empty():
+        """
+        Rebuild the rollups when they are empty but dbo.orders is not
+
+        Run at startup, so a database that had orders before the rollup
+        tables existed is backfilled once. The check and the rebuild share
+        one transaction under an exclusive lock on the rollup table: workers
+        starting together wait for the first one and then find it filled.
+
+        Returns:
+            True if the rollups were rebuilt
+        """
+        with get_db_cursor(commit=True) as cursor:
+            cursor.execute("SELECT TOP 1 1 FROM dbo.daily_sales_rollup WITH (TABLOCKX, HOLDLOCK)")
+            if cursor.fetchone():
+                return False
+            cursor.execute("SELECT TOP 1 1 FROM dbo.orders")
+            if not cursor.fetchone():
+                return False
+            logger.warning("Daily sales rollups are empty; rebuilding them from dbo.orders")
+            for statement in _REBUILD_STATEMENTS:
+                cursor.execute(statement)
+        from app.utils.forecasting import forecast_cache  # forecasting imports this module
+        forecast_cache().clear()
+        logger.info("Daily sales rollups backfilled from dbo.orders")
+        return True
+
+    @staticmethod
+    def rebuild():
+        """Recompute all rollups from dbo.orders (backfill / repair)"""
+        with get_db_cursor(commit=True) as cursor:
+            for statement in _REBUILD_STATEMENTS:
+                cursor.execute(statement)
+        from app.utils.forecasting import forecast_cache  # forecasting imports this module
+        forecast_cache().clear()
+        logger.info("Daily sales rollups rebuilt from dbo.orders")
+        return True
+
+    @staticmethod
+    def get_sales_performance(period='month', start_date=None, end_date=None):
+        """Sales performance metrics grouped by time period, answered from the rollups"""
+        template = PERIOD_EXPRESSIONS.get(period, PERIOD_EXPRESSIONS['month'])
+        rollup_period = template.format(col='r.sales_date')
+        customer_period = template.format(col='c.sales_date')
+
+        rollup_filter = ""
+        customer_filter = ""
+        filter_params = []
+
+        if start_date:
+            rollup_filter += " AND r.sales_date >= CAST(? AS DATE)"
+            customer_filter += " AND c.sales_date >= CAST(? AS DATE)"
+            filter_params.append(start_date)
+
+        if end_date:
+            rollup_filter += " AND r.sales_date <= CAST(? AS DATE)"
+            customer_filter += " AND c.sales_date <= CAST(? AS DATE)"
+            filter_params.append(end_date)
+
+        query = f"""
+        WITH PeriodTotals AS (
+            SELECT
+                {rollup_period} as period,
+                SUM(r.order_count) as total_orders,
+                SUM(r.subtotal) as gross_revenue,
+                SUM(r.discount_amount) as total_discounts,
+                SUM(r.tax_amount) as total_tax,
+                SUM(r.shipping_amount) as total_shipping,
+                SUM(r.total_amount) as net_revenue,
+                SUM(r.cancelled_count) as cancelled_orders,
+                SUM(r.paid_amount) as paid_amount,
+                SUM(r.unpaid_amount) as unpaid_amount
+            FROM dbo.daily_sales_rollup r
+            WHERE 1=1{rollup_filter}
+            GROUP BY {rollup_period}
+        ),
+        PeriodCustomers AS (
+            SELECT
+                {customer_period} as period,
+                COUNT(DISTINCT c.customer_id) as unique_customers
+            FROM dbo.daily_sales_customers c
+            WHERE c.order_count > 0{customer_filter}
+            GROUP BY {customer_period}
+        )
+        SELECT
+            t.period,
+            t.total_orders,
+            COALESCE(pc.unique_customers, 0) as unique_customers,
+            t.gross_revenue,
+            t.total_discounts,
+            t.total_tax,
+            t.total_shipping,
+            t.net_revenue,
+            t.net_revenue / NULLIF(t.total_orders, 0) as avg_order_value,
+            t.cancelled_orders,
+            t.paid_amount,
+            t.unpaid_amount
+        FROM PeriodTotals t
+        LEFT JOIN PeriodCustomers pc ON pc.period = t.period
+        WHERE t.total_orders > 0
+        ORDER BY t.period DESC
+        """
+        return execute_query(query, filter_params + filter_params)
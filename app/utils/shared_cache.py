@@ -0,0 +1,395 @@
+"""
+Shared-memory cache backend
+A TTLCache-compatible cache stored in a memory-mapped file (in /dev/shm when
+available) so every worker process on a host reads and fills the same
+entries. Values are pickled into fixed-size slots of an 8-way set-associative
+table; a full set evicts its least recently used entry. Writers hold an
+exclusive flock, so a delete or clear in one worker is seen atomically by all
+of them. Values too large for a slot are written to a blob file next to the
+table and the slot holds a reference to it, so they are shared as well;
+values above max_value_size are not stored and are counted as rejected.
+"""
+import glob
+import hashlib
+import logging
+import mmap
+import os
+import pickle
+import re
+import struct
+import tempfile
+import time
+from itertools import count
+from contextlib import contextmanager
+from threading import Lock
+
+try:
+    import fcntl
+    SHARED_CACHE_AVAILABLE = True
+except ImportError:
+    fcntl = None
+    SHARED_CACHE_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+WAYS = 8
+_MAGIC = b'CRMSHC01'
+# magic, buckets, ways, slot size, generation
+_FILE_HEADER = struct.Struct('<8sIIIQ')
+_FILE_HEADER_SIZE = 64
+_GENERATION = struct.Struct('<Q')
+_GENERATION_OFFSET = 20
+_BUCKET_VERSION = struct.Struct('<Q')
+# key hash (0 = empty), generation, expires_at (0 = never), last_used, payload length
+_SLOT_HEADER = struct.Struct('<QQddI')
+
+
+class _BlobRef:
+    """Slot value standing for a payload stored in a blob file"""
+    __slots__ = ('name', 'length')
+
+    def __init__(self, name, length):
+        self.name = name
+        self.length = length
+
+    def __reduce__(self):
+        return _BlobRef, (self.name, self.length)
+
+
+def default_directory():
+    """/dev/shm (RAM-backed) when present, else the system temp directory"""
+    return '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+
+
+def _key_hash(key):
+    """Process-independent 64-bit hash of a picklable key (never 0)"""
+    digest = hashlib.blake2b(pickle.dumps(key, protocol=pickle.HIGHEST_PROTOCOL), digest_size=8).digest()
+    return int.from_bytes(digest, 'little') | 1
+
+
+class SharedMemoryCache:
+    """
+    Cross-process LRU cache with per-entry time-to-live
+
+    Every delete (and every unconditional set) bumps the version of the
+    key's bucket and clear() bumps the cache generation; version() returns
+    both so a reader can skip storing a value loaded before a concurrent
+    write. Values larger than a slot go to a blob file that lives and
+    dies with the slot referencing it.
+    """
+
+    def __init__(self, name, maxsize=1024, ttl=300, slot_size=4096, directory=None, namespace='crm-api',
+                 max_value_size=16 * 1024 * 1024):
+        if not SHARED_CACHE_AVAILABLE:
+            raise RuntimeError('The shared cache backend requires fcntl (POSIX)')
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.slot_size = max(int(slot_size), _SLOT_HEADER.size + 64)
+        self.max_value_size = max_value_size
+        self.buckets = max(1, -(-maxsize // WAYS))
+        safe_name = re.sub(r'[^A-Za-z0-9_.-]', '_', name)
+        # Geometry is part of the file name, so processes with different
+        # settings never map the same file with different layouts
+        self.path = os.path.join(
+            directory or default_directory(),
+            f"{namespace}-{safe_name}-{self.buckets}x{WAYS}x{self.slot_size}.cache"
+        )
+        self.blob_dir = self.path[:-len('.cache')] + '.blobs'
+        self._versions_offset = _FILE_HEADER_SIZE
+        self._slots_offset = _FILE_HEADER_SIZE + -(-self.buckets * _BUCKET_VERSION.size // 64) * 64
+        self._size = self._slots_offset + self.buckets * WAYS * self.slot_size
+        self._lock = Lock()
+        self._blob_names = count()
+        self._fd = None
+        self._map = None
+        self._pid = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.oversize = 0
+        self.rejected = 0
+        self._open()
+
+    def _open(self):
+        os.makedirs(self.blob_dir, mode=0o700, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                header = os.pread(fd, _FILE_HEADER.size, 0)
+                if os.fstat(fd).st_size != self._size or header[:8] != _MAGIC:
+                    os.ftruncate(fd, 0)
+                    os.ftruncate(fd, self._size)
+                    os.pwrite(fd, _FILE_HEADER.pack(_MAGIC, self.buckets, WAYS, self.slot_size, 1), 0)
+                    self._remove_blobs('*')
+                    logger.debug(f"Shared cache file {self.path} initialized ({self._size} bytes)")
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            self._map = mmap.mmap(fd, self._size, mmap.MAP_SHARED)
+        except Exception:
+            os.close(fd)
+            raise
+        self._fd = fd
+        self._pid = os.getpid()
+
+    def _reopen(self):
+        # A forked worker inherits the parent's open file description, and
+        # flock would not exclude the two; give the child its own
+        if self._map is not None:
+            self._map.close()
+        if self._fd is not None:
+            os.close(self._fd)
+        self._open()
+
+    @contextmanager
+    def _locked(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reopen()
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield self._map
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _generation(self, m):
+        return _GENERATION.unpack_from(m, _GENERATION_OFFSET)[0]
+
+    def _bucket_version(self, m, bucket):
+        return _BUCKET_VERSION.unpack_from(m, self._versions_offset + bucket * _BUCKET_VERSION.size)[0]
+
+    def _bump_bucket(self, m, bucket):
+        version = self._bucket_version(m, bucket) + 1
+        _BUCKET_VERSION.pack_into(m, self._versions_offset + bucket * _BUCKET_VERSION.size, version)
+        return version
+
+    def _slot_offset(self, bucket, way):
+        return self._slots_offset + (bucket * WAYS + way) * self.slot_size
+
+    def _blob_path(self, name):
+        return os.path.join(self.blob_dir, name)
+
+    def _write_blob(self, payload):
+        """Write a payload to a new temporary blob file; returns its name"""
+        name = f"{os.getpid()}-{next(self._blob_names)}-{os.urandom(4).hex()}.tmp"
+        fd = os.open(self._blob_path(name), os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        try:
+            view = memoryview(payload)
+            while view:
+                view = view[os.write(fd, view):]
+        finally:
+            os.close(fd)
+        return name
+
+    def _unlink(self, name):
+        try:
+            os.unlink(self._blob_path(name))
+        except FileNotFoundError:
+            pass
+
+    def _free_slot(self, m, offset):
+        """Empty a slot, deleting the blob file it references (call under the lock)"""
+        slot_hash, _, _, _, length = _SLOT_HEADER.unpack_from(m, offset)
+        start = offset + _SLOT_HEADER.size
+        # Only references name the class; skip unpickling ordinary values
+        if slot_hash and b'_BlobRef' in m[start:start + length]:
+            try:
+                _, value = pickle.loads(m[start:start + length])
+            except Exception:
+                value = None
+            if isinstance(value, _BlobRef):
+                self._unlink(value.name)
+        _SLOT_HEADER.pack_into(m, offset, 0, 0, 0.0, 0.0, 0)
+
+    def _remove_blobs(self, pattern='*.blob'):
+        """Delete blob files (call under the lock); temporary ones belong to writers by default"""
+        for path in glob.glob(os.path.join(self.blob_dir, pattern)):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    def _find(self, m, bucket, key_hash, generation, now):
+        """Way holding a live entry for key_hash, or None"""
+        for way in range(WAYS):
+            slot_hash, slot_generation, expires_at, _, _ = _SLOT_HEADER.unpack_from(m, self._slot_offset(bucket, way))
+            if (slot_hash == key_hash and slot_generation == generation
+                    and (not expires_at or expires_at > now)):
+                return way
+        return None
+
+    def _victim(self, m, bucket, generation, now):
+        """Way to write a new entry into: a free or dead slot, else the least recently used"""
+        victim, oldest = 0, None
+        for way in range(WAYS):
+            slot_hash, slot_generation, expires_at, last_used, _ = _SLOT_HEADER.unpack_from(
+                m, self._slot_offset(bucket, way))
+            if not slot_hash or slot_generation != generation or (expires_at and expires_at <= now):
+                return way, False
+            if oldest is None or last_used < oldest:
+                victim, oldest = way, last_used
+        return victim, True
+
+    def get(self, key, default=None):
+        """Get a value, or `default` if missing or expired"""
+        key_hash = _key_hash(key)
+        bucket = key_hash % self.buckets
+        now = time.time()
+        with self._locked() as m:
+            way = self._find(m, bucket, key_hash, self._generation(m), now)
+            if way is not None:
+                offset = self._slot_offset(bucket, way)
+                slot_hash, slot_generation, expires_at, _, length = _SLOT_HEADER.unpack_from(m, offset)
+                start = offset + _SLOT_HEADER.size
+                stored_key, value = pickle.loads(m[start:start + length])
+                if stored_key == key:
+                    if isinstance(value, _BlobRef):
+                        value = self._read_blob(value)
+                    if value is not _MISSING:
+                        _SLOT_HEADER.pack_into(m, offset, slot_hash, slot_generation, expires_at, now, length)
+                        self.hits += 1
+                        return value
+                    self._free_slot(m, offset)
+
+            self.misses += 1
+            return default
+
+    def _read_blob(self, ref):
+        try:
+            with open(self._blob_path(ref.name), 'rb') as f:
+                payload = f.read()
+        except FileNotFoundError:
+            return _MISSING
+        if len(payload) != ref.length:
+            return _MISSING
+        return pickle.loads(payload)
+
+    def version(self, key):
+        """Version token for `key`; pass to set(if_version=...) after loading a value"""
+        bucket = _key_hash(key) % self.buckets
+        with self._locked() as m:
+            return self._generation(m), self._bucket_version(m, bucket)
+
+    def set(self, key, value, ttl=None, if_version=None):
+        """
+        Store a value; `ttl` overrides the cache default (None = cache default)
+
+        With `if_version`, the value is stored only if nothing was deleted
+        or written in the key's bucket since version() returned that token.
+        A value larger than max_value_size is not stored (any previous
+        value for the key is removed) and counted in `rejected`.
+        """
+        ttl = self.ttl if ttl is None else ttl
+        key_hash = _key_hash(key)
+        bucket = key_hash % self.buckets
+        payload = pickle.dumps((key, value), protocol=pickle.HIGHEST_PROTOCOL)
+        now = time.time()
+        expires_at = now + ttl if ttl else 0.0
+
+        blob = None
+        if len(payload) > self.slot_size - _SLOT_HEADER.size:
+            blob_payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            if len(blob_payload) > self.max_value_size:
+                self._reject(key, key_hash, bucket, len(blob_payload), if_version)
+                return value
+            # Written before taking the lock; installed by renaming it
+            blob = self._write_blob(blob_payload)
+            payload = pickle.dumps((key, _BlobRef(blob[:-len('.tmp')] + '.blob', len(blob_payload))),
+                                   protocol=pickle.HIGHEST_PROTOCOL)
+
+        with self._locked() as m:
+            generation = self._generation(m)
+            if if_version is not None and if_version != (generation, self._bucket_version(m, bucket)):
+                if blob:
+                    self._unlink(blob)
+                return value
+            if if_version is None:
+                self._bump_bucket(m, bucket)
+
+            way = self._find(m, bucket, key_hash, generation, now)
+            if way is None:
+                way, evicted = self._victim(m, bucket, generation, now)
+                if evicted:
+                    self.evictions += 1
+            offset = self._slot_offset(bucket, way)
+            self._free_slot(m, offset)
+            if blob:
+                os.rename(self._blob_path(blob), self._blob_path(blob[:-len('.tmp')] + '.blob'))
+                self.oversize += 1
+            start = offset + _SLOT_HEADER.size
+            m[start:start + len(payload)] = payload
+            _SLOT_HEADER.pack_into(m, offset, key_hash, generation, expires_at, now, len(payload))
+        return value
+
+    def _reject(self, key, key_hash, bucket, size, if_version):
+        """Drop the key's current value instead of storing one that is too large"""
+        with self._locked() as m:
+            generation = self._generation(m)
+            if if_version is not None and if_version != (generation, self._bucket_version(m, bucket)):
+                return
+            self._bump_bucket(m, bucket)
+            way = self._find(m, bucket, key_hash, generation, time.time())
+            if way is not None:
+                self._free_slot(m, self._slot_offset(bucket, way))
+            self.rejected += 1
+        logger.warning(f"Shared cache '{self.name}': value of {size} bytes for {key!r} exceeds "
+                       f"max_value_size ({self.max_value_size}); not cached ({self.rejected} rejected)")
+
+    def get_or_set(self, key, factory, ttl=None):
+        """Return the cached value or compute, store and return factory()"""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            token = self.version(key)
+            value = self.set(key, factory(), ttl, if_version=token)
+        return value
+
+    def delete(self, key):
+        """Remove a single entry in every process"""
+        key_hash = _key_hash(key)
+        bucket = key_hash % self.buckets
+        with self._locked() as m:
+            self._bump_bucket(m, bucket)
+            way = self._find(m, bucket, key_hash, self._generation(m), time.time())
+            if way is None:
+                return False
+            self._free_slot(m, self._slot_offset(bucket, way))
+            return True
+
+    def clear(self):
+        """Remove all entries in every process (slots are reclaimed lazily)"""
+        with self._locked() as m:
+            _GENERATION.pack_into(m, _GENERATION_OFFSET, self._generation(m) + 1)
+            self._remove_blobs()
+
+    def __len__(self):
+        now = time.time()
+        with self._locked() as m:
+            generation = self._generation(m)
+            live = 0
+            for slot in range(self.buckets * WAYS):
+                slot_hash, slot_generation, expires_at, _, _ = _SLOT_HEADER.unpack_from(
+                    m, self._slots_offset + slot * self.slot_size)
+                if slot_hash and slot_generation == generation and (not expires_at or expires_at > now):
+                    live += 1
+            return live
+
+    def stats(self):
+        """Size and hit-rate statistics (hits/misses are this process's)"""
+        size = len(self)
+        lookups = self.hits + self.misses
+        return {
+            'name': self.name,
+            'backend': 'shared',
+            'size': size,
+            'maxsize': self.maxsize,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'oversize': self.oversize,
+            'rejected': self.rejected,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+        }
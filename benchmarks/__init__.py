@@ -0,0 +1 @@
+"""Benchmarks and reference checks (run from the repository root with `python -m benchmarks.<name>`)"""
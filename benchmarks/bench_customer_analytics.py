@@ -0,0 +1,108 @@
+"""
+Customer analytics benchmark: join fan-out vs per-customer subtotals
+
+Runs the previous single-join query and the current pre-aggregated query on a
+generated dataset, reports rows produced/scanned and wall time, and checks the
+current query against totals computed directly in Python.
+
+    python -m benchmarks.bench_customer_analytics [--customers N] [--orders N] ...
+"""
+import argparse
+import time
+from benchmarks.dataset import build_dataset, fetch_dicts, table_count
+from app.utils.advanced_data_layer import AdvancedDataLayer
+
+# Previous implementation (orders x invoices x payments joined before GROUP BY)
+FANOUT_QUERY = """
+SELECT 
+    c.customer_id,
+    COUNT(DISTINCT o.order_id) as total_orders,
+    COALESCE(SUM(o.total_amount), 0) as total_revenue,
+    COUNT(DISTINCT i.invoice_id) as total_invoices,
+    COALESCE(SUM(i.amount_paid), 0) as total_paid,
+    COALESCE(SUM(i.amount_due), 0) as outstanding_balance,
+    COUNT(DISTINCT p.payment_id) as total_payments
+FROM dbo.customers c
+LEFT JOIN dbo.orders o ON c.customer_id = o.customer_id
+LEFT JOIN dbo.invoices i ON c.customer_id = i.customer_id
+LEFT JOIN dbo.payments p ON c.customer_id = p.customer_id
+GROUP BY c.customer_id
+"""
+
+FANOUT_ROWS_QUERY = """
+SELECT COUNT(*)
+FROM dbo.customers c
+LEFT JOIN dbo.orders o ON c.customer_id = o.customer_id
+LEFT JOIN dbo.invoices i ON c.customer_id = i.customer_id
+LEFT JOIN dbo.payments p ON c.customer_id = p.customer_id
+"""
+
+
+def timed(fn, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def reference_totals(conn):
+    """Per-customer totals computed straight from the base tables"""
+    totals = {}
+    for customer_id, amount in conn.execute("SELECT customer_id, total_amount FROM dbo.orders"):
+        entry = totals.setdefault(customer_id, {'revenue': 0.0, 'paid': 0.0, 'due': 0.0})
+        entry['revenue'] += amount
+    for customer_id, paid, due in conn.execute("SELECT customer_id, amount_paid, amount_due FROM dbo.invoices"):
+        entry = totals.setdefault(customer_id, {'revenue': 0.0, 'paid': 0.0, 'due': 0.0})
+        entry['paid'] += paid
+        entry['due'] += due
+    return totals
+
+
+def mismatches(rows, reference, revenue_key='total_revenue'):
+    bad = 0
+    for row in rows:
+        expected = reference.get(row['customer_id'], {'revenue': 0.0, 'paid': 0.0, 'due': 0.0})
+        if (abs(row[revenue_key] - expected['revenue']) > 0.01
+                or abs(row['total_paid'] - expected['paid']) > 0.01
+                or abs(row['outstanding_balance'] - expected['due']) > 0.01):
+            bad += 1
+    return bad
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--customers', type=int, default=200)
+    parser.add_argument('--orders', type=int, default=20, help='orders per customer')
+    parser.add_argument('--invoices', type=int, default=15, help='invoices per customer')
+    parser.add_argument('--payments', type=int, default=10, help='payments per customer')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    conn = build_dataset(customers=args.customers, orders_per_customer=args.orders,
+                         invoices_per_customer=args.invoices, payments_per_customer=args.payments)
+
+    counts = {table: table_count(conn, table) for table in ('customers', 'orders', 'invoices', 'payments')}
+    fanout_rows = conn.execute(FANOUT_ROWS_QUERY).fetchone()[0]
+    aggregated_rows = sum(counts.values())
+
+    query, params = AdvancedDataLayer.build_customer_analytics_query()
+    old_rows, old_time = timed(lambda: fetch_dicts(conn, FANOUT_QUERY), args.repeat)
+    new_rows, new_time = timed(lambda: fetch_dicts(conn, query, params), args.repeat)
+
+    reference = reference_totals(conn)
+
+    print("Dataset: " + ', '.join(f"{table}={count}" for table, count in counts.items()))
+    print(f"{'':<28}{'before (fan-out)':>18}{'after (subtotals)':>20}")
+    print(f"{'rows fed into GROUP BY':<28}{fanout_rows:>18,}{aggregated_rows:>20,}")
+    print(f"{'rows joined to customers':<28}{fanout_rows:>18,}{counts['customers'] * 3:>20,}")
+    print(f"{'best wall time (ms)':<28}{old_time * 1000:>18.1f}{new_time * 1000:>20.1f}")
+    print(f"{'customers with wrong sums':<28}{mismatches(old_rows, reference):>18}"
+          f"{mismatches(new_rows, reference):>20}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,223 @@
+"""
+Hot-SKU reservation benchmark: locking vs optimistic reservations
+
+64 client threads place one-line orders for the same product in the same
+warehouse (a flash sale) against a simulated server that holds one
+inventory row behind a row lock. Every statement costs --rtt-ms of round
+trip; statements that write the row also hold its lock for --service-ms.
+
+  locking      RESERVATION_STRATEGY=locking: InventoryService.reserve runs
+               its set-based UPDATE inside the order transaction, so the row
+               lock is held until commit (order INSERT, items INSERT, rollup
+               UPDATE, COMMIT)
+  optimistic   ReservationEngine: rowversion-checked conditional decrement
+               in its own transaction, retried with backoff on conflict
+  coalesced    the same with RESERVATION_COALESCE_MS, merging concurrent
+               requests for the SKU into one UPDATE
+
+Reports orders/second, rowversion conflicts and fallbacks, and checks that
+the reserved quantity matches what was ordered (no lost updates).
+
+    python -m benchmarks.bench_hot_sku_reservation [--clients N] [--orders N] [--rtt-ms MS]
+"""
+import argparse
+import time
+from contextlib import contextmanager
+from threading import Lock, Thread
+from unittest.mock import patch
+from app.services import reservation_engine as engine_module
+from app.services.inventory_service import InventoryService, _RESERVE_SQL
+from app.services.reservation_engine import (
+    ReservationEngine, INVENTORY_READ_QUERY, RESERVE_VERSIONED_QUERY, RESERVE_QUERY, RELEASE_QUERY
+)
+
+PRODUCT_ID = 1
+WAREHOUSE_ID = 1
+# Statements in the order transaction after the reservation, COMMIT included
+ORDER_WRITES = 4
+
+# InventoryService.reserve's statement for a one-line order
+RESERVE_ONE_QUERY = _RESERVE_SQL.format(rows='(?, ?)')
+
+
+class HotRow:
+    """One inventory row with a row lock, as the server sees it"""
+
+    def __init__(self, on_hand, rtt, service):
+        self.on_hand = on_hand
+        self.reserved = 0
+        self.version = 1
+        self.lock = Lock()
+        self.rtt = rtt
+        self.service = service
+
+    def round_trip(self):
+        if self.rtt:
+            time.sleep(self.rtt)
+
+    def write(self, quantity, version=None):
+        """Conditional decrement under the row lock; (available, version) or None"""
+        with self.lock:
+            time.sleep(self.service)
+            if version is not None and version != self.version:
+                return None
+            if self.on_hand - self.reserved < quantity:
+                return None
+            self.reserved += quantity
+            self.version += 1
+            return self.on_hand - self.reserved, self.version
+
+
+class SimulatedCursor:
+    """Cursor that runs the reservation statements against a HotRow"""
+
+    def __init__(self, row, connection):
+        self.row = row
+        self.connection = connection
+        self.description = None
+        self._result = None
+        self._rows = []
+
+    def execute(self, query, params):
+        row = self.row
+        row.round_trip()
+        self.description = [('inventory_id',), ('quantity_available',), ('row_version',)]
+        if query == RESERVE_ONE_QUERY:
+            # Takes the row lock and keeps it until the transaction ends
+            product_id, quantity, _ = params
+            self.connection.lock_row()
+            time.sleep(row.service)
+            self._rows = []
+            if row.on_hand - row.reserved >= quantity:
+                row.reserved += quantity
+                row.version += 1
+                self._rows = [(product_id,)]
+            self.description = [('product_id',)]
+        elif query.startswith('SELECT product_id, quantity_available FROM inventory'):
+            self._rows = [(params[1], row.on_hand - row.reserved)]
+            self.description = [('product_id',), ('quantity_available',)]
+        elif query == INVENTORY_READ_QUERY:
+            # Snapshot read: does not wait for the row lock
+            self._result = (1, row.on_hand - row.reserved, row.version)
+        elif query == RESERVE_VERSIONED_QUERY:
+            quantity, _, version, _ = params
+            written = row.write(quantity, version)
+            self._result = (1,) + written if written else None
+        elif query == RESERVE_QUERY:
+            written = row.write(params[0])
+            self._result = (1,) + written if written else None
+        elif query == RELEASE_QUERY:
+            with row.lock:
+                row.reserved -= params[0]
+                row.version += 1
+            self.description = None
+        else:
+            raise ValueError('unexpected statement')
+
+    def fetchone(self):
+        return self._result
+
+    def fetchall(self):
+        return self._rows
+
+
+class SimulatedConnection:
+    """One transaction; row locks it takes are released at commit or rollback"""
+
+    def __init__(self, row):
+        self.row = row
+        self.locked = False
+
+    def cursor(self):
+        return SimulatedCursor(self.row, self)
+
+    def lock_row(self):
+        if not self.locked:
+            self.row.lock.acquire()
+            self.locked = True
+
+    def _end(self):
+        if self.locked:
+            self.locked = False
+            self.row.lock.release()
+
+    def commit(self):
+        self.row.round_trip()
+        self._end()
+
+    def rollback(self):
+        self.row.round_trip()
+        self._end()
+
+
+def place_locking(row, engine, quantity):
+    row.round_trip()  # price lines
+    conn = SimulatedConnection(row)
+    try:
+        InventoryService.reserve(conn.cursor(), WAREHOUSE_ID, {PRODUCT_ID: quantity})
+        for _ in range(ORDER_WRITES - 1):
+            row.round_trip()
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def place_optimistic(row, engine, quantity):
+    row.round_trip()  # price lines
+    engine.reserve(WAREHOUSE_ID, {PRODUCT_ID: quantity})
+    for _ in range(ORDER_WRITES):
+        row.round_trip()
+
+
+def run(place, clients, orders, rtt, service, coalesce_ms=0):
+    row = HotRow(on_hand=orders * 10, rtt=rtt, service=service)
+    engine = ReservationEngine(max_retries=5, backoff_ms=max(rtt * 1000, 0.5), coalesce_ms=coalesce_ms)
+    per_client = orders // clients
+    failures = []
+
+    @contextmanager
+    def connection():
+        yield SimulatedConnection(row)
+
+    def client():
+        for _ in range(per_client):
+            try:
+                place(row, engine, 1)
+            except Exception as e:
+                failures.append(e)
+
+    with patch.object(engine_module, 'get_connection', connection):
+        threads = [Thread(target=client) for _ in range(clients)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+    placed = per_client * clients - len(failures)
+    return placed / elapsed, engine.stats(), row.reserved == placed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--clients', type=int, default=64)
+    parser.add_argument('--orders', type=int, default=3200)
+    parser.add_argument('--rtt-ms', type=float, default=0.5, help='simulated round trip per statement')
+    parser.add_argument('--service-ms', type=float, default=0.05, help='row lock hold time per write')
+    parser.add_argument('--coalesce-ms', type=float, default=1.0)
+    args = parser.parse_args()
+    rtt, service = args.rtt_ms / 1000, args.service_ms / 1000
+
+    print(f"{args.clients} clients, {args.orders} orders for one SKU, rtt {args.rtt_ms} ms")
+    print(f"  {'strategy':<11} {'orders/s':>9} {'conflicts':>10} {'fallbacks':>10} {'batches':>8} {'consistent':>11}")
+    for name, place, coalesce_ms in (('locking', place_locking, 0),
+                                     ('optimistic', place_optimistic, 0),
+                                     ('coalesced', place_optimistic, args.coalesce_ms)):
+        rate, stats, consistent = run(place, args.clients, args.orders, rtt, service, coalesce_ms)
+        print(f"  {name:<11} {rate:>9.0f} {stats['conflicts']:>10} {stats['fallbacks']:>10} "
+              f"{stats['batches']:>8} {str(consistent):>11}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+JSON provider benchmark: Flask's default provider vs FastJSONProvider
+
+Serializes a 10k-row /api/orders page (DECIMAL(15,2) money columns,
+DATETIME2 timestamps) through app.json.response(), the path jsonify()
+takes, and reports the median time per page and the body size.
+
+    python -m benchmarks.bench_json_provider [--rows N] [--repeat N] [--pretty]
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from app.utils import json_provider
+from app.utils.json_provider import FastJSONProvider
+
+STATUSES = ['pending', 'confirmed', 'processing', 'shipped', 'delivered', 'cancelled']
+PAYMENT_STATUSES = ['unpaid', 'partial', 'paid', 'refunded']
+
+
+def _money(rng, low, high):
+    return Decimal(rng.randint(low * 100, high * 100)).scaleb(-2)
+
+
+def build_orders_page(rows, seed=7):
+    """An /api/orders response body with `rows` rows shaped like dbo.orders"""
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    data = []
+    for order_id in range(1, rows + 1):
+        order_date = start + timedelta(minutes=rng.randint(0, 60 * 24 * 700), microseconds=rng.randint(0, 999999))
+        subtotal = _money(rng, 20, 5000)
+        tax = (subtotal * Decimal('0.08')).quantize(Decimal('0.01'))
+        shipping = _money(rng, 0, 60)
+        discount = _money(rng, 0, 50)
+        data.append({
+            'order_id': order_id,
+            'order_number': f"ORD-{order_id:08d}",
+            'customer_id': rng.randint(1, 5000),
+            'account_id': rng.randint(1, 800),
+            'order_date': order_date,
+            'required_date': order_date + timedelta(days=7),
+            'shipped_date': order_date + timedelta(days=rng.randint(1, 5)) if rng.random() < 0.7 else None,
+            'order_status': rng.choice(STATUSES),
+            'payment_status': rng.choice(PAYMENT_STATUSES),
+            'subtotal': subtotal,
+            'tax_amount': tax,
+            'shipping_amount': shipping,
+            'discount_amount': discount,
+            'total_amount': subtotal + tax + shipping - discount,
+            'shipping_address': f"{rng.randint(1, 9999)} Main St, Springfield",
+            'billing_address': f"{rng.randint(1, 9999)} Oak Ave, Springfield",
+            'warehouse_id': rng.randint(1, 12),
+            'assigned_user_id': rng.randint(1, 40),
+            'notes': None,
+            'created_by': rng.randint(1, 40),
+            'created_at': order_date,
+            'updated_at': order_date + timedelta(hours=rng.randint(0, 72))
+        })
+    return {'data': data, 'page': 1, 'limit': rows}
+
+
+def time_response(app, page, repeat):
+    """Median seconds for app.json.response(page) and the body size"""
+    timings = []
+    body = b''
+    with app.app_context():
+        for _ in range(repeat):
+            start = time.perf_counter()
+            body = app.json.response(page).get_data()
+            timings.append(time.perf_counter() - start)
+    return statistics.median(timings), len(body)
+
+
+def make_app(provider, pretty, decimal_mode='str', use_orjson=True):
+    app = Flask(__name__)
+    app.debug = pretty
+    app.config['JSON_DECIMAL_MODE'] = decimal_mode
+    app.json = provider(app)
+    if isinstance(app.json, FastJSONProvider):
+        app.json.use_orjson = use_orjson and json_provider.ORJSON_AVAILABLE
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=7)
+    parser.add_argument('--pretty', action='store_true', help='Indented output, as in debug mode')
+    args = parser.parse_args()
+
+    page = build_orders_page(args.rows)
+    variants = [
+        ('flask default', make_app(DefaultJSONProvider, args.pretty)),
+        ('fast, stdlib json, decimal=str', make_app(FastJSONProvider, args.pretty, use_orjson=False)),
+    ]
+    if json_provider.ORJSON_AVAILABLE:
+        variants += [
+            ('fast, orjson, decimal=str', make_app(FastJSONProvider, args.pretty, 'str')),
+            ('fast, orjson, decimal=float', make_app(FastJSONProvider, args.pretty, 'float')),
+        ]
+    else:
+        print('orjson not installed; only the stdlib fallback is measured')
+
+    print(f"{args.rows} order rows, {'indented' if args.pretty else 'compact'}, median of {args.repeat}")
+    baseline = None
+    for name, app in variants:
+        seconds, size = time_response(app, page, args.repeat)
+        baseline = baseline or seconds
+        print(f"  {name:<32} {seconds * 1000:8.1f} ms  {size / 1024:8.0f} KiB  {baseline / seconds:5.1f}x")
+
+
+if __name__ == '__main__':
+    main()
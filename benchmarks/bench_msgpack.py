@@ -0,0 +1,133 @@
+"""
+MessagePack vs JSON benchmark for bulk API pages
+
+Encodes representative pages (/api/orders, /api/products and an
+inventory-style page) the way the API does - JSON through the app's JSON
+provider, MessagePack through app.utils.responses - then decodes them as a
+client would, and reports median encode/decode time and payload size (raw
+and gzip).
+
+    python -m benchmarks.bench_msgpack [--rows N] [--repeat N]
+"""
+import argparse
+import gzip
+import json
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from flask import Flask
+from app.utils import json_provider, responses
+from app.utils.json_provider import FastJSONProvider
+from benchmarks.bench_json_provider import build_orders_page
+
+CATEGORIES = ['Electronics', 'Hardware', 'Office', 'Networking', 'Storage']
+
+
+def build_products_page(rows, seed=11):
+    rng = random.Random(seed)
+    created = datetime(2023, 6, 1)
+    data = []
+    for product_id in range(1, rows + 1):
+        cost = Decimal(rng.randint(100, 50000)).scaleb(-2)
+        data.append({
+            'product_id': product_id,
+            'product_code': f"PRD-{product_id:06d}",
+            'product_name': f"Product {product_id}",
+            'category': rng.choice(CATEGORIES),
+            'description': 'Standard catalog item',
+            'unit_price': (cost * Decimal('1.35')).quantize(Decimal('0.01')),
+            'cost_price': cost,
+            'reorder_level': rng.randint(5, 50),
+            'reorder_quantity': rng.randint(20, 200),
+            'supplier_id': rng.randint(1, 60),
+            'is_active': True,
+            'created_at': created + timedelta(days=rng.randint(0, 600)),
+            'updated_at': created + timedelta(days=rng.randint(600, 700))
+        })
+    return {'data': data, 'page': 1, 'limit': rows}
+
+
+def build_inventory_page(rows, seed=13):
+    rng = random.Random(seed)
+    checked = datetime(2026, 1, 1)
+    data = []
+    for inventory_id in range(1, rows + 1):
+        on_hand = rng.randint(0, 5000)
+        reserved = rng.randint(0, on_hand)
+        data.append({
+            'inventory_id': inventory_id,
+            'product_id': rng.randint(1, 20000),
+            'warehouse_id': rng.randint(1, 12),
+            'quantity_on_hand': on_hand,
+            'quantity_reserved': reserved,
+            'quantity_available': on_hand - reserved,
+            'bin_location': f"A{rng.randint(1, 40):02d}-{rng.randint(1, 12):02d}",
+            'last_stock_check': checked + timedelta(hours=rng.randint(0, 2000)),
+            'last_restock_date': checked - timedelta(days=rng.randint(0, 90))
+        })
+    return {'data': data, 'page': 1, 'limit': rows}
+
+
+def median_seconds(fn, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), result
+
+
+def make_app(use_orjson):
+    app = Flask(__name__)
+    app.json = FastJSONProvider(app)
+    app.json.use_orjson = use_orjson
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    if not responses.MSGPACK_AVAILABLE:
+        parser.error('msgpack is not installed')
+
+    import msgpack
+
+    pages = {
+        'orders': build_orders_page(args.rows),
+        'products': build_products_page(args.rows),
+        'inventory': build_inventory_page(args.rows)
+    }
+    codecs = [('json (stdlib)', make_app(False), lambda body: json.loads(body))]
+    if json_provider.ORJSON_AVAILABLE:
+        import orjson
+        codecs.append(('json (orjson)', make_app(True), orjson.loads))
+
+    print(f"{args.rows} rows per page, median of {args.repeat}")
+    print(f"  {'page':<10} {'codec':<14} {'encode ms':>10} {'decode ms':>10} {'bytes':>10} {'gzip bytes':>11}")
+    for page_name, page in pages.items():
+        rows = []
+        for codec_name, app, decode in codecs:
+            with app.app_context():
+                encode_s, body = median_seconds(lambda: app.json.dumps_bytes(page), args.repeat)
+            decode_s, _ = median_seconds(lambda: decode(body), args.repeat)
+            rows.append((codec_name, encode_s, decode_s, body))
+
+        app = codecs[-1][1]
+        with app.app_context():
+            encode_s, body = median_seconds(lambda: responses.packb(page), args.repeat)
+        decode_s, _ = median_seconds(lambda: msgpack.unpackb(body), args.repeat)
+        rows.append(('msgpack', encode_s, decode_s, body))
+
+        for codec_name, encode_s, decode_s, body in rows:
+            print(f"  {page_name:<10} {codec_name:<14} {encode_s * 1000:10.1f} {decode_s * 1000:10.1f} "
+                  f"{len(body):10d} {len(gzip.compress(body, 6)):11d}")
+
+
+if __name__ == '__main__':
+    main()
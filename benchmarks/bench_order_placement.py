@@ -0,0 +1,159 @@
+"""
+Order placement benchmark: per-line statements vs batched placement
+
+Places orders with 20-line carts on a generated dataset two ways and reports
+orders/second and statements per order:
+
+  per-line  what clients had to do before POST /api/orders accepted items:
+            insert the order, then price, insert and reserve each line
+  batched   OrderService.place: one catalog query, one set-based reserve
+            UPDATE, one order INSERT and one multi-row item INSERT
+
+Each order is one transaction. --rtt-ms adds a simulated client/server round
+trip to every statement (SQLite runs in-process, SQL Server does not). The
+statements are SQLite translations of the service's T-SQL (RETURNING for
+OUTPUT, UPDATE ... FROM a VALUES subquery).
+
+    python -m benchmarks.bench_order_placement [--orders N] [--lines N] [--rtt-ms MS]
+"""
+import argparse
+import random
+import time
+from benchmarks.dataset import build_dataset
+
+
+class RoundTrips:
+    """Connection wrapper that counts statements and adds a fixed latency to each"""
+
+    def __init__(self, conn, rtt):
+        self.conn = conn
+        self.rtt = rtt
+        self.statements = 0
+
+    def execute(self, query, params=()):
+        self.statements += 1
+        if self.rtt:
+            time.sleep(self.rtt)
+        return self.conn.execute(query, params).fetchall()
+
+    def commit(self):
+        self.statements += 1
+        if self.rtt:
+            time.sleep(self.rtt)
+        self.conn.commit()
+
+
+def place_per_line(db, customer_id, warehouse_id, cart):
+    order_id = db.execute(
+        "INSERT INTO dbo.orders (customer_id, warehouse_id, order_date, order_status, payment_status, total_amount) "
+        "VALUES (?, ?, datetime('now'), 'pending', 'unpaid', 0) RETURNING order_id",
+        (customer_id, warehouse_id))[0][0]
+    total = 0.0
+    for product_id, quantity in cart:
+        price = db.execute("SELECT unit_price FROM dbo.products WHERE product_id = ?", (product_id,))[0][0]
+        line_total = round(price * quantity, 2)
+        total += line_total
+        db.execute("INSERT INTO dbo.order_items (order_id, product_id, quantity, unit_price, line_total) "
+                   "VALUES (?, ?, ?, ?, ?)", (order_id, product_id, quantity, price, line_total))
+        reserved = db.execute(
+            "UPDATE dbo.inventory SET quantity_reserved = quantity_reserved + ?, "
+            "quantity_available = quantity_available - ? "
+            "WHERE product_id = ? AND warehouse_id = ? AND quantity_available >= ? RETURNING product_id",
+            (quantity, quantity, product_id, warehouse_id, quantity))
+        if not reserved:
+            raise RuntimeError(f"product {product_id} out of stock")
+    db.execute("UPDATE dbo.orders SET total_amount = ? WHERE order_id = ?", (round(total, 2), order_id))
+    db.commit()
+    return order_id
+
+
+def place_batched(db, customer_id, warehouse_id, cart):
+    quantities = {}
+    for product_id, quantity in cart:
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+    product_ids = sorted(quantities)
+
+    prices = dict(db.execute(
+        f"SELECT product_id, unit_price FROM dbo.products WHERE product_id IN ({','.join('?' * len(product_ids))})",
+        product_ids))
+
+    values = ', '.join('(?, ?)' for _ in product_ids)
+    reserved = db.execute(
+        "UPDATE dbo.inventory SET quantity_reserved = quantity_reserved + r.quantity, "
+        "quantity_available = quantity_available - r.quantity "
+        f"FROM (SELECT column1 AS product_id, column2 AS quantity FROM (VALUES {values})) AS r "
+        "WHERE inventory.product_id = r.product_id AND inventory.warehouse_id = ? "
+        "AND inventory.quantity_available >= r.quantity RETURNING product_id",
+        [value for product_id in product_ids for value in (product_id, quantities[product_id])] + [warehouse_id])
+    if len(reserved) != len(product_ids):
+        db.conn.rollback()
+        raise RuntimeError("insufficient stock")
+
+    lines = [(product_id, quantity, prices[product_id], round(prices[product_id] * quantity, 2))
+             for product_id, quantity in cart]
+    order_id = db.execute(
+        "INSERT INTO dbo.orders (customer_id, warehouse_id, order_date, order_status, payment_status, total_amount) "
+        "VALUES (?, ?, datetime('now'), 'pending', 'unpaid', ?) RETURNING order_id",
+        (customer_id, warehouse_id, round(sum(line[3] for line in lines), 2)))[0][0]
+    db.execute(
+        "INSERT INTO dbo.order_items (order_id, product_id, quantity, unit_price, line_total) VALUES "
+        + ', '.join('(?, ?, ?, ?, ?)' for _ in lines) + " RETURNING order_item_id",
+        [value for line in lines for value in (order_id,) + line])
+    db.commit()
+    return order_id
+
+
+def build_carts(conn, orders, lines, seed=7):
+    """(customer_id, warehouse_id, [(product_id, quantity)]) with every product stocked in the warehouse"""
+    rng = random.Random(seed)
+    stocked = {}
+    for product_id, warehouse_id in conn.execute("SELECT product_id, warehouse_id FROM dbo.inventory"):
+        stocked.setdefault(warehouse_id, []).append(product_id)
+    warehouses = [w for w, products in stocked.items() if len(products) >= lines]
+    customers = conn.execute("SELECT COUNT(*) FROM dbo.customers").fetchone()[0]
+    carts = []
+    for _ in range(orders):
+        warehouse_id = rng.choice(warehouses)
+        products = rng.sample(stocked[warehouse_id], lines)
+        carts.append((rng.randint(1, customers), warehouse_id, [(p, rng.randint(1, 5)) for p in products]))
+    return carts
+
+
+def run(strategy, carts, rtt):
+    conn = build_dataset()
+    # Plenty of stock so no order fails; the benchmark measures the write path
+    conn.execute("UPDATE dbo.inventory SET quantity_on_hand = 1000000, quantity_reserved = 0, "
+                 "quantity_available = 1000000")
+    conn.commit()
+    db = RoundTrips(conn, rtt)
+    start = time.perf_counter()
+    for customer_id, warehouse_id, cart in carts:
+        strategy(db, customer_id, warehouse_id, cart)
+    elapsed = time.perf_counter() - start
+    reserved = conn.execute("SELECT SUM(quantity_reserved) FROM dbo.inventory").fetchone()[0]
+    return elapsed, db.statements, reserved
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--orders', type=int, default=500)
+    parser.add_argument('--lines', type=int, default=20, help='line items per cart')
+    parser.add_argument('--rtt-ms', type=float, action='append',
+                        help='simulated round trip per statement (repeatable; default 0 and 0.5)')
+    args = parser.parse_args()
+
+    conn = build_dataset()
+    carts = build_carts(conn, args.orders, args.lines)
+    expected = sum(quantity for _, _, cart in carts for _, quantity in cart)
+
+    print(f"{args.orders} orders, {args.lines} lines per cart")
+    print(f"  {'rtt ms':>6} {'strategy':<9} {'orders/s':>10} {'stmts/order':>12} {'reserved ok':>12}")
+    for rtt_ms in args.rtt_ms or [0.0, 0.5]:
+        for name, strategy in (('per-line', place_per_line), ('batched', place_batched)):
+            elapsed, statements, reserved = run(strategy, carts, rtt_ms / 1000)
+            print(f"  {rtt_ms:>6.2f} {name:<9} {args.orders / elapsed:>10.0f} "
+                  f"{statements / args.orders:>12.1f} {str(reserved == expected):>12}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+"""
+Reference check for the warehouse utilization and supplier performance reports
+
+Runs the per-dimension aggregate queries on a generated dataset, merges them
+with the same functions the data layer uses, and compares every field against
+a naive pure-Python implementation over the raw tables. Also reports the row
+counts and wall time of the previous single-join queries for comparison.
+
+    python -m benchmarks.check_fanout_reports [--products N] [--customers N]
+"""
+import argparse
+import sys
+import time
+from benchmarks.dataset import build_dataset, fetch_dicts
+from app.utils import advanced_data_layer as adl
+from app.utils.advanced_data_layer import AdvancedDataLayer
+
+# Previous single-join implementations (row counts before GROUP BY)
+WAREHOUSE_FANOUT_ROWS = """
+SELECT COUNT(*)
+FROM dbo.warehouses w
+LEFT JOIN dbo.inventory i ON w.warehouse_id = i.warehouse_id
+LEFT JOIN dbo.orders o ON w.warehouse_id = o.warehouse_id
+LEFT JOIN dbo.shipments s ON w.warehouse_id = s.warehouse_id
+"""
+
+SUPPLIER_FANOUT_ROWS = """
+SELECT COUNT(*)
+FROM dbo.suppliers s
+LEFT JOIN dbo.products p ON s.supplier_id = p.supplier_id
+LEFT JOIN dbo.inventory i ON p.product_id = i.product_id
+LEFT JOIN dbo.order_items oi ON p.product_id = oi.product_id
+WHERE s.status = 'active'
+"""
+
+WAREHOUSE_FANOUT_UNITS = """
+SELECT w.warehouse_id, SUM(i.quantity_on_hand) as total_units_stored
+FROM dbo.warehouses w
+LEFT JOIN dbo.inventory i ON w.warehouse_id = i.warehouse_id
+LEFT JOIN dbo.orders o ON w.warehouse_id = o.warehouse_id
+LEFT JOIN dbo.shipments s ON w.warehouse_id = s.warehouse_id
+GROUP BY w.warehouse_id
+"""
+
+
+def table(conn, name):
+    return fetch_dicts(conn, f"SELECT * FROM dbo.{name}")
+
+
+def naive_warehouse_utilization(conn):
+    users = {u['user_id']: u for u in table(conn, 'users')}
+    inventory = table(conn, 'inventory')
+    orders = table(conn, 'orders')
+    shipments = table(conn, 'shipments')
+    report = {}
+    for w in table(conn, 'warehouses'):
+        rows = [i for i in inventory if i['warehouse_id'] == w['warehouse_id']]
+        stored = sum(i['quantity_on_hand'] for i in rows)
+        manager = users.get(w['manager_user_id'])
+        report[w['warehouse_id']] = {
+            'unique_products': len({i['product_id'] for i in rows}),
+            'total_units_stored': stored,
+            'total_units_reserved': sum(i['quantity_reserved'] for i in rows),
+            'total_units_available': sum(i['quantity_available'] for i in rows),
+            'utilization_pct': stored / w['capacity'] * 100 if w['capacity'] > 0 else 0,
+            'orders_fulfilled': sum(1 for o in orders if o['warehouse_id'] == w['warehouse_id']),
+            'shipments_sent': sum(1 for s in shipments if s['warehouse_id'] == w['warehouse_id']),
+            'manager_name': f"{manager['first_name']} {manager['last_name']}" if manager else None
+        }
+    return report
+
+
+def naive_supplier_performance(conn):
+    products = table(conn, 'products')
+    inventory = table(conn, 'inventory')
+    items = table(conn, 'order_items')
+    report = {}
+    for s in table(conn, 'suppliers'):
+        if s['status'] != 'active':
+            continue
+        owned = [p for p in products if p['supplier_id'] == s['supplier_id']]
+        ids = {p['product_id'] for p in owned}
+        stock = [i for i in inventory if i['product_id'] in ids]
+        sold = [oi for oi in items if oi['product_id'] in ids]
+        margins = [p['unit_price'] - p['cost_price'] for p in owned if p['cost_price'] is not None]
+        report[s['supplier_id']] = {
+            'products_supplied': len(owned),
+            'inventory_locations': len(stock),
+            'total_units_in_stock': sum(i['quantity_on_hand'] for i in stock),
+            'orders_containing_products': len({oi['order_id'] for oi in sold}),
+            'total_units_sold': sum(oi['quantity'] for oi in sold),
+            'total_sales_value': sum(oi['line_total'] for oi in sold),
+            'avg_profit_per_unit': sum(margins) / len(margins) if margins else None,
+            'last_restock_date': max((i['last_restock_date'] for i in stock), default=None)
+        }
+    return report
+
+
+def compare(name, rows, reference, key):
+    errors = []
+    if len(rows) != len(reference):
+        errors.append(f"{name}: {len(rows)} rows, reference has {len(reference)}")
+    for row in rows:
+        expected = reference.get(row[key])
+        if expected is None:
+            errors.append(f"{name}: unexpected {key}={row[key]}")
+            continue
+        for field, value in expected.items():
+            actual = row[field]
+            if isinstance(value, float) or isinstance(actual, float):
+                same = value is not None and actual is not None and abs(actual - value) < 1e-6
+            else:
+                same = actual == value
+            if not same:
+                errors.append(f"{name}: {key}={row[key]} {field} = {actual!r}, expected {value!r}")
+    return errors
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--products', type=int, default=400)
+    parser.add_argument('--customers', type=int, default=100)
+    args = parser.parse_args()
+
+    conn = build_dataset(products=args.products, customers=args.customers)
+
+    def warehouse_report():
+        return AdvancedDataLayer.merge_warehouse_utilization(
+            fetch_dicts(conn, adl.WAREHOUSE_BASE_QUERY),
+            fetch_dicts(conn, adl.INVENTORY_BY_WAREHOUSE_QUERY),
+            fetch_dicts(conn, adl.ORDERS_BY_WAREHOUSE_QUERY),
+            fetch_dicts(conn, adl.SHIPMENTS_BY_WAREHOUSE_QUERY))
+
+    def supplier_report():
+        return AdvancedDataLayer.merge_supplier_performance(
+            fetch_dicts(conn, adl.SUPPLIER_BASE_QUERY),
+            fetch_dicts(conn, adl.PRODUCTS_BY_SUPPLIER_QUERY),
+            fetch_dicts(conn, adl.INVENTORY_BY_SUPPLIER_QUERY),
+            fetch_dicts(conn, adl.SALES_BY_SUPPLIER_QUERY))
+
+    warehouses, warehouse_ms = timed(warehouse_report)
+    suppliers, supplier_ms = timed(supplier_report)
+    (warehouse_fanout,), fanout_ms = timed(lambda: conn.execute(WAREHOUSE_FANOUT_ROWS).fetchone())
+    supplier_fanout = conn.execute(SUPPLIER_FANOUT_ROWS).fetchone()[0]
+
+    naive_warehouses = naive_warehouse_utilization(conn)
+    old_units = {r['warehouse_id']: r['total_units_stored'] for r in fetch_dicts(conn, WAREHOUSE_FANOUT_UNITS)}
+    inflated = sum(1 for wid, units in old_units.items()
+                   if units != naive_warehouses[wid]['total_units_stored'])
+
+    errors = compare('warehouse_utilization', warehouses, naive_warehouses, 'warehouse_id')
+    errors += compare('supplier_performance', suppliers, naive_supplier_performance(conn), 'supplier_id')
+
+    print(f"warehouse_utilization: {len(warehouses)} rows in {warehouse_ms:.1f} ms "
+          f"(previous join: {warehouse_fanout:,} rows before GROUP BY, counted in {fanout_ms:.1f} ms; "
+          f"{inflated} warehouses had inflated total_units_stored)")
+    print(f"supplier_performance: {len(suppliers)} rows in {supplier_ms:.1f} ms "
+          f"(previous join: {supplier_fanout:,} rows before GROUP BY)")
+
+    if errors:
+        print(f"\n{len(errors)} mismatches against the reference implementation:")
+        for error in errors[:20]:
+            print(f"  {error}")
+        sys.exit(1)
+    print("Both reports match the reference implementation")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+"""
+Generated benchmark dataset
+Builds an in-memory SQLite copy of the reporting tables, attached as schema
+`dbo` so the portable report queries run unchanged
+"""
+import random
+import sqlite3
+from datetime import datetime, timedelta
+
+SCHEMA = [
+    """CREATE TABLE dbo.users (
+        user_id INTEGER PRIMARY KEY, username TEXT, first_name TEXT, last_name TEXT, role TEXT)""",
+    """CREATE TABLE dbo.customers (
+        customer_id INTEGER PRIMARY KEY, company_name TEXT, customer_type TEXT,
+        credit_limit REAL, current_balance REAL, status TEXT)""",
+    """CREATE TABLE dbo.suppliers (
+        supplier_id INTEGER PRIMARY KEY, supplier_code TEXT, supplier_name TEXT,
+        rating REAL, payment_terms INTEGER, status TEXT)""",
+    """CREATE TABLE dbo.warehouses (
+        warehouse_id INTEGER PRIMARY KEY, warehouse_code TEXT, warehouse_name TEXT,
+        location TEXT, capacity INTEGER, manager_user_id INTEGER)""",
+    """CREATE TABLE dbo.products (
+        product_id INTEGER PRIMARY KEY, product_code TEXT, product_name TEXT, category TEXT,
+        unit_price REAL, cost_price REAL, supplier_id INTEGER, is_active INTEGER)""",
+    """CREATE TABLE dbo.inventory (
+        inventory_id INTEGER PRIMARY KEY, product_id INTEGER, warehouse_id INTEGER,
+        quantity_on_hand INTEGER, quantity_reserved INTEGER, quantity_available INTEGER,
+        last_restock_date TEXT)""",
+    """CREATE TABLE dbo.orders (
+        order_id INTEGER PRIMARY KEY, customer_id INTEGER, warehouse_id INTEGER, order_date TEXT,
+        order_status TEXT, payment_status TEXT, total_amount REAL)""",
+    """CREATE TABLE dbo.order_items (
+        order_item_id INTEGER PRIMARY KEY, order_id INTEGER, product_id INTEGER,
+        quantity INTEGER, unit_price REAL, line_total REAL)""",
+    """CREATE TABLE dbo.shipments (
+        shipment_id INTEGER PRIMARY KEY, order_id INTEGER, warehouse_id INTEGER)""",
+    """CREATE TABLE dbo.invoices (
+        invoice_id INTEGER PRIMARY KEY, customer_id INTEGER, amount_paid REAL, amount_due REAL)""",
+    """CREATE TABLE dbo.payments (
+        payment_id INTEGER PRIMARY KEY, customer_id INTEGER, invoice_id INTEGER, payment_date TEXT)""",
+    "CREATE INDEX dbo.idx_orders_customer ON orders (customer_id)",
+    "CREATE INDEX dbo.idx_invoices_customer ON invoices (customer_id)",
+    "CREATE INDEX dbo.idx_payments_customer ON payments (customer_id)",
+    "CREATE INDEX dbo.idx_inventory_product ON inventory (product_id)",
+    "CREATE INDEX dbo.idx_order_items_product ON order_items (product_id)",
+]
+
+
+def _iso(moment):
+    return moment.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def build_dataset(customers=200, orders_per_customer=20, invoices_per_customer=15,
+                  payments_per_customer=10, warehouses=8, suppliers=20, products=400,
+                  items_per_order=3, shipment_ratio=0.8, seed=42):
+    """
+    Create and populate an in-memory database
+
+    Returns:
+        sqlite3.Connection with the tables attached under schema `dbo`
+    """
+    rng = random.Random(seed)
+    conn = sqlite3.connect(':memory:', check_same_thread=False)
+    conn.execute("ATTACH DATABASE ':memory:' AS dbo")
+    for statement in SCHEMA:
+        conn.execute(statement)
+
+    now = datetime(2024, 6, 30)
+
+    users = [(u, f'user{u}', f'First{u}', f'Last{u}', 'warehouse_manager') for u in range(1, 11)]
+    conn.executemany("INSERT INTO dbo.users VALUES (?, ?, ?, ?, ?)", users)
+
+    conn.executemany("INSERT INTO dbo.customers VALUES (?, ?, ?, ?, ?, ?)", [
+        (c, f'Company {c}', rng.choice(['enterprise', 'business']),
+         float(rng.randrange(10000, 200000, 5000)), 0.0, 'active')
+        for c in range(1, customers + 1)
+    ])
+
+    conn.executemany("INSERT INTO dbo.suppliers VALUES (?, ?, ?, ?, ?, ?)", [
+        (s, f'SUP{s:03d}', f'Supplier {s}', round(rng.uniform(1, 5), 1), 30,
+         'active' if s % 7 else 'inactive')
+        for s in range(1, suppliers + 1)
+    ])
+
+    conn.executemany("INSERT INTO dbo.warehouses VALUES (?, ?, ?, ?, ?, ?)", [
+        (w, f'WH{w:03d}', f'Warehouse {w}', f'District {w}', rng.randrange(50000, 200000, 1000),
+         rng.choice([None, rng.randint(1, len(users))]))
+        for w in range(1, warehouses + 1)
+    ])
+
+    product_rows = []
+    for p in range(1, products + 1):
+        price = round(rng.uniform(5, 500), 2)
+        product_rows.append((p, f'P{p:05d}', f'Product {p}', rng.choice(['A', 'B', 'C']),
+                             price, round(price * rng.uniform(0.4, 0.8), 2),
+                             rng.randint(1, suppliers), 1))
+    conn.executemany("INSERT INTO dbo.products VALUES (?, ?, ?, ?, ?, ?, ?, ?)", product_rows)
+
+    inventory_rows = []
+    inventory_id = 0
+    for p in range(1, products + 1):
+        for w in rng.sample(range(1, warehouses + 1), rng.randint(1, min(3, warehouses))):
+            inventory_id += 1
+            on_hand = rng.randint(0, 500)
+            reserved = rng.randint(0, on_hand)
+            inventory_rows.append((inventory_id, p, w, on_hand, reserved, on_hand - reserved,
+                                   _iso(now - timedelta(days=rng.randint(0, 90)))))
+    conn.executemany("INSERT INTO dbo.inventory VALUES (?, ?, ?, ?, ?, ?, ?)", inventory_rows)
+
+    order_rows = []
+    item_rows = []
+    shipment_rows = []
+    order_id = 0
+    item_id = 0
+    for c in range(1, customers + 1):
+        for _ in range(orders_per_customer):
+            order_id += 1
+            warehouse_id = rng.randint(1, warehouses)
+            total = 0.0
+            for _ in range(items_per_order):
+                item_id += 1
+                product = product_rows[rng.randrange(products)]
+                quantity = rng.randint(1, 10)
+                line_total = round(product[4] * quantity, 2)
+                total += line_total
+                item_rows.append((item_id, order_id, product[0], quantity, product[4], line_total))
+            order_rows.append((order_id, c, warehouse_id,
+                               _iso(now - timedelta(days=rng.randint(0, 720))),
+                               rng.choice(['pending', 'shipped', 'delivered', 'cancelled']),
+                               rng.choice(['paid', 'unpaid', 'partial']), round(total, 2)))
+            if rng.random() < shipment_ratio:
+                shipment_rows.append((len(shipment_rows) + 1, order_id, warehouse_id))
+    conn.executemany("INSERT INTO dbo.orders VALUES (?, ?, ?, ?, ?, ?, ?)", order_rows)
+    conn.executemany("INSERT INTO dbo.order_items VALUES (?, ?, ?, ?, ?, ?)", item_rows)
+    conn.executemany("INSERT INTO dbo.shipments VALUES (?, ?, ?)", shipment_rows)
+
+    invoice_rows = []
+    for c in range(1, customers + 1):
+        for _ in range(invoices_per_customer):
+            paid = round(rng.uniform(0, 5000), 2)
+            invoice_rows.append((len(invoice_rows) + 1, c, paid, round(rng.uniform(0, 2000), 2)))
+    conn.executemany("INSERT INTO dbo.invoices VALUES (?, ?, ?, ?)", invoice_rows)
+
+    payment_rows = []
+    for c in range(1, customers + 1):
+        for _ in range(payments_per_customer):
+            payment_rows.append((len(payment_rows) + 1, c, rng.randint(1, len(invoice_rows)),
+                                 _iso(now - timedelta(days=rng.randint(0, 365)))))
+    conn.executemany("INSERT INTO dbo.payments VALUES (?, ?, ?, ?)", payment_rows)
+
+    conn.commit()
+    return conn
+
+
+def fetch_dicts(conn, query, params=()):
+    """Run a query and return rows as dictionaries (mirrors execute_query)"""
+    cursor = conn.execute(query, list(params))
+    columns = [column[0] for column in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def table_count(conn, table):
+    return conn.execute(f"SELECT COUNT(*) FROM dbo.{table}").fetchone()[0]
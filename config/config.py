@@ -28,6 +28,11 @@ class Config:
     DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', '30'))
     DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '20'))
     
+    # Retries for deadlocks, serialization failures and dropped connections
+    DB_RETRY_ATTEMPTS = int(os.getenv('DB_RETRY_ATTEMPTS', '4'))  # total attempts; 1 disables retries
+    DB_RETRY_BASE_MS = int(os.getenv('DB_RETRY_BASE_MS', '50'))
+    DB_RETRY_MAX_MS = int(os.getenv('DB_RETRY_MAX_MS', '1000'))
+    
     # Connection String
     @property
     def DATABASE_URI(self):
@@ -67,11 +72,92 @@ class Config:
     RATELIMIT_ENABLED = os.getenv('RATELIMIT_ENABLED', 'True').lower() == 'true'
     RATELIMIT_DEFAULT = os.getenv('RATELIMIT_DEFAULT', '100 per hour')
     
+    # Caching
+    CACHE_DEFAULT_TTL = int(os.getenv('CACHE_DEFAULT_TTL', '300'))  # seconds
+    CACHE_DEFAULT_MAXSIZE = int(os.getenv('CACHE_DEFAULT_MAXSIZE', '1024'))
+    CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'local')  # local or shared (across workers)
+    SHARED_CACHE_DIR = os.getenv('SHARED_CACHE_DIR', '')  # default /dev/shm
+    SHARED_CACHE_NAMESPACE = os.getenv('SHARED_CACHE_NAMESPACE', 'crm-api')
+    SHARED_CACHE_SLOT_SIZE = int(os.getenv('SHARED_CACHE_SLOT_SIZE', '4096'))  # bytes per entry
+    SHARED_CACHE_MAX_VALUE_BYTES = int(os.getenv('SHARED_CACHE_MAX_VALUE_BYTES', '16777216'))  # larger values aren't cached
+    
+    # Daily Sales Rollups
+    SALES_ROLLUP_BACKFILL = os.getenv('SALES_ROLLUP_BACKFILL', 'True').lower() == 'true'  # rebuild empty rollups at startup
+    
+    # Revenue Forecasting
+    FORECAST_HISTORY_MONTHS = int(os.getenv('FORECAST_HISTORY_MONTHS', '36'))
+    FORECAST_MAX_MONTHS_AHEAD = int(os.getenv('FORECAST_MAX_MONTHS_AHEAD', '24'))
+    FORECAST_CACHE_TTL = int(os.getenv('FORECAST_CACHE_TTL', '21600'))  # 6 hours
+    
+    # Analytics Dashboard
+    DASHBOARD_MAX_WORKERS = int(os.getenv('DASHBOARD_MAX_WORKERS', '8'))
+    DASHBOARD_TIMEOUT = int(os.getenv('DASHBOARD_TIMEOUT', '30'))  # seconds
+    
+    # Report Export
+    EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', '1000'))  # rows per fetch
+    
+    # JSON Serialization
+    JSON_DECIMAL_MODE = os.getenv('JSON_DECIMAL_MODE', 'str')  # 'str' (exact) or 'float'
+    
+    # Response Compression
+    COMPRESSION_ENABLED = os.getenv('COMPRESSION_ENABLED', 'True').lower() == 'true'
+    COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', '1024'))  # bytes
+    
+    # HTTP Conditional GET
+    REPORT_SNAPSHOT_TTL = int(os.getenv('REPORT_SNAPSHOT_TTL', '60'))  # seconds
+    
+    # Entity Cache (get_by_id rows)
+    ENTITY_CACHE_TTL = int(os.getenv('ENTITY_CACHE_TTL', '300'))  # seconds
+    ENTITY_CACHE_MAXSIZE = {
+        'customer': int(os.getenv('CUSTOMER_CACHE_MAXSIZE', '5000')),
+        'product': int(os.getenv('PRODUCT_CACHE_MAXSIZE', '10000')),
+        'order': int(os.getenv('ORDER_CACHE_MAXSIZE', '20000'))
+    }
+    # Entities whose encoded GET-by-id responses are cached (comma separated, empty disables)
+    RESPONSE_CACHE_ENTITIES = [e.strip() for e in os.getenv('RESPONSE_CACHE_ENTITIES', 'product').split(',') if e.strip()]
+    RESPONSE_CACHE_MAXSIZE = int(os.getenv('RESPONSE_CACHE_MAXSIZE', '1000'))
+    
+    # Inventory Deltas (stock adjustments coalesced per product/warehouse)
+    INVENTORY_COALESCE_MS = float(os.getenv('INVENTORY_COALESCE_MS', '5'))  # 0 writes each adjustment directly
+    INVENTORY_JOURNAL_PATH = os.getenv('INVENTORY_JOURNAL_PATH', 'logs/inventory-deltas.journal')
+    INVENTORY_JOURNAL_FSYNC = os.getenv('INVENTORY_JOURNAL_FSYNC', 'False').lower() == 'true'
+    
+    # Idempotency-Key on create routes
+    IDEMPOTENCY_TTL = int(os.getenv('IDEMPOTENCY_TTL', '86400'))  # seconds a key's response is kept
+    IDEMPOTENCY_MAXSIZE = int(os.getenv('IDEMPOTENCY_MAXSIZE', '10000'))
+    IDEMPOTENCY_WAIT_SECONDS = int(os.getenv('IDEMPOTENCY_WAIT_SECONDS', '30'))  # duplicate waits for the first
+    IDEMPOTENCY_PENDING_TTL = int(os.getenv('IDEMPOTENCY_PENDING_TTL', '60'))  # claim of a request still running
+    
+    # Audit Log (events written in batches by a background thread)
+    AUDIT_ASYNC = os.getenv('AUDIT_ASYNC', 'True').lower() == 'true'
+    AUDIT_QUEUE_SIZE = int(os.getenv('AUDIT_QUEUE_SIZE', '10000'))
+    AUDIT_BATCH_SIZE = int(os.getenv('AUDIT_BATCH_SIZE', '200'))  # rows per flush
+    AUDIT_FLUSH_MS = int(os.getenv('AUDIT_FLUSH_MS', '250'))
+    AUDIT_ENQUEUE_TIMEOUT_MS = int(os.getenv('AUDIT_ENQUEUE_TIMEOUT_MS', '5'))  # wait when full, then drop
+    
+    # Change Feed (/api/<entity>/changes)
+    CHANGE_FEED_PAGE_SIZE = int(os.getenv('CHANGE_FEED_PAGE_SIZE', '500'))
+    CHANGE_FEED_MAX_LIMIT = int(os.getenv('CHANGE_FEED_MAX_LIMIT', '5000'))
+    CHANGE_FEED_LAG_MS = int(os.getenv('CHANGE_FEED_LAG_MS', '2000'))  # longer than the longest write transaction
+    
+    # Reference Data (warehouses, suppliers, users held in memory)
+    REFERENCE_DATA_REFRESH_SECONDS = int(os.getenv('REFERENCE_DATA_REFRESH_SECONDS', '300'))  # 0 disables refresh
+    
     # Business Rules
     DEFAULT_PAYMENT_TERMS = 30  # days
     DEFAULT_CREDIT_LIMIT = 10000.00
     LOW_STOCK_THRESHOLD = 10
     CRITICAL_STOCK_THRESHOLD = 5
+    DEFAULT_WAREHOUSE_ID = int(os.getenv('DEFAULT_WAREHOUSE_ID', '1'))  # reservations for orders without one
+    ORDER_MAX_LINE_ITEMS = int(os.getenv('ORDER_MAX_LINE_ITEMS', '500'))
+    # 'locking' reserves inside the order transaction (all or nothing);
+    # 'optimistic' reserves each product in its own short transaction (rowversion
+    # check + retries) for hot products, but a crash before the order commits
+    # leaves the reservation in place
+    RESERVATION_STRATEGY = os.getenv('RESERVATION_STRATEGY', 'locking')
+    RESERVATION_MAX_RETRIES = int(os.getenv('RESERVATION_MAX_RETRIES', '5'))
+    RESERVATION_BACKOFF_MS = float(os.getenv('RESERVATION_BACKOFF_MS', '2'))
+    RESERVATION_COALESCE_MS = float(os.getenv('RESERVATION_COALESCE_MS', '0'))  # 0 = no coalescing
 
 
 class DevelopmentConfig(Config):
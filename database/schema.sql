@@ -4,6 +4,8 @@
 -- =====================================================
 
 -- Drop existing tables if they exist (in reverse order of dependencies)
+IF OBJECT_ID('dbo.daily_sales_customers', 'U') IS NOT NULL DROP TABLE dbo.daily_sales_customers;
+IF OBJECT_ID('dbo.daily_sales_rollup', 'U') IS NOT NULL DROP TABLE dbo.daily_sales_rollup;
 IF OBJECT_ID('dbo.audit_logs', 'U') IS NOT NULL DROP TABLE dbo.audit_logs;
 IF OBJECT_ID('dbo.activities', 'U') IS NOT NULL DROP TABLE dbo.activities;
 IF OBJECT_ID('dbo.payments', 'U') IS NOT NULL DROP TABLE dbo.payments;
@@ -68,7 +70,8 @@ CREATE TABLE dbo.customers (
     INDEX idx_customers_code (customer_code),
     INDEX idx_customers_type (customer_type),
     INDEX idx_customers_status (status),
-    INDEX idx_customers_assigned (assigned_user_id)
+    INDEX idx_customers_assigned (assigned_user_id),
+    INDEX idx_customers_changes (updated_at, customer_id)
 );
 
 -- =====================================================
@@ -197,7 +200,8 @@ CREATE TABLE dbo.products (
     INDEX idx_products_code (product_code),
     INDEX idx_products_category (category),
     INDEX idx_products_supplier (supplier_id),
-    INDEX idx_products_active (is_active)
+    INDEX idx_products_active (is_active),
+    INDEX idx_products_changes (updated_at, product_id)
 );
 
 -- =====================================================
@@ -215,12 +219,14 @@ CREATE TABLE dbo.inventory (
     last_restock_date DATETIME2,
     created_at DATETIME2 NOT NULL DEFAULT GETDATE(),
     updated_at DATETIME2 NOT NULL DEFAULT GETDATE(),
+    row_version ROWVERSION, -- optimistic concurrency for stock reservations
     FOREIGN KEY (product_id) REFERENCES dbo.products(product_id) ON DELETE CASCADE,
     FOREIGN KEY (warehouse_id) REFERENCES dbo.warehouses(warehouse_id),
     UNIQUE (product_id, warehouse_id),
     INDEX idx_inventory_product (product_id),
     INDEX idx_inventory_warehouse (warehouse_id),
-    INDEX idx_inventory_available (quantity_available)
+    INDEX idx_inventory_available (quantity_available),
+    INDEX idx_inventory_changes (updated_at, inventory_id)
 );
 
 -- =====================================================
@@ -244,6 +250,7 @@ CREATE TABLE dbo.orders (
     shipping_address NVARCHAR(500),
     billing_address NVARCHAR(500),
     warehouse_id INT,
+    stock_reserved BIT NOT NULL DEFAULT 0, -- quantity_reserved held for order_items until cancelled
     assigned_user_id INT,
     notes NVARCHAR(MAX),
     created_by INT,
@@ -258,7 +265,8 @@ CREATE TABLE dbo.orders (
     INDEX idx_orders_customer (customer_id),
     INDEX idx_orders_status (order_status),
     INDEX idx_orders_payment (payment_status),
-    INDEX idx_orders_date (order_date)
+    INDEX idx_orders_date (order_date),
+    INDEX idx_orders_changes (updated_at, order_id)
 );
 
 -- =====================================================
@@ -424,6 +432,32 @@ CREATE TABLE dbo.audit_logs (
     INDEX idx_audit_user (changed_by)
 );
 
+-- =====================================================
+-- Daily Sales Rollup Tables
+-- Maintained incrementally by OrderService on every order write
+-- =====================================================
+CREATE TABLE dbo.daily_sales_rollup (
+    sales_date DATE NOT NULL PRIMARY KEY,
+    order_count INT NOT NULL DEFAULT 0,
+    cancelled_count INT NOT NULL DEFAULT 0,
+    subtotal DECIMAL(18,2) NOT NULL DEFAULT 0.00,
+    discount_amount DECIMAL(18,2) NOT NULL DEFAULT 0.00,
+    tax_amount DECIMAL(18,2) NOT NULL DEFAULT 0.00,
+    shipping_amount DECIMAL(18,2) NOT NULL DEFAULT 0.00,
+    total_amount DECIMAL(18,2) NOT NULL DEFAULT 0.00,
+    cancelled_amount DECIMAL(18,2) NOT NULL DEFAULT 0.00,
+    paid_amount DECIMAL(18,2) NOT NULL DEFAULT 0.00,
+    unpaid_amount DECIMAL(18,2) NOT NULL DEFAULT 0.00,
+    updated_at DATETIME2 NOT NULL DEFAULT GETDATE()
+);
+
+CREATE TABLE dbo.daily_sales_customers (
+    sales_date DATE NOT NULL,
+    customer_id INT NOT NULL,
+    order_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (sales_date, customer_id)
+);
+
 -- =====================================================
 -- Insert Sample Data
 -- =====================================================
@@ -4,6 +4,7 @@ Run: python test_endpoints.py
 """
 import requests
 import json
+import uuid
 
 BASE_URL = "http://localhost:5000"
 
@@ -73,6 +74,106 @@ def test_api():
     except Exception as e:
         print(f"❌ Get order failed: {e}")
     
+    # Test 8: Delete a product, then read it back (soft delete clears is_active)
+    try:
+        response = requests.post(f"{BASE_URL}/api/products", json={
+            "product_code": "TEST-DELETE-001",
+            "product_name": "Delete Test Product",
+            "category": "Test",
+            "unit_price": 1.00
+        })
+        product_id = response.json()["product_id"]
+        response = requests.delete(f"{BASE_URL}/api/products/{product_id}")
+        print_response(f"8. DELETE /api/products/{product_id}", response)
+        response = requests.get(f"{BASE_URL}/api/products/{product_id}")
+        print_response(f"8. GET /api/products/{product_id} after delete", response)
+        assert response.status_code == 200, "deleted product should still be readable"
+        assert not response.json()["is_active"], "deleted product should have is_active = 0"
+        print("✓ Deleted product is inactive")
+    except Exception as e:
+        print(f"❌ Delete product failed: {e}")
+
+    # Test 9: Place an order, cancel it, and check the reserved stock came back
+    try:
+        def available(product_id):
+            """Available stock of a product in warehouse 1, read from a 409 shortage"""
+            response = requests.post(f"{BASE_URL}/api/orders", json={
+                "customer_id": 1, "warehouse_id": 1,
+                "items": [{"product_id": product_id, "quantity": 10**9}]
+            })
+            assert response.status_code == 409, f"oversized order should be refused, got {response.status_code}"
+            return response.json()["shortages"][0]["available"]
+
+        before = available(1)
+        response = requests.post(f"{BASE_URL}/api/orders", json={
+            "customer_id": 1, "warehouse_id": 1, "items": [{"product_id": 1, "quantity": 1}]
+        })
+        print_response("9. POST /api/orders with items", response)
+        assert response.status_code == 201, "order should be placed"
+        order_id = response.json()["order_id"]
+        assert available(1) == before - 1, "placing the order should reserve one unit"
+        response = requests.delete(f"{BASE_URL}/api/orders/{order_id}")
+        print_response(f"9. DELETE /api/orders/{order_id}", response)
+        assert available(1) == before, "cancelling the order should release its reservation"
+        response = requests.delete(f"{BASE_URL}/api/orders/{order_id}")
+        assert available(1) == before, "cancelling twice should not release twice"
+        print("✓ Cancelled order released its stock")
+    except Exception as e:
+        print(f"❌ Place and cancel order failed: {e}")
+
+    # Test 10: Revalidate a customer and a report with their ETags
+    try:
+        for url in [f"{BASE_URL}/api/customers/1", f"{BASE_URL}/api/analytics/customer-segmentation"]:
+            response = requests.get(url)
+            etag = response.headers.get("ETag")
+            assert response.status_code == 200 and etag, f"{url} should carry an ETag"
+            response = requests.get(url, headers={"If-None-Match": etag})
+            print(f"\n10. GET {url} with If-None-Match: {etag} - Status: {response.status_code}")
+            assert response.status_code == 304, "a matching ETag should get 304"
+            assert not response.content, "a 304 should have no body"
+        print("✓ Unchanged resources answered with 304")
+    except Exception as e:
+        print(f"❌ Conditional GET failed: {e}")
+
+    # Test 11: Page through the customer change feed and reject bad tokens
+    try:
+        response = requests.get(f"{BASE_URL}/api/customers/changes", params={"limit": 2})
+        print_response("11. GET /api/customers/changes?limit=2", response)
+        assert response.status_code == 200, "a full sync should start without a token"
+        page = response.json()
+        response = requests.get(f"{BASE_URL}/api/customers/changes", params={"since": page["next"], "limit": 2})
+        assert response.status_code == 200, "the next token should be accepted"
+        response = requests.get(f"{BASE_URL}/api/customers/changes", params={"since": "not-a-token"})
+        assert response.status_code == 400, "a malformed token should get 400"
+        response = requests.get(f"{BASE_URL}/api/products/changes", params={"since": page["next"]})
+        assert response.status_code == 400, "a customers token should not be accepted for products"
+        response = requests.get(f"{BASE_URL}/api/widgets/changes")
+        assert response.status_code == 404, "an unknown entity should get 404"
+        print("✓ Change feed tokens round-trip and bad tokens are refused")
+    except Exception as e:
+        print(f"❌ Change feed failed: {e}")
+
+    # Test 12: Retry a create with the same Idempotency-Key
+    try:
+        headers = {"Idempotency-Key": f"test-endpoints-{uuid.uuid4()}"}
+        product = {
+            "product_code": f"TEST-IDEM-{uuid.uuid4().hex[:8]}",
+            "product_name": "Idempotency Test Product",
+            "category": "Test",
+            "unit_price": 1.00
+        }
+        first = requests.post(f"{BASE_URL}/api/products", json=product, headers=headers)
+        retry = requests.post(f"{BASE_URL}/api/products", json=product, headers=headers)
+        print_response("12. POST /api/products retried with the same Idempotency-Key", retry)
+        assert retry.status_code == first.status_code and retry.json() == first.json(), \
+            "a retry should get the first response"
+        assert retry.headers.get("Idempotent-Replayed") == "true", "a retry should be marked as replayed"
+        response = requests.post(f"{BASE_URL}/api/products", json=dict(product, unit_price=2.00), headers=headers)
+        assert response.status_code == 422, "the same key with a different body should get 422"
+        print("✓ Retried create was replayed, not repeated")
+    except Exception as e:
+        print(f"❌ Idempotent create failed: {e}")
+
     # Test with different IDs
     print(f"\n{'='*60}")
     print("  Testing with different IDs")